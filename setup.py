@@ -160,6 +160,15 @@ setup(
         "jupyter": [
             "ipywidgets",
         ],
+        "parquet": [
+            "pyarrow",
+        ],
+        "references": [
+            "fsspec",
+            "kerchunk",
+            "scipy",
+            "zarr",
+        ],
         "docs": [
             "bash_kernel",
             "cartopy",
@@ -186,11 +195,13 @@ setup(
             "django-stubs",
             "django-stubs-ext",
             "h5netcdf",
+            "kerchunk",
             "mock",
             "mypy",
             "nbval",
             "nbformat",
             "pep257",
+            "pyarrow",
             "pytest",
             "pytest-html",
             "pytest-env",
@@ -198,6 +209,7 @@ setup(
             "python-swiftclient",
             "requests_mock",
             "testpath",
+            "zarr",
             "types-mock",
             "types-requests",
             "types-toml",
@@ -143,6 +143,33 @@ SOLR_PORT = "solr.port"
 SOLR_CORE = "solr.core"
 """Core name of the Solr instance."""
 
+SOLR_CACHE_SIZE = "solr.cache_size"
+"""Number of Solr query results that are cached in memory."""
+
+SOLR_CACHE_DIR = "solr.cache_dir"
+"""Directory of the on-disk Solr query cache, leave empty to disable it."""
+
+SOLR_FEDERATION = "solr.federation"
+"""Solr instances (host:port) of other freva instances for federated searches."""
+
+SOLR_FEDERATION_TIMEOUT = "solr.federation_timeout"
+"""Seconds to wait for a Solr instance of a federated search to answer."""
+
+SOLR_BACKEND = "solr.backend"
+"""Backend of the databrowser: solr (default) or parquet."""
+
+SOLR_PARQUET_DIR = "solr.parquet_dir"
+"""Directory of the Parquet snapshot of the databrowser for the parquet backend."""
+
+SOLR_BBOX_WORKERS = "solr.bbox_workers"
+"""Processes that read the spatial extent of the files at ingest, 0 to disable it."""
+
+SOLR_REFERENCE_DIR = "solr.reference_dir"
+"""Directory of the virtual dataset references written at ingest, leave empty to disable them."""
+
+SOLR_SUMMARY_DIR = "solr.summary_dir"
+"""Directory of the facet summaries updated at ingest, leave empty to disable them."""
+
 
 _config = None
 _drs_config = None
@@ -1,16 +1,19 @@
 """Provide different utilities that does not depend on any other internal package."""
 from __future__ import annotations
 
+import calendar
 import copy
 import errno
 import os
+import re
 import shlex
 from copy import deepcopy
+from datetime import datetime, timedelta
 from difflib import get_close_matches
 from re import split
 from string import Template
 from subprocess import PIPE, run
-from typing import IO, Any, Dict, Iterable, List, TextIO, Union
+from typing import IO, Any, Dict, Iterable, List, TextIO, Tuple, Union
 
 
 def run_cmd(cmd: str, **kwargs: Any) -> str:
@@ -87,6 +90,144 @@ def get_solr_time_range(time: str, sep: str = "-") -> str:
     return f"[{start_str} TO {end_str}]"
 
 
+def _complete_timestamp(timestamp: str, end: bool = False) -> str:
+    """Complete a partial iso timestamp to the first or last second it covers."""
+    date, _, clock = timestamp.partition("T")
+    parts = [int(p) for p in date.split("-") if p.isdigit()] or [0]
+    year = parts[0]
+    month = 12 if end else 1
+    if len(parts) > 1:
+        month = min(max(parts[1], 1), 12)
+    # years repeat their calendar every 400 years, this also covers year 0
+    last_day = calendar.monthrange(2000 + year % 400, month)[1]
+    day = last_day if end else 1
+    if len(parts) > 2:
+        day = min(max(parts[2], 1), last_day)
+    hour, _, minute = clock.partition(":")
+    hours = int(hour) if hour.isdigit() else (23 if end else 0)
+    minutes = int(minute) if minute.isdigit() else (59 if end else 0)
+    seconds = 59 if end else 0
+    return (
+        f"{year:04d}-{month:02d}-{day:02d}"
+        f"T{min(hours, 23):02d}:{min(minutes, 59):02d}:{seconds:02d}Z"
+    )
+
+
+def get_solr_time_bounds(time: str, sep: str = "-") -> Tuple[str, str]:
+    """Create the solr timestamps of the start and end of a time range.
+
+    Unlike :py:func:`get_solr_time_range` the timestamps are complete, such
+    that they can be stored in solr's date fields. The end is the last second
+    of the time range, e.g. the end of 200001-200912 is 2009-12-31T23:59:59Z.
+
+    Parameters
+    ----------
+    time: str
+        string representation of the time range
+    sep: str, default: -
+        separator for start and end time
+
+    Returns
+    -------
+    tuple[str, str]: solr timestamps of the start and end of the time range
+    """
+    start, _, end = time.partition(sep)
+    return (
+        _complete_timestamp(convert_str_to_timestamp(start, alternative="0")),
+        _complete_timestamp(convert_str_to_timestamp(end, alternative="9999"), True),
+    )
+
+
+def parse_time_gap(gap: str) -> Tuple[int, str]:
+    """Parse the length of a period, such as 1Y, 6M, 10D or 12h.
+
+    Parameters
+    ----------
+    gap: str
+        Number followed by the unit of the period: ``Y`` for years, ``M``
+        for months, ``D`` for days or ``h`` for hours.
+
+    Returns
+    -------
+    tuple[int, str]: the number and the upper case unit of the period
+    """
+    match = re.fullmatch(r"\s*(\d+)\s*([YyMDdHh])\s*", gap)
+    if match is None or int(match.group(1)) < 1:
+        raise ValueError(f"Invalid time gap {gap}, use for example 1Y, 6M, 10D or 12h")
+    return int(match.group(1)), match.group(2).upper()
+
+
+def _format_timestamp(date: datetime) -> str:
+    # strftime doesn't pad years before 1000 on all platforms
+    return (
+        f"{date.year:04d}-{date.month:02d}-{date.day:02d}"
+        f"T{date.hour:02d}:{date.minute:02d}:{date.second:02d}Z"
+    )
+
+
+def get_time_buckets(
+    start: str, end: str, gap: str = "1Y", max_buckets: int = 10000
+) -> List[Tuple[str, str]]:
+    """Split a time range into consecutive periods of the same length.
+
+    The first period begins at the start of the year, month, day or hour
+    (depending on the unit of the gap) of the time range.
+
+    Parameters
+    ----------
+    start: str
+        Timestamp of the start of the time range.
+    end: str
+        Timestamp of the end of the time range.
+    gap: str, default: 1Y
+        Length of the periods, see :py:func:`parse_time_gap`.
+    max_buckets: int, default: 10000
+        Maximum number of periods.
+
+    Returns
+    -------
+    list[tuple[str, str]]: solr timestamps of the first and last second of
+                           each period
+    """
+    num, unit = parse_time_gap(gap)
+    first = _complete_timestamp(convert_str_to_timestamp(start, alternative="0"))
+    last = _complete_timestamp(convert_str_to_timestamp(end, alternative="9999"), True)
+    # python dates start with the year 1
+    year, month, day, hour = (int(v) for v in re.split("[-T:]", first)[:4])
+    date = datetime(max(year, 1), month if unit != "Y" else 1, 1, 0)
+    if unit in ("D", "H"):
+        date = date.replace(day=day, hour=hour if unit == "H" else 0)
+    buckets: List[Tuple[str, str]] = []
+    while _format_timestamp(date) <= last:
+        if len(buckets) >= max_buckets:
+            raise ValueError(
+                f"The time range has more than {max_buckets} periods of {gap}, "
+                "use a larger gap."
+            )
+        try:
+            if unit in ("Y", "M"):
+                months = (
+                    date.year * 12 + date.month - 1 + num * (12 if unit == "Y" else 1)
+                )
+                next_date = date.replace(year=months // 12, month=months % 12 + 1)
+            else:
+                next_date = date + timedelta(
+                    **{"days" if unit == "D" else "hours": num}
+                )
+        except (ValueError, OverflowError):
+            # beyond the year 9999
+            buckets.append((_format_timestamp(date), "9999-12-31T23:59:59Z"))
+            break
+        buckets.append(
+            (
+                _format_timestamp(date),
+                _format_timestamp(next_date - timedelta(seconds=1)),
+            )
+        )
+        date = next_date
+    return buckets
+
+
 def get_console_size() -> Dict[str, int]:
     """Try getting the size of the current tty."""
     console_size = run_cmd("stty size")
@@ -413,6 +554,69 @@ def find_similar_words(word: str, list_of_valid_words: Iterable[str]) -> List[st
     return [w for parts in result for w in expand_list[parts]]
 
 
+class TrigramIndex:
+    """Index of words for fast "Did you mean? xxx" look ups.
+
+    Unlike :py:func:`find_similar_words` the index is built only once, words
+    that are similar to a given word are found by their common trigrams
+    without comparing the word to all words of the index.
+
+    Parameters:
+    -----------
+    words:
+        the valid words, they are compared case insensitive.
+    """
+
+    def __init__(self, words: Iterable[str]) -> None:
+        self.words = sorted({str(w).lower() for w in words})
+        self._known = set(self.words)
+        self._sizes: List[int] = []
+        self._postings: Dict[str, List[int]] = {}
+        for num, word in enumerate(self.words):
+            trigrams = self._get_trigrams(word)
+            self._sizes.append(len(trigrams))
+            for trigram in trigrams:
+                self._postings.setdefault(trigram, []).append(num)
+
+    def __contains__(self, word: object) -> bool:
+        return str(word).lower() in self._known
+
+    def __len__(self) -> int:
+        return len(self.words)
+
+    @staticmethod
+    def _get_trigrams(word: str) -> set[str]:
+        padded = f"  {word} "
+        return {padded[i : i + 3] for i in range(len(padded) - 2)}
+
+    def suggest(self, word: str, limit: int = 5, cutoff: float = 0.3) -> List[str]:
+        """Get the words of the index that are most similar to a word.
+
+        Parameters:
+        -----------
+        word:
+            the word the user selected.
+        limit:
+            the maximum number of suggestions.
+        cutoff:
+            the minimum similarity (0 to 1) of the suggestions, the share of
+            trigrams the words have in common.
+        Returns:
+        --------
+        list : the most similar words, the most similar word first."""
+        trigrams = self._get_trigrams(str(word).lower())
+        shared: Dict[int, int] = {}
+        for trigram in trigrams:
+            for num in self._postings.get(trigram, []):
+                shared[num] = shared.get(num, 0) + 1
+        scores = []
+        for num, count in shared.items():
+            score = 2 * count / (len(trigrams) + self._sizes[num])
+            if score >= cutoff:
+                scores.append((-score, self.words[num]))
+        return [w for (_, w) in sorted(scores)[:limit]]
+
+
 class metadict(dict):
     """A dictionary extension for storing metadata along with the keys.
     In all other cases, it behaves like a normal dictionary."""
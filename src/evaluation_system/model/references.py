@@ -0,0 +1,123 @@
+"""Virtual dataset references of netCDF files.
+
+Opening the files of a large dataset with :func:`xarray.open_mfdataset`
+reads the header of every single file. A reference holds the locations
+(byte ranges) of all chunks of all variables of the files of a dataset in
+the kerchunk json format, the dataset can hence be opened lazily from one
+json file without reading any file header.
+
+References are written by :meth:`SolrCore.load_fs` when the
+``solr.reference_dir`` option is set, one reference per dataset. The
+location of the reference is stored in the ``reference`` field of the
+databrowser. Writing references requires the ``kerchunk`` package, opening
+them requires ``fsspec`` and ``zarr``.
+"""
+from __future__ import annotations
+
+import json
+import os
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, Optional, Sequence, Union
+
+from evaluation_system.misc import logger
+
+if TYPE_CHECKING:
+    import xarray as xr
+
+REFERENCE_SUFFIXES = (".nc", ".nc4")
+"""The suffixes of the files that references are written for."""
+
+
+def get_reference_path(reference_dir: Union[str, os.PathLike], dataset: str) -> Path:
+    """Get the path of the reference of a dataset.
+
+    :param reference_dir: the directory holding the references.
+    :param dataset: the (versioned) id of the dataset.
+    """
+    return Path(reference_dir).expanduser().absolute() / (
+        dataset.replace(os.sep, "_") + ".json"
+    )
+
+
+def _is_netcdf3(file: str) -> bool:
+    """Check if a file is a netCDF3 (classic) file, rather than HDF5."""
+    with open(file, "rb") as stream:
+        return stream.read(3) == b"CDF"
+
+
+def _translate(file: str, netcdf3: bool) -> Dict[str, Any]:
+    """Get the references of a single netCDF file."""
+    if netcdf3:
+        from kerchunk.netCDF3 import NetCDF3ToZarr
+
+        return NetCDF3ToZarr(file, inline_threshold=300).translate()
+    from kerchunk.hdf import SingleHdf5ToZarr
+
+    with open(file, "rb") as stream:
+        return SingleHdf5ToZarr(stream, url=file, inline_threshold=300).translate()
+
+
+def write_reference(
+    files: Sequence[Union[str, os.PathLike]],
+    path: Union[str, os.PathLike],
+    concat_dim: str = "time",
+) -> Path:
+    """Write the reference of the files of a dataset.
+
+    The files are combined along ``concat_dim``, all other dimensions have
+    to be identical across the files. The files also have to share their
+    format, classic netCDF3 and netCDF4 files can't be combined. The
+    reference replaces a previous reference only once it is complete.
+
+    :param files: the netCDF files of the dataset.
+    :param path: the path of the json reference.
+    :param concat_dim: the dimension the files are concatenated along.
+    """
+    try:
+        from kerchunk.combine import MultiZarrToZarr
+    except ImportError as error:
+        raise ImportError(
+            "Writing dataset references requires the kerchunk package"
+        ) from error
+    path = Path(path)
+    netcdf3 = {file: _is_netcdf3(file) for file in sorted(map(str, files))}
+    if len(set(netcdf3.values())) > 1:
+        raise ValueError("The files of a dataset have to share their netCDF format")
+    refs = [_translate(file, is_netcdf3) for (file, is_netcdf3) in netcdf3.items()]
+    if len(refs) == 1:
+        combined = refs[0]
+    else:
+        # time values are decoded, the files might use different time units
+        coo_map = {concat_dim: f"cf:{concat_dim}"} if concat_dim == "time" else {}
+        combined = MultiZarrToZarr(
+            refs, concat_dims=[concat_dim], coo_map=coo_map, remote_protocol="file"
+        ).translate()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}")
+    with tmp_path.open("w") as stream:
+        json.dump(combined, stream)
+    tmp_path.replace(path)
+    logger.debug("Wrote reference of %i files to %s", len(refs), path)
+    return path
+
+
+def open_reference(
+    path: Union[str, os.PathLike], chunks: Optional[Dict[str, int]] = None
+) -> xr.Dataset:
+    """Open the dataset of a reference lazily.
+
+    :param path: the path of the json reference.
+    :param chunks: the dask chunks of the dataset, by default the data is
+     loaded lazily without dask.
+    """
+    import xarray as xr
+
+    return xr.open_dataset(
+        "reference://",
+        engine="zarr",
+        chunks=chunks,
+        backend_kwargs={
+            "consolidated": False,
+            "storage_options": {"fo": str(path), "remote_protocol": "file"},
+        },
+    )
@@ -8,13 +8,35 @@ This package encapsulate access to a solr instance
 
 from __future__ import annotations
 
+import asyncio
+import contextvars
+import json
+import queue
+import sys
+import threading
 import urllib
-from typing import List, NamedTuple, Union, cast
+from typing import (
+    Any,
+    AsyncIterator,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Union,
+    cast,
+)
 
 from typing_extensions import Literal
 
-from evaluation_system.misc import logger, utils
+from evaluation_system.misc import config, logger, utils
+from evaluation_system.misc.utils import TrigramIndex
+from evaluation_system.model.solr_cache import QueryCache, get_query_cache
+from evaluation_system.model import spatial
 from evaluation_system.model.solr_core import SolrCore
+from evaluation_system.model.solr_suggest import get_facet_index, suggest_values
+from evaluation_system.model.solr_summary import FacetSummary, get_summary_path
 
 SolrResponse = NamedTuple(
     "SolrResponse",
@@ -27,10 +49,143 @@ SolrResponse = NamedTuple(
 )
 
 
+SearchSummary = NamedTuple(
+    "SearchSummary",
+    [
+        ("num_objects", int),
+        ("facets", Dict[str, List[Any]]),
+        ("docs", List[str]),
+    ],
+)
+
+
+class PagePrefetcher:
+    """Fetch the pages of a search query in the background.
+
+    A worker thread keeps up to ``depth`` pages of the wrapped page iterator
+    in flight while the current page is consumed. The pages can be consumed
+    either by a regular or an asynchronous for loop, the latter doesn't block
+    the event loop while waiting for the next page.
+
+    :param pages: iterator yielding the pages of a search query.
+    :param depth: the maximum number of pages that are fetched in advance.
+    """
+
+    _done = object()
+
+    def __init__(self, pages: Iterator[list[Any]], depth: int = 1) -> None:
+        self._pages = pages
+        self._queue: queue.Queue[Any] = queue.Queue(maxsize=max(depth, 1))
+        self._closed = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _produce(self) -> None:
+        pages = iter(self._pages)
+        try:
+            while not self._closed.is_set():
+                try:
+                    page = next(pages)
+                except StopIteration:
+                    break
+                self._put(page)
+        except BaseException as error:
+            self._put(error)
+        finally:
+            self._put(self._done)
+
+    def _put(self, item: Any) -> None:
+        while not self._closed.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+
+    def _start(self) -> None:
+        if self._thread is None:
+            # run the worker in the context of the consumer, e.g. to keep profiling
+            self._thread = threading.Thread(
+                target=contextvars.copy_context().run,
+                args=(self._produce,),
+                daemon=True,
+            )
+            self._thread.start()
+
+    def close(self) -> None:
+        """Stop fetching new pages."""
+        self._closed.set()
+
+    def _get(self, page: Any) -> list[Any]:
+        if isinstance(page, BaseException):
+            raise page
+        return cast(List[Any], page)
+
+    def _next(self) -> Any:
+        # poll, a blocking get would never return once the worker is stopped
+        while not self._closed.is_set():
+            try:
+                return self._queue.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        return self._done
+
+    def __iter__(self) -> Iterator[list[Any]]:
+        self._start()
+        try:
+            while True:
+                page = self._next()
+                if page is self._done:
+                    return
+                yield self._get(page)
+        finally:
+            self.close()
+
+    async def __aiter__(self) -> AsyncIterator[list[Any]]:
+        self._start()
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                page = await loop.run_in_executor(None, self._next)
+                if page is self._done:
+                    return
+                yield self._get(page)
+        finally:
+            self.close()
+
+
+def page_facet_counts(
+    values: list[Any],
+    page_size: int = 1000,
+    offset: int = 0,
+    limit: int = -1,
+    prefix: str = "",
+    sort: str = "index",
+) -> Iterator[list[tuple[str, int]]]:
+    """Split the counts of a facet into pages like solr's facet paging does.
+
+    :param values: the facet values and their counts, alternating.
+    :see: :meth:`SolrFindFiles._facet_pages` for the other parameters.
+    """
+    if sort not in ("index", "count"):
+        raise ValueError("Facets can only be sorted by index or count")
+    counts = [
+        (str(value), int(count))
+        for (value, count) in zip(values[::2], values[1::2])
+        if str(value).startswith(prefix.lower())
+    ]
+    if sort == "count":
+        counts.sort(key=lambda c: (-c[1], c[0]))
+    else:
+        counts.sort()
+    counts = counts[offset:] if limit < 0 else counts[offset : offset + limit]
+    for start in range(0, len(counts), page_size):
+        yield counts[start : start + page_size]
+
+
 class SolrFindFiles(object):
     """Encapsulate access to Solr like the find files command"""
 
-    def __init__(self, core=None, host=None, port=None, get_status=False):
+    def __init__(self, core=None, host=None, port=None, get_status=False, timeout=None):
         """Create the connection pointing to the proper solr url and core.
         The default values of these parameters are setup in evaluation_system.model.solr_core.SolrCore
         and read from the configuration file.
@@ -38,9 +193,11 @@ class SolrFindFiles(object):
         :param core: name of the solr core that will be used.
         :param host: hostname of the machine where the solr core is to be found.
         :param port: port number of the machine where the solr core is to be found.
-        :param get_status: if the core should be contacted in an attempt to get more metadata.
+        :param get_status: kept for backwards compatibility, the core is only contacted for more metadata
+         once this metadata is needed.
+        :param timeout: the time in seconds to wait for each answer of the solr server.
         """
-        self.solr = SolrCore(core, host=host, port=port, get_status=get_status)
+        self.solr = SolrCore.get_client(core, host=host, port=port, timeout=timeout)
 
     def __str__(self):  # pragma: no cover
         return "<SolrFindFiles %s>" % self.solr
@@ -49,8 +206,9 @@ class SolrFindFiles(object):
         """Creates a Solr query assuming the default operator is "AND". See schema.xml for that."""
         params = []
         partial_dict = self._add_time_query(partial_dict)
+        partial_dict = self._add_bbox_query(partial_dict)
         # these are special Solr keys that we might get and we assume are not meant for the search
-        special_keys = ("q", "fl", "fq", "facet.limit", "sort")
+        special_keys = ("q", "fl", "fq", "facet.limit", "facet.offset", "sort")
         logger.debug(partial_dict)
         for key, value in partial_dict.items():
             if key in special_keys:
@@ -79,8 +237,8 @@ class SolrFindFiles(object):
         **search_dict: Union[str, list[str]],
     ) -> str:
         partial_dict = search_dict.copy()
-        for key in ("start", "row"):
-            _ = partial_dict.pop("start", None)
+        for key in ("start", "rows"):
+            _ = partial_dict.pop(key, None)
         for key, value in {
             "q": "*:*",
             "fl": f"{uniq_key}",
@@ -89,8 +247,27 @@ class SolrFindFiles(object):
             partial_dict.setdefault(key, value)
         if "text" in partial_dict:
             partial_dict["q"] = partial_dict.pop("text")
+        if partial_dict["sort"]:
+            partial_dict["sort"] = self._get_cursor_sort(
+                cast(str, partial_dict["sort"])
+            )
+        else:
+            del partial_dict["sort"]
         return self._to_solr_query(partial_dict)
 
+    @staticmethod
+    def _get_cursor_sort(sort: str) -> str:
+        """Make sure that the sort criteria contain the unique key of the core.
+
+        Cursor based pagination requires the unique key as tie breaker."""
+        fields = [s.strip().partition(" ")[0] for s in sort.split(",")]
+        if fields[0] == "_docid_":
+            # the index order is unique already
+            return sort
+        if SolrCore.unique_key not in fields:
+            sort += f",{SolrCore.unique_key} desc"
+        return sort
+
     def _retrieve_metadata(
         self, uniq_key: Literal["file", "uri"] = "file", **search_dict: str
     ) -> SolrResponse:
@@ -110,13 +287,16 @@ class SolrFindFiles(object):
         evaluation_system.model.solr.SolrResponse:
           NamedTuple of metadata on the search query results.
         """
+        search_dict.setdefault("sort", "")
         query = self._get_file_query_parameters(uniq_key=uniq_key, **search_dict)
-        anw = self.solr.get_json("select?facet=true&rows=0&%s" % query)["response"]
+
+        def _get_metadata() -> list[Any]:
+            anw = self.solr.get_json("select?rows=0&%s" % query)["response"]
+            return [anw["numFound"], anw["start"], anw["numFoundExact"], anw["docs"]]
+
+        key = QueryCache.make_key("metadata", self.solr.core_url, query)
         return SolrResponse(
-            num_objects=anw["numFound"],
-            start=anw["start"],
-            exact=anw["numFoundExact"],
-            docs=anw["docs"],
+            *get_query_cache().cached(key, self.solr.index_version, _get_metadata)
         )
 
     def _search(
@@ -125,36 +305,342 @@ class SolrFindFiles(object):
         latest_version=False,
         uniq_key="file",
         rows=None,
+        prefetch=0,
+        stream=False,
+        fields=None,
+        order="sorted",
         **partial_dict,
     ):
-        """This encapsulates the Solr call to get documents and returns an iterator providing the. The special
-        parameter _retrieve_metadata will affect the first value returned by the iterator.
+        """This encapsulates the Solr call to get documents and returns an iterator providing the results.
+
+        Results are paged with solr's ``cursorMark`` so that iterating over
+        large result sets is linear in time. Only if an explicit ``start``
+        offset is given the classic ``start``/``rows`` pagination is used.
+        The total number of results is taken from the first page, hence the
+        iterator starts yielding after a single round trip.
 
         :param batch_size: the amount of files to be buffered from Solr.
         :param latest_version: if the search should *try* to find the latest version from all contained here. Please note
          that we don't use this anymore. Instead we have 2 cores and this is defined directly in :class:`SolrFindFiles.search`.
          It was changed because it was slow and required too much memory.
+        :param rows: the maximum number of results that are returned.
+        :param prefetch: the number of pages that are fetched in the background
+         while the current page is consumed, 0 disables prefetching.
+        :param stream: stream all results through solr's export handler instead of paging through them.
+        :param fields: additional fields that are returned for each document, documents are then returned as
+         dictionaries instead of the value of ``uniq_key``.
+        :param order: ``sorted`` by ``uniq_key``, ``unsorted`` in the order of the index (cheapest) or ``grouped``
+         by dataset, yielding (dataset, number of files) pairs.
         known beforehand how many values are going to be returned, even before getting them all. To avoid this we might
         implement a result set object. But that would break the find_files compatibility.
         """
+        if stream:
+            yield from self._export(
+                uniq_key=uniq_key, rows=rows, fields=fields, **partial_dict
+            )
+            return
+        pages = self._get_pages(
+            batch_size=batch_size,
+            uniq_key=uniq_key,
+            rows=rows,
+            prefetch=prefetch,
+            fields=fields,
+            order=order,
+            **partial_dict,
+        )
+        for page in pages:
+            yield from page
+
+    def _get_pages(
+        self,
+        batch_size: int = 10000,
+        uniq_key: str = "file",
+        rows: Optional[int] = None,
+        prefetch: int = 0,
+        fields: Optional[list[str]] = None,
+        order: str = "sorted",
+        **partial_dict: Any,
+    ) -> Iterable[list[Any]]:
+        """Get the pages of a search query, optionally fetched in the background.
+
+        :param prefetch: the number of pages that are fetched in the background
+         while the current page is consumed, 0 disables prefetching.
+
+        See :meth:`_iter_pages` for all other parameters.
+        """
+        pages: Iterable[list[Any]] = self._iter_pages(
+            batch_size=batch_size,
+            uniq_key=uniq_key,
+            rows=rows,
+            fields=fields,
+            order=order,
+            **partial_dict,
+        )
+        if prefetch:
+            pages = PagePrefetcher(pages, depth=prefetch)
+        return pages
+
+    @staticmethod
+    def _get_field_list(uniq_key: str, fields: Optional[list[str]]) -> str:
+        """Get the ``fl`` parameter of a query."""
+        return ",".join([uniq_key] + [f for f in fields or [] if f != uniq_key])
+
+    @staticmethod
+    def _get_doc(
+        doc: dict[str, Any], uniq_key: str, fields: Optional[list[str]]
+    ) -> Any:
+        """Get the unique key of a document, or all requested fields."""
+        if fields is None:
+            return doc[uniq_key]
+        out = {uniq_key: doc[uniq_key]}
+        for field in fields:
+            out[field] = doc.get(field)
+        return out
+
+    def _iter_pages(
+        self,
+        batch_size: int = 10000,
+        uniq_key: str = "file",
+        rows: Optional[int] = None,
+        fields: Optional[list[str]] = None,
+        order: str = "sorted",
+        **partial_dict: Any,
+    ) -> Iterator[list[Any]]:
+        """Iterate page by page over the results of a search query.
+
+        :param batch_size: the number of results per page.
+        :param uniq_key: the key that is returned for each document.
+        :param rows: the maximum number of results that are returned.
+        :param fields: additional fields that are returned for each document.
+         If given, documents are returned as dictionaries instead of the value
+         of ``uniq_key``.
+        :param order: ``sorted`` by ``uniq_key``, ``unsorted`` in the order of
+         the index, see :meth:`_iter_unsorted`, or ``grouped`` by dataset, see
+         :meth:`_iter_datasets`.
+        """
         offset = int(partial_dict.pop("start", "0"))
+        if order == "grouped":
+            yield from self._iter_datasets(
+                batch_size=batch_size, rows=rows, offset=offset, **partial_dict
+            )
+            return
+        if order == "unsorted":
+            yield from self._iter_unsorted(
+                batch_size=batch_size,
+                uniq_key=uniq_key,
+                rows=rows,
+                fields=fields,
+                offset=offset,
+                **partial_dict,
+            )
+            return
+        if order != "sorted":
+            raise ValueError(f"Unknown order of results: {order}")
+        use_offset = bool(offset)
+        if (
+            fields is None
+            and not use_offset
+            and uniq_key == SolrCore.unique_key
+            and "sort" not in partial_dict
+        ):
+            yield from self._iter_csv_pages(
+                batch_size=batch_size, rows=rows, **partial_dict
+            )
+            return
+        partial_dict["fl"] = self._get_field_list(uniq_key, fields)
         query = self._get_file_query_parameters(uniq_key=uniq_key, **partial_dict)
-        metadata = self._retrieve_metadata(uniq_key=uniq_key, **partial_dict)
-        if rows:
-            results_to_visit = min(metadata.num_objects, rows)
-        else:
-            results_to_visit = metadata.num_objects
+        # The number of results is only known after the first page arrived.
+        results_to_visit = rows or sys.maxsize
+        first_page = True
+        cursor = "*"
+        while results_to_visit > 0:
+            batch_size = min(batch_size, results_to_visit)
+            if use_offset:
+                answer = self.solr.get_json(
+                    "select?start=%s&rows=%s&%s" % (offset, batch_size, query)
+                )
+            else:
+                answer = self.solr.get_json(
+                    "select?cursorMark=%s&rows=%s&%s"
+                    % (urllib.parse.quote(cursor), batch_size, query)
+                )
+            if first_page:
+                num_found = answer["response"]["numFound"] - offset
+                results_to_visit = min(results_to_visit, num_found)
+                first_page = False
+            docs = answer["response"]["docs"]
+            page = [
+                self._get_doc(item, uniq_key, fields)
+                for item in docs[:results_to_visit]
+            ]
+            if page:
+                yield page
+            results_to_visit -= len(docs)
+            next_cursor = answer.get("nextCursorMark", cursor)
+            if not docs or (not use_offset and next_cursor == cursor):
+                break
+            if use_offset:
+                offset += len(docs)
+            cursor = next_cursor
+
+    def _iter_unsorted(
+        self,
+        batch_size: int = 10000,
+        uniq_key: str = "file",
+        rows: Optional[int] = None,
+        fields: Optional[list[str]] = None,
+        offset: int = 0,
+        **partial_dict: Any,
+    ) -> Iterator[list[Any]]:
+        """Iterate page by page over the results of a search in index order.
+
+        Results in index order don't need to be sorted, but they can't be
+        paged with a cursor, and paging by offset makes solr collect all
+        previous results again for every page. Only the first page is hence
+        requested on its own, all remaining results are streamed in a single
+        response, which solr collects at once. The first page arrives as fast
+        as a page of the sorted results, the remaining results are only
+        cheaper than the sorted results if they are all consumed.
+
+        See :meth:`_iter_pages` for the parameters.
+        """
+        partial_dict["sort"] = "_docid_ asc"
+        partial_dict["fl"] = self._get_field_list(uniq_key, fields)
+        query = self._get_file_query_parameters(uniq_key=uniq_key, **partial_dict)
+        results_to_visit = rows or sys.maxsize
+        answer = self.solr.get_json(
+            "select?start=%s&rows=%s&%s"
+            % (offset, min(batch_size, results_to_visit), query)
+        )
+        docs = answer["response"]["docs"]
+        if docs:
+            yield [self._get_doc(item, uniq_key, fields) for item in docs]
+        num_found = answer["response"]["numFound"] - offset
+        remaining = min(results_to_visit, num_found) - len(docs)
+        if not docs or remaining <= 0:
+            return
+        page: list[Any] = []
+        for item in self.solr.stream_docs(
+            "select?start=%s&rows=%s&%s" % (offset + len(docs), remaining, query)
+        ):
+            page.append(self._get_doc(item, uniq_key, fields))
+            if len(page) >= batch_size:
+                yield page
+                page = []
+        if page:
+            yield page
+
+    def _iter_datasets(
+        self,
+        batch_size: int = 10000,
+        rows: Optional[int] = None,
+        offset: int = 0,
+        **partial_dict: Any,
+    ) -> Iterator[list[tuple[str, int]]]:
+        """Iterate page by page over the datasets of a search query.
+
+        The results are grouped by their dataset, only one entry per dataset
+        holding the dataset identifier and its number of files is returned.
+
+        :param batch_size: the number of datasets per page.
+        :param rows: the maximum number of datasets that are returned.
+        :param offset: the number of datasets that are skipped.
+        """
+        dataset_key = SolrCore.dataset_key
+        partial_dict.setdefault("sort", f"{dataset_key} desc")
+        query = self._get_file_query_parameters(
+            uniq_key=SolrCore.unique_key, **partial_dict
+        )
+        query += f"&group=true&group.field={dataset_key}&group.limit=0"
+        results_to_visit = rows or sys.maxsize
         while results_to_visit > 0:
             batch_size = min(batch_size, results_to_visit)
             answer = self.solr.get_json(
                 "select?start=%s&rows=%s&%s" % (offset, batch_size, query)
             )
-            offset = answer["response"]["start"]
-            iter_answer = answer["response"]["docs"]
-            for item in iter_answer:
-                yield item[uniq_key]
-                results_to_visit -= 1
-            offset += batch_size
+            page = [
+                (group["groupValue"], group["doclist"]["numFound"])
+                for group in answer["grouped"][dataset_key]["groups"]
+            ]
+            if page:
+                yield page
+            if len(page) < batch_size:
+                break
+            results_to_visit -= len(page)
+            offset += len(page)
+
+    def _iter_csv_pages(
+        self,
+        batch_size: int = 10000,
+        rows: Optional[int] = None,
+        **partial_dict: Any,
+    ) -> Iterator[list[str]]:
+        """Iterate page by page over a listing of the unique key of the core.
+
+        The pages are retrieved with solr's CSV response writer, which is much
+        cheaper to parse than json. The CSV writer doesn't report the next
+        ``cursorMark``, each page is selected by the unique key of the last
+        result of the previous page instead (keyset pagination). This filter
+        is different for every page and therefore kept out of solr's
+        filterCache, where it would only evict the reusable facet filters.
+
+        :param batch_size: the number of results per page.
+        :param rows: the maximum number of results that are returned.
+        """
+        uniq_key = SolrCore.unique_key
+        query = self._get_file_query_parameters(uniq_key=uniq_key, **partial_dict)
+        results_to_visit = rows or sys.maxsize
+        last_key: Optional[str] = None
+        while results_to_visit > 0:
+            batch_size = min(batch_size, results_to_visit)
+            page_query = query
+            if last_key is not None:
+                # results are sorted in descending order
+                escaped = last_key.replace("\\", "\\\\").replace('"', '\\"')
+                page_query += "&" + urllib.parse.urlencode(
+                    {"fq": f'{{!cache=false}}{uniq_key}:[* TO "{escaped}"}}'}
+                )
+            page = [
+                row[0]
+                for row in self.solr.get_csv(
+                    "select?rows=%s&%s" % (batch_size, page_query)
+                )
+            ]
+            if page:
+                yield page
+            if len(page) < batch_size:
+                break
+            results_to_visit -= len(page)
+            last_key = page[-1]
+
+    def _export(
+        self,
+        uniq_key: str = "file",
+        rows: Optional[int] = None,
+        fields: Optional[list[str]] = None,
+        **partial_dict: Any,
+    ) -> Iterator[Any]:
+        """Stream all results of a search query via solr's export handler.
+
+        Other than :meth:`_iter_pages` the results are not paged but sent in
+        one response that is parsed while it arrives. Memory usage stays
+        constant and the first result is available immediately, even for
+        listings of the entire core.
+
+        :param uniq_key: the key that is returned for each document.
+        :param rows: the maximum number of results that are returned.
+        :param fields: additional fields that are returned for each document,
+         the export handler requires all of them to have docValues.
+        """
+        partial_dict.pop("start", None)
+        partial_dict["fl"] = self._get_field_list(uniq_key, fields)
+        query = self._get_file_query_parameters(uniq_key=uniq_key, **partial_dict)
+        docs = self.solr.stream_docs("export?%s" % query)
+        for num, doc in enumerate(docs, 1):
+            yield self._get_doc(doc, uniq_key, fields)
+            if rows and num >= rows:
+                docs.close()
+                break
 
     @staticmethod
     def _add_time_query(
@@ -173,6 +659,17 @@ class SolrFindFiles(object):
             search_dict["fq"] = time
         return search_dict
 
+    @staticmethod
+    def _add_bbox_query(
+        search_dict: dict[str, Union[str, list[str]]]
+    ) -> dict[str, Union[list[str], str]]:
+        """Turn a potential bounding box into a spatial query of the bbox field."""
+        bbox = search_dict.pop("bbox", "")
+        if bbox:
+            envelope = spatial.to_envelope(spatial.parse_bbox(bbox))
+            search_dict["bbox"] = f'"Intersects({envelope})"'
+        return search_dict
+
     @classmethod
     def get_metadata(
         cls,
@@ -216,54 +713,382 @@ class SolrFindFiles(object):
         return s._search(**partial_dict)
 
     def _facets(self, latest_version=False, facets=None, **partial_dict):
+        """Get the facet counts of a search query.
+
+        Results are cached for as long as the index of the core doesn't change.
+        Searches without search facets are answered from the facet summary of
+        the core, if it is up to date.
+        """
+        stored = self._stored_facets(facets=facets, **partial_dict)
+        if stored is not None:
+            return stored
+        key = QueryCache.make_key(
+            "facets", self.solr.core_url, facets or [], **partial_dict
+        )
+        return get_query_cache().cached(
+            key,
+            self.solr.index_version,
+            lambda: self._query_facets(facets=facets, **partial_dict),
+        )
+
+    def _stored_facets(
+        self, facets: Optional[Union[str, list[str]]] = None, **partial_dict: Any
+    ) -> Optional[dict[str, list[Any]]]:
+        """Get the facet counts of a search from the facet summary of the core.
+
+        See :mod:`evaluation_system.model.solr_summary`.
+
+        :returns: None if the search has search facets or the summary doesn't
+         belong to the current index of the core.
+        """
+        summary_dir = config.get(config.SOLR_SUMMARY_DIR, "")
+        if not summary_dir:
+            return None
+        limit = int(partial_dict.pop("facet.limit", -1))
+        offset = int(partial_dict.pop("facet.offset", 0))
+        partial_dict.pop("time_select", None)
+        for key, value in partial_dict.items():
+            if value not in ("", None, []) and (key, value) != ("q", "*:*"):
+                return None
+        summary = FacetSummary.load(get_summary_path(summary_dir, self.solr.core_url))
+        if summary.version is None:
+            return None
+        try:
+            if summary.version != self.solr.index_version():
+                return None
+        except Exception as error:
+            logger.debug("Could not get the index version: %s", error)
+            return None
+        return summary.get_facets(self._get_facet_fields(facets), limit, offset)
+
+    def _suggest(self, limit: int = 5, **partial_dict: Any) -> dict[str, list[str]]:
+        """Suggest known values for the unknown facet values of a search.
+
+        The suggestion indexes are built from the values of the facets and
+        kept for as long as the index of the core doesn't change, see
+        :mod:`evaluation_system.model.solr_suggest`.
+
+        :param limit: the maximum number of suggestions per facet.
+        :returns: the ranked suggestions of the facets with unknown values.
+        """
+        try:
+            version = self.solr.index_version()
+        except Exception as error:
+            logger.debug("Could not get the index version: %s", error)
+            version = object()
+
+        def _get_index(facet: str) -> TrigramIndex:
+            return get_facet_index(
+                self.solr.core_url,
+                facet,
+                version,
+                lambda: self._facets(facets=[facet], **{"facet.limit": -1})[facet][::2],
+            )
+
+        return suggest_values(
+            self._get_facet_fields(), _get_index, limit=limit, **partial_dict
+        )
+
+    def _get_facet_fields(self, facets=None):
+        """Get the list of fields that are faceted."""
         if facets and not isinstance(facets, list):
             if "," in facets:
                 # we assume multiple values here
                 facets = [f.strip() for f in facets.split(",")]
             else:
                 facets = [facets]
-
-        if "text" in partial_dict:
-            partial_dict.update({"q": partial_dict.pop("text")})
-        else:
-            partial_dict.update({"q": "*:*"})
-
-        query = self._to_solr_query(partial_dict)
-
         if facets is None:
             # get all minus what we don't want
-            facets = self.solr.get_solr_fields() - set(
-                [
-                    "",
-                    "_version_",
-                    "file_no_version",
-                    "level",
-                    "timestamp",
-                    "time",
-                    "creation_time",
-                    "source",
-                    "version",
-                    "uri",
-                    "file",
-                    "file_name",
-                ]
-            )
+            facets = self.solr.get_solr_fields() - SolrCore.non_facet_fields
+        return facets
 
-        if facets:
-            query += (
-                "&facet=true&facet.sort=index&facet.mincount=1&facet.field="
-                + "&facet.field=".join(facets)
-            )
+    @staticmethod
+    def _get_facet_query(facets):
+        if not facets:
+            return ""
+        return (
+            "&facet=true&facet.sort=index&facet.mincount=1&facet.field="
+            + "&facet.field=".join(facets)
+        )
 
-        answer = self.solr.get_json("select?facet=true&rows=0&%s" % query)
-        # TODO: why is there a language facet in the solr search?
+    @staticmethod
+    def _get_facet_counts(answer):
         answer = answer["facet_counts"]["facet_fields"]
+        # TODO: why is there a language facet in the solr search?
         try:
             del answer["language"]
         except KeyError:
             pass
         return answer
 
+    def _facet_pages(
+        self,
+        facet: str,
+        page_size: int = 1000,
+        offset: int = 0,
+        limit: int = -1,
+        prefix: str = "",
+        sort: Literal["index", "count"] = "index",
+        **partial_dict: Any,
+    ) -> Iterator[list[tuple[str, int]]]:
+        """Iterate page by page over the values of a facet and their counts.
+
+        Every page is retrieved with one request, such that facets with huge
+        vocabularies never have to be transferred at once. Pages are cached
+        for as long as the index of the core doesn't change.
+
+        :param facet: the name of the facet.
+        :param page_size: the number of values per page.
+        :param offset: the number of values that are skipped.
+        :param limit: the maximum number of values, -1 for all values.
+        :param prefix: only get values starting with this prefix.
+        :param sort: sort the values by ``index`` (alphabetically) or by
+         their ``count``, the most frequent value first.
+        """
+        if sort not in ("index", "count"):
+            raise ValueError("Facets can only be sorted by index or count")
+        partial_dict.setdefault("q", partial_dict.pop("text", "*:*"))
+        query = self._to_solr_query(partial_dict)
+        remaining = limit if limit >= 0 else sys.maxsize
+        while remaining > 0:
+            rows = min(page_size, remaining)
+            params = {
+                "facet": "true",
+                "facet.field": facet,
+                "facet.limit": rows,
+                "facet.offset": offset,
+                "facet.sort": sort,
+                "facet.mincount": 1,
+            }
+            if prefix:
+                # the indexed values are lower case
+                params["facet.prefix"] = prefix.lower()
+            page_query = f"select?rows=0&{query}&{urllib.parse.urlencode(params)}"
+            values = get_query_cache().cached(
+                QueryCache.make_key("facet_page", self.solr.core_url, page_query),
+                self.solr.index_version,
+                lambda: self._get_facet_counts(self.solr.get_json(page_query)).get(
+                    facet, []
+                ),
+            )
+            page = list(zip(values[::2], values[1::2]))
+            if page:
+                yield page
+            if len(page) < rows:
+                break
+            offset += rows
+            remaining -= rows
+
+    def _query_facets(self, facets=None, **partial_dict):
+        if "text" in partial_dict:
+            partial_dict.update({"q": partial_dict.pop("text")})
+        else:
+            partial_dict.update({"q": "*:*"})
+
+        query = self._to_solr_query(partial_dict)
+        query += self._get_facet_query(self._get_facet_fields(facets))
+        answer = self.solr.get_json("select?facet=true&rows=0&%s" % query)
+        return self._get_facet_counts(answer)
+
+    def _summary(
+        self,
+        uniq_key: Literal["file", "uri"] = "file",
+        facets: Optional[Union[str, list[str]]] = None,
+        rows: int = 10,
+        **partial_dict: Any,
+    ) -> SearchSummary:
+        """Get the number of results, facet counts and the first results at once.
+
+        All information is retrieved with one single solr request.
+
+        :param uniq_key: the key that is returned for each document.
+        :param facets: the facets that are counted, None for all facets.
+        :param rows: the number of results that are returned.
+        """
+        partial_dict.pop("start", None)
+        query = self._get_file_query_parameters(uniq_key=uniq_key, **partial_dict)
+        query += self._get_facet_query(self._get_facet_fields(facets))
+        answer = self.solr.get_json("select?rows=%i&%s" % (rows, query))
+        return SearchSummary(
+            num_objects=answer["response"]["numFound"],
+            facets=self._get_facet_counts(answer) if "facet_counts" in answer else {},
+            docs=[d[uniq_key] for d in answer["response"]["docs"]],
+        )
+
+    def _file_metadata(
+        self,
+        files: list[str],
+        batch_size: int = 500,
+        fields: Optional[list[str]] = None,
+    ) -> Iterator[dict[str, Any]]:
+        """Get the stored metadata of many files.
+
+        The documents are looked up by their key in batches, no search is run.
+
+        :param files: the paths of the files.
+        :param batch_size: the number of files that are looked up at once.
+        :param fields: the fields that are returned, all fields by default.
+        :returns: an iterator over the documents of the files that are known.
+        """
+        if fields:
+            fields = [SolrCore.unique_key] + [
+                f for f in fields if f != SolrCore.unique_key
+            ]
+        for start in range(0, len(files), batch_size):
+            yield from self.solr.get_docs(files[start : start + batch_size], fields)
+
+    def _datasets(
+        self, limit: int = -1, offset: int = 0, **partial_dict: Any
+    ) -> list[dict[str, Any]]:
+        """Aggregate the results of a search query per dataset.
+
+        The aggregation is done by solr's JSON facet API, only one entry per
+        dataset is transferred. Results are cached for as long as the index of
+        the core doesn't change.
+
+        :param limit: the maximum number of datasets, -1 for all datasets.
+        :param offset: the number of datasets that are skipped.
+        :returns: one dictionary per dataset holding the dataset identifier,
+         the number of files, the start of the earliest and the end of the
+         latest file and the versions of the dataset.
+        """
+        key = QueryCache.make_key(
+            "datasets", self.solr.core_url, limit, offset, **partial_dict
+        )
+        return get_query_cache().cached(
+            key,
+            self.solr.index_version,
+            lambda: self._query_datasets(limit=limit, offset=offset, **partial_dict),
+        )
+
+    def _query_datasets(
+        self, limit: int = -1, offset: int = 0, **partial_dict: Any
+    ) -> list[dict[str, Any]]:
+        json_facet = {
+            "datasets": {
+                "type": "terms",
+                "field": "dataset_no_version",
+                "limit": limit,
+                "offset": offset,
+                "sort": "index",
+                "facet": {
+                    "time_start": "min(time_start)",
+                    "time_end": "max(time_end)",
+                    "versions": {
+                        "type": "terms",
+                        "field": "version",
+                        "limit": -1,
+                        "sort": "index",
+                    },
+                },
+            }
+        }
+        partial_dict.setdefault("q", partial_dict.pop("text", "*:*"))
+        query = self._to_solr_query(partial_dict)
+        query += "&" + urllib.parse.urlencode({"json.facet": json.dumps(json_facet)})
+        answer = self.solr.get_json("select?rows=0&%s" % query)
+        return [
+            {
+                "dataset": bucket["val"],
+                "num_files": bucket["count"],
+                "time_start": bucket.get("time_start"),
+                "time_end": bucket.get("time_end"),
+                "versions": [
+                    v["val"]
+                    for v in bucket.get("versions", {}).get("buckets", [])
+                    # unversioned files get the version -1
+                    if v["val"] != "-1"
+                ],
+            }
+            for bucket in answer["facets"].get("datasets", {}).get("buckets", [])
+        ]
+
+    @staticmethod
+    def _time_dependent_query() -> str:
+        """Get the query excluding time invariant files, like fx files."""
+        start, end = utils.get_solr_time_bounds("")
+        return f'-(time_start:"{start}" AND time_end:"{end}")'
+
+    def _time_range(self, **partial_dict: Any) -> tuple[Optional[str], Optional[str]]:
+        """Get the start of the earliest and the end of the latest result.
+
+        Time invariant files are ignored.
+
+        :returns: the start and the end, None if there are no time dependent
+         results.
+        """
+        json_facet = {"time_start": "min(time_start)", "time_end": "max(time_end)"}
+        partial_dict.setdefault("q", partial_dict.pop("text", "*:*"))
+        query = self._to_solr_query(partial_dict)
+        query += "&" + urllib.parse.urlencode(
+            {"fq": self._time_dependent_query(), "json.facet": json.dumps(json_facet)}
+        )
+
+        def _query_range() -> list[Optional[str]]:
+            answer = self.solr.get_json("select?rows=0&%s" % query)["facets"]
+            return [answer.get("time_start"), answer.get("time_end")]
+
+        key = QueryCache.make_key("time_range", self.solr.core_url, query)
+        start, end = get_query_cache().cached(
+            key, self.solr.index_version, _query_range
+        )
+        return start, end
+
+    def _time_coverage(
+        self, buckets: list[tuple[str, str]], gap: str, **partial_dict: Any
+    ) -> list[int]:
+        """Count the results that cover periods of time.
+
+        The files covering a period are the files that start before the end
+        of the period minus the files that end before its start. These are
+        counted with two range facets of the start and end of the files.
+        Time invariant files are ignored.
+
+        :param buckets: the first and last second of the periods, see
+         :py:func:`evaluation_system.misc.utils.get_time_buckets`.
+        :param gap: the length of the periods.
+        :returns: the number of results of each period.
+        """
+        if not buckets:
+            return []
+        num, unit = utils.parse_time_gap(gap)
+        units = {"Y": "YEARS", "M": "MONTHS", "D": "DAYS", "H": "HOURS"}
+        json_facet = {
+            key: {
+                "type": "range",
+                "field": field,
+                "start": buckets[0][0],
+                "end": buckets[-1][1],
+                "gap": f"+{num}{units[unit]}",
+                "other": "before",
+            }
+            for (key, field) in (("starts", "time_start"), ("ends", "time_end"))
+        }
+        partial_dict.setdefault("q", partial_dict.pop("text", "*:*"))
+        query = self._to_solr_query(partial_dict)
+        query += "&" + urllib.parse.urlencode(
+            {"fq": self._time_dependent_query(), "json.facet": json.dumps(json_facet)}
+        )
+
+        def _query_coverage() -> list[int]:
+            answer = self.solr.get_json("select?rows=0&%s" % query)["facets"]
+            if "starts" not in answer:
+                # searches without results have no facets
+                return [0 for _ in buckets]
+            started = answer["starts"]["before"]["count"]
+            ended = answer["ends"]["before"]["count"]
+            counts = []
+            for start, end in zip(
+                answer["starts"]["buckets"], answer["ends"]["buckets"]
+            ):
+                started += start["count"]
+                counts.append(started - ended)
+                ended += end["count"]
+            return counts[: len(buckets)]
+
+        key = QueryCache.make_key("time_coverage", self.solr.core_url, query)
+        return get_query_cache().cached(key, self.solr.index_version, _query_coverage)
+
     @staticmethod
     def facets(latest_version=True, facets=None, facet_limit=-1, **partial_dict):
         # use defaults, if other required use _search in the SolrFindFiles instance
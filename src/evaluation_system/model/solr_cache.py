@@ -0,0 +1,192 @@
+"""Client side cache for the results of solr queries.
+
+Query results are only valid for the state of the index they were computed
+from. Every entry is therefore stored along with the version of the index of
+the core and only served as long as the core reports the very same version.
+The version of a core is looked up at most every
+:data:`~evaluation_system.model.solr_core.STATUS_TTL` seconds, changes of the
+index made by other processes, e.g. a (re)-ingest, are hence served from the
+cache for at most that many seconds. Changes made by the process itself are
+seen immediately.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Tuple, Union, cast
+
+from evaluation_system.misc import config
+from evaluation_system.misc import logger as log
+
+_missing = object()
+
+
+class QueryCache:
+    """Size bounded LRU cache of solr query results.
+
+    Parameters
+    ----------
+    maxsize: int, default: 256
+        Maximum number of entries that are kept in memory, 0 disables the
+        in memory cache.
+    cache_dir: os.PathLike, default: None
+        Directory of the optional on-disk tier. The on-disk tier is shared
+        between all processes on the same host. No entries are written to
+        disk if None is given.
+    max_files: int, default: 4096
+        Maximum number of entries that are kept in the on-disk tier.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = 256,
+        cache_dir: Optional[Union[str, os.PathLike]] = None,
+        max_files: int = 4096,
+    ) -> None:
+        self.maxsize = maxsize
+        self.max_files = max_files
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        self._entries: OrderedDict[str, Tuple[Any, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(*args: Any, **kwargs: Any) -> str:
+        """Create a normalised key from query arguments.
+
+        The key doesn't depend on the order of the keyword arguments or the
+        order of values given as lists.
+        """
+
+        def _normalise(value: Any) -> Any:
+            if isinstance(value, (list, tuple, set)):
+                return sorted(str(v) for v in value)
+            return str(value)
+
+        return json.dumps(
+            [list(map(_normalise, args))]
+            + [(k, _normalise(v)) for (k, v) in sorted(kwargs.items())]
+        )
+
+    def _path(self, key: str) -> Path:
+        digest = hashlib.sha256(key.encode("utf-8")).hexdigest()
+        return cast(Path, self.cache_dir) / f"{digest}.json"
+
+    def get(self, key: str, version: Any) -> Any:
+        """Get a cached value, if it was created for the given index version."""
+        with self._lock:
+            cached_version, value = self._entries.get(key, (_missing, _missing))
+            if cached_version == version:
+                self._entries.move_to_end(key)
+                return value
+        if self.cache_dir is None:
+            return _missing
+        path = self._path(key)
+        try:
+            with path.open("r") as stream:
+                entry = json.load(stream)
+            os.utime(path)
+        except (OSError, ValueError):
+            return _missing
+        if entry.get("key") != key or entry.get("version") != version:
+            return _missing
+        self._set_memory(key, version, entry["value"])
+        return entry["value"]
+
+    def _set_memory(self, key: str, version: Any, value: Any) -> None:
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (version, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def set(self, key: str, version: Any, value: Any) -> None:
+        """Store a value that was created for the given index version."""
+        self._set_memory(key, version, value)
+        if self.cache_dir is None:
+            return
+        path = self._path(key)
+        try:
+            path.parent.mkdir(exist_ok=True, parents=True)
+            tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+            with tmp_path.open("w") as stream:
+                json.dump({"key": key, "version": version, "value": value}, stream)
+            tmp_path.replace(path)
+            self._prune()
+        except (OSError, TypeError) as error:
+            log.debug("Could not write query cache entry: %s", error)
+
+    def _prune(self) -> None:
+        """Remove the least recently used entries from the on-disk tier."""
+        files = list(cast(Path, self.cache_dir).glob("*.json"))
+        if len(files) <= self.max_files:
+            return
+        files.sort(key=lambda f: f.stat().st_mtime)
+        for file in files[: len(files) - self.max_files]:
+            try:
+                file.unlink()
+            except OSError:
+                pass
+
+    def clear(self) -> None:
+        """Remove all entries from the cache."""
+        with self._lock:
+            self._entries.clear()
+        if self.cache_dir is not None:
+            for file in self.cache_dir.glob("*.json"):
+                try:
+                    file.unlink()
+                except OSError:
+                    pass
+
+    def cached(
+        self,
+        key: str,
+        get_version: Callable[[], Any],
+        func: Callable[[], Any],
+    ) -> Any:
+        """Get a value from the cache or create and cache it with ``func``.
+
+        Parameters
+        ----------
+        key: str
+            The normalised query key, see :meth:`make_key`
+        get_version: Callable
+            Function retrieving the current version of the index.
+        func: Callable
+            Function retrieving the value if it is not cached.
+        """
+        try:
+            version = get_version()
+        except Exception as error:
+            log.debug("Could not get the index version, skipping cache: %s", error)
+            return func()
+        value = self.get(key, version)
+        if value is _missing:
+            value = func()
+            self.set(key, version, value)
+        return value
+
+
+_query_cache: Dict[Tuple[Any, Any], QueryCache] = {}
+
+
+def get_query_cache() -> QueryCache:
+    """Get the query cache as it is defined in the freva configuration.
+
+    The ``solr.cache_size`` option sets the number of entries kept in memory,
+    the ``solr.cache_dir`` option sets the directory of the on-disk tier.
+    The on-disk tier is only used if ``solr.cache_dir`` is configured, e.g.
+    to a directory that is shared by all users of a host.
+    """
+    maxsize = int(config.get(config.SOLR_CACHE_SIZE, 256) or 0)
+    cache_dir = config.get(config.SOLR_CACHE_DIR, "") or ""
+    key = (maxsize, cache_dir)
+    if key not in _query_cache:
+        _query_cache[key] = QueryCache(maxsize=maxsize, cache_dir=cache_dir or None)
+    return _query_cache[key]
@@ -12,24 +12,181 @@ We define two cores::
 """
 from __future__ import annotations
 
+import codecs
+import csv
+import gzip
+import io
 import json
 import os
 import shutil
+import socket
+import sys
+import threading
+import time
 import urllib
+import urllib.parse
 import urllib.request
+from array import array
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
+from itertools import islice
 from pathlib import Path
-from typing import Dict, Iterator, Optional, Tuple
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple, cast
+
+import requests
+from requests.adapters import HTTPAdapter
 
 from evaluation_system.misc import config
 from evaluation_system.misc import logger as log
-from evaluation_system.misc.utils import get_solr_time_range
+from evaluation_system.misc.utils import get_solr_time_bounds, get_solr_time_range
 from evaluation_system.model.file import DRSFile
+from evaluation_system.model.references import (
+    REFERENCE_SUFFIXES,
+    get_reference_path,
+    write_reference,
+)
+from evaluation_system.model.solr_cache import QueryCache, get_query_cache
+from evaluation_system.model.solr_profile import get_profile
+from evaluation_system.model.solr_summary import FacetSummary, get_summary_path
+from evaluation_system.model.spatial import BBOX_SUFFIXES, read_bboxes, to_envelope
+
+POOL_SIZE = 32
+"""Maximum number of connections that are kept open per solr server."""
+
+_sessions: Dict[int, requests.Session] = {}
+_clients: Dict[Tuple[str, str, str, Optional[float]], "SolrCore"] = {}
+_clients_lock = threading.Lock()
+STATUS_TTL = 2.0
+"""Seconds the status of a core is reused to validate cached query results."""
+_status_cache: Dict[str, Tuple[float, Dict[str, Any]]] = {}
+_status_locks: Dict[str, threading.Lock] = {}
+_status_lock = threading.Lock()
+_status_generation = 0
+
+
+def get_session() -> requests.Session:
+    """Get the http session that is shared by all solr requests.
+
+    The session keeps the connections to the solr server alive, concurrent
+    queries from several threads share the same pool of connections. Each
+    process gets its own session, connections are never shared after a fork.
+    """
+    pid = os.getpid()
+    if pid not in _sessions:
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=POOL_SIZE)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        _sessions.clear()
+        _sessions[pid] = session
+    return _sessions[pid]
+
+
+class DocumentBuffer:
+    """Compact buffer holding a chunk of solr documents before ingestion.
+
+    Most facet values (project, institute, model, ...) repeat across all files
+    of a chunk. Instead of keeping one dictionary per file, every distinct
+    key and value is stored only once in a shared vocabulary, already encoded
+    to json. Each document is kept as a flat array of (key, value) indices
+    into this vocabulary, the buffer hence serializes straight to the json
+    body that is sent to solr.
+    """
+
+    def __init__(self) -> None:
+        self._keys: Dict[str, int] = {}
+        self._values: Dict[Tuple[type, Any], int] = {}
+        self._encoded_keys: list[str] = []
+        self._encoded_values: list[str] = []
+        self._rows: list[array] = []
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def _key_index(self, key: str) -> int:
+        try:
+            return self._keys[key]
+        except KeyError:
+            idx = self._keys[sys.intern(key)] = len(self._encoded_keys)
+            self._encoded_keys.append(json.dumps(key))
+            return idx
+
+    def _value_index(self, value: Any) -> int:
+        if isinstance(value, (list, dict)):
+            # multi valued entries are not hashable, use their json repr.
+            lookup: Tuple[type, Any] = (list, json.dumps(value))
+        elif isinstance(value, str):
+            lookup = (str, sys.intern(value))
+        else:
+            lookup = (type(value), value)
+        try:
+            return self._values[lookup]
+        except KeyError:
+            idx = self._values[lookup] = len(self._encoded_values)
+            self._encoded_values.append(json.dumps(value))
+            return idx
+
+    def append(self, metadata: Dict[str, Any]) -> None:
+        """Add the metadata of a document to the buffer."""
+        row = array("L")
+        for key, value in metadata.items():
+            row.append(self._key_index(key))
+            row.append(self._value_index(value))
+        self._rows.append(row)
+
+    def clear(self) -> None:
+        """Remove all documents and the vocabulary from the buffer."""
+        self._keys, self._values = {}, {}
+        self._encoded_keys, self._encoded_values = [], []
+        self._rows = []
+
+    def to_json(self) -> bytes:
+        """Serialize the buffered documents to a json array."""
+        keys, values = self._encoded_keys, self._encoded_values
+        docs = (
+            "{"
+            + ",".join(
+                f"{keys[row[i]]}:{values[row[i + 1]]}" for i in range(0, len(row), 2)
+            )
+            + "}"
+            for row in self._rows
+        )
+        return ("[" + ",".join(docs) + "]").encode("ascii")
 
 
 class SolrCore:
     """Encapsulate access to a Solr instance"""
 
+    unique_key: str = "file"
+    """The unique key of the documents in the cores."""
+
+    dataset_key: str = "dataset_id"
+    """The field holding the (versioned) dataset identifier of the documents."""
+
+    non_facet_fields: frozenset = frozenset(
+        [
+            "",
+            "_version_",
+            "file_no_version",
+            "level",
+            "timestamp",
+            "time",
+            "time_start",
+            "time_end",
+            "creation_time",
+            "source",
+            "version",
+            "uri",
+            "file",
+            "file_name",
+            dataset_key,
+            "dataset_no_version",
+            "reference",
+            "bbox",
+        ]
+    )
+    """The fields of the documents that aren't search facets."""
+
     def __init__(
         self,
         core=None,
@@ -38,6 +195,7 @@ class SolrCore:
         instance_dir=None,
         data_dir=None,
         get_status=True,
+        timeout=None,
     ):
         """Create the connection pointing to the proper solr url and core.
 
@@ -46,54 +204,110 @@ class SolrCore:
         :param port: The port number of the Solr Server (default: loaded from config file)
         :param instance_dir: the core instance directory (if empty but the core exists it will get downloaded from Solr)
         :param data_dir: the directory where the data is being kept (if empty but the core exists it will
-        get downloaded from Solr)"""
+        get downloaded from Solr)
+        :param get_status: if the status of the core may be retrieved from Solr to get the instance and data
+        directories. The status is only retrieved once these directories are actually needed.
+        :param timeout: the time in seconds to wait for each answer of Solr (default: the socket default timeout)
+        """
 
         self.host = host or config.get(config.SOLR_HOST)
         self.port = port or config.get(config.SOLR_PORT)
         self.core = core or config.get(config.SOLR_CORE)
         self.solr_url = f"http://{self.host}:{self.port}/solr/"
         self.core_url = self.solr_url + self.core + "/"
-        self.instance_dir = instance_dir
-        self.data_dir = data_dir
-
-        if get_status:
-            st = self.status()
-        else:
-            st = {}
-        if self.instance_dir is None and "instanceDir" in st:
-            self.instance_dir = st["instanceDir"]
-        if self.data_dir is None and "dataDir" in st:
-            self.data_dir = st["dataDir"]
-        else:
-            self.data_dir = "data"
+        self._instance_dir = instance_dir
+        self._data_dir = data_dir
+        self._get_status = get_status
+        self.timeout = timeout
 
         # Other Defaults
-        import socket
-
         socket.setdefaulttimeout(20)
 
+    @classmethod
+    def get_client(cls, core=None, host=None, port=None, timeout=None):
+        """Get the client of a core that is shared within the process.
+
+        Clients are kept per host, port and core. Creating a client does not
+        contact Solr, hence this is cheap enough to be called for every query.
+
+        :param core: The name of the core referred (default: loaded from config file)
+        :param host: the hostname of the Solr server (default: loaded from config file)
+        :param port: The port number of the Solr Server (default: loaded from config file)
+        :param timeout: the time in seconds to wait for each answer of Solr (default: the socket default timeout)
+        """
+        key = (
+            host or config.get(config.SOLR_HOST),
+            str(port or config.get(config.SOLR_PORT)),
+            core or config.get(config.SOLR_CORE),
+            timeout,
+        )
+        with _clients_lock:
+            if key not in _clients:
+                _clients[key] = cls(
+                    core=key[2], host=key[0], port=key[1], timeout=timeout
+                )
+            return _clients[key]
+
+    def _get_timeout(self) -> Optional[float]:
+        if self.timeout is None:
+            return socket.getdefaulttimeout()
+        return self.timeout
+
+    def _get_dir_from_status(self, key):
+        if not self._get_status:
+            return None
+        return self.status().get(key)
+
+    @property
+    def instance_dir(self):
+        """The instance directory of the core, retrieved from Solr if not set."""
+        if self._instance_dir is None:
+            self._instance_dir = self._get_dir_from_status("instanceDir")
+        return self._instance_dir
+
+    @instance_dir.setter
+    def instance_dir(self, instance_dir):
+        self._instance_dir = instance_dir
+
+    @property
+    def data_dir(self):
+        """The data directory of the core, retrieved from Solr if not set."""
+        if self._data_dir is None:
+            self._data_dir = self._get_dir_from_status("dataDir") or "data"
+        return self._data_dir
+
+    @data_dir.setter
+    def data_dir(self, data_dir):
+        self._data_dir = data_dir
+
     def __str__(self):
         return "<SolrCore %s>" % self.core_url
 
     def post(self, list_of_dicts, auto_list=True, commit=True):
         """Sends some json to Solr for ingestion.
 
-        :param list_of_dicts: either a json or more normally a list of json instances that will be sent to Solr for ingestion
+        :param list_of_dicts: either a json, a :class:`DocumentBuffer` or more normally a list of json instances
+         that will be sent to Solr for ingestion
         :param auto_list: avoid packing list_of dicts in a directory if it's not one
         :param commit: send also a Solr commit so that changes can be seen immediately.
         """
-        if auto_list and not isinstance(list_of_dicts, list):
-            list_of_dicts = [list_of_dicts]
         endpoint = "update/json?"
         if commit:
             endpoint += "commit=true"
         query = self.core_url + endpoint
         log.debug(query)
-        post_data = json.dumps(list_of_dicts).encode("ascii")
+        if isinstance(list_of_dicts, DocumentBuffer):
+            post_data = list_of_dicts.to_json()
+        else:
+            if auto_list and not isinstance(list_of_dicts, list):
+                list_of_dicts = [list_of_dicts]
+            post_data = json.dumps(list_of_dicts).encode("ascii")
         req = urllib.request.Request(query, post_data)
         req.add_header("Content-type", "application/json")
-
-        return urllib.request.urlopen(req).read()
+        try:
+            return urllib.request.urlopen(req).read()
+        finally:
+            self._clear_status()
 
     def get_json(self, endpoint, use_core=True, check_response=True):
         """Return some json from server. Is the raw access to Solr.
@@ -112,11 +326,28 @@ class SolrCore:
         else:
             query = self.solr_url + endpoint
         log.debug(query)
+        start = time.perf_counter()
         try:
-            req = urllib.request.Request(query)
-            response = json.loads(urllib.request.urlopen(req).read())
-        except urllib.error.HTTPError as error:
+            res = get_session().get(query, timeout=self._get_timeout())
+            res.raise_for_status()
+            content = res.content
+        except requests.exceptions.HTTPError as error:
             raise ValueError("Bad databrowser request: %s", error)
+        except requests.exceptions.Timeout as error:
+            raise TimeoutError(
+                f"No answer of {self.solr_url} within {self._get_timeout()} s"
+            ) from error
+        wall_time = time.perf_counter() - start
+        response = json.loads(content)
+        profile = get_profile()
+        if profile is not None:
+            profile.add(
+                query,
+                wall_time=wall_time,
+                num_bytes=len(content),
+                parse_time=time.perf_counter() - start - wall_time,
+                response=response,
+            )
         if response["responseHeader"]["status"] != 0:
             raise ValueError(
                 "Error while accessing Core %s. Response: %s" % (self.core, response)
@@ -124,12 +355,245 @@ class SolrCore:
 
         return response
 
+    def get_csv(self, endpoint: str) -> List[List[str]]:
+        """Return the rows of a response of Solr's CSV response writer.
+
+        For listings of a single field parsing CSV is much cheaper than
+        parsing json, and the responses are considerably smaller.
+
+        :param endpoint: The endpoint, path missing after the core url and all parameters encoded in it
+         (e.g. 'select?q=*:*&fl=file')"""
+        if "?" in endpoint:
+            endpoint += "&wt=csv&csv.header=false"
+        else:
+            endpoint += "?wt=csv&csv.header=false"
+        query = self.core_url + endpoint
+        log.debug(query)
+        start = time.perf_counter()
+        try:
+            res = get_session().get(query, timeout=self._get_timeout())
+            res.raise_for_status()
+            content = res.content
+        except requests.exceptions.HTTPError as error:
+            raise ValueError("Bad databrowser request: %s", error)
+        except requests.exceptions.Timeout as error:
+            raise TimeoutError(
+                f"No answer of {self.solr_url} within {self._get_timeout()} s"
+            ) from error
+        wall_time = time.perf_counter() - start
+        rows = [
+            row
+            for row in csv.reader(io.StringIO(content.decode("utf-8"), newline=""))
+            if row
+        ]
+        profile = get_profile()
+        if profile is not None:
+            profile.add(
+                query,
+                wall_time=wall_time,
+                num_bytes=len(content),
+                parse_time=time.perf_counter() - start - wall_time,
+                num_docs=len(rows),
+            )
+        return rows
+
+    def get_docs(
+        self, ids: Sequence[str], fields: Optional[Sequence[str]] = None
+    ) -> List[Dict[str, Any]]:
+        """Get the stored documents of the given unique keys.
+
+        The documents are retrieved by Solr's real-time get handler, which
+        looks them up by their key without running a search. The keys are
+        sent in the body of the request, such that many documents can be
+        retrieved at once.
+
+        :param ids: the unique keys (file paths) of the documents.
+        :param fields: the fields that are returned, all fields by default.
+        :returns: the documents that were found, unknown keys are skipped."""
+        if not ids:
+            return []
+        query = self.core_url + "get"
+        params = [("id", key) for key in ids] + [("wt", "json")]
+        if fields:
+            params.append(("fl", ",".join(fields)))
+        log.debug("%s (%i ids)", query, len(ids))
+        start = time.perf_counter()
+        try:
+            res = get_session().post(query, data=params, timeout=self._get_timeout())
+            res.raise_for_status()
+            content = res.content
+        except requests.exceptions.HTTPError as error:
+            raise ValueError("Bad databrowser request: %s", error)
+        except requests.exceptions.Timeout as error:
+            raise TimeoutError(
+                f"No answer of {self.solr_url} within {self._get_timeout()} s"
+            ) from error
+        wall_time = time.perf_counter() - start
+        response = json.loads(content)
+        if "response" in response:
+            docs = response["response"]["docs"]
+        else:
+            # a single id is answered with the plain document
+            docs = [response["doc"]] if response.get("doc") else []
+        profile = get_profile()
+        if profile is not None:
+            profile.add(
+                f"{query}?id=<{len(ids)} ids>",
+                wall_time=wall_time,
+                num_bytes=len(content),
+                parse_time=time.perf_counter() - start - wall_time,
+                num_docs=len(docs),
+            )
+        return docs
+
+    def stream_docs(
+        self, endpoint: str, chunk_size: int = 2**16
+    ) -> Iterator[Dict[str, Any]]:
+        """Stream the documents of a (potentially huge) solr response.
+
+        The response is parsed incrementally while it arrives, documents are
+        yielded as soon as they have been received. This is meant to be used
+        with solr's ``export`` handler.
+
+        :param endpoint: The endpoint, path missing after the core url and all parameters encoded in it
+         (e.g. 'export?q=*:*&fl=file&sort=file desc')
+        :param chunk_size: the number of bytes that are read from the connection at once.
+        """
+        if "?" in endpoint:
+            endpoint += "&wt=json"
+        else:
+            endpoint += "?wt=json"
+        query = self.core_url + endpoint
+        log.debug(query)
+        profile = get_profile()
+        # time spent in receiving the response and in the generator overall
+        wall_time, busy, num_bytes, num_docs = 0.0, 0.0, 0, 0
+        tic: Optional[float] = time.perf_counter()
+        try:
+            connection = urllib.request.urlopen(
+                urllib.request.Request(query, headers={"Accept-Encoding": "gzip"}),
+                timeout=self._get_timeout(),
+            )
+        except urllib.error.HTTPError as error:
+            raise ValueError("Bad databrowser request: %s", error)
+        response: Any = connection
+        if connection.headers.get("Content-Encoding") == "gzip":
+            # decompressed on the fly, chunk by chunk
+            response = gzip.GzipFile(fileobj=connection)
+        wall_time += time.perf_counter() - cast(float, tic)
+        decoder = json.JSONDecoder()
+        text_decoder = codecs.getincrementaldecoder("utf-8")()
+        buffer, pos, in_docs = "", 0, False
+        try:
+            with response:
+                while True:
+                    read_start = time.perf_counter()
+                    chunk = response.read(chunk_size)
+                    wall_time += time.perf_counter() - read_start
+                    num_bytes += len(chunk)
+                    buffer = buffer[pos:] + text_decoder.decode(chunk, final=not chunk)
+                    pos = 0
+                    if not in_docs:
+                        start = buffer.find('"docs"')
+                        if start == -1:
+                            if not chunk:
+                                raise ValueError(
+                                    "Error while accessing Core %s. Response: %s"
+                                    % (self.core, buffer)
+                                )
+                            continue
+                        pos = buffer.find("[", start)
+                        if pos == -1:
+                            pos = 0
+                            continue
+                        pos += 1
+                        in_docs = True
+                    while True:
+                        while pos < len(buffer) and buffer[pos] in " \t\r\n,":
+                            pos += 1
+                        if pos < len(buffer) and buffer[pos] == "]":
+                            return
+                        try:
+                            doc, pos = decoder.raw_decode(buffer, pos)
+                        except ValueError:
+                            break
+                        if "EXCEPTION" in doc:
+                            raise ValueError(
+                                "Error while accessing Core %s. Response: %s"
+                                % (self.core, doc["EXCEPTION"])
+                            )
+                        num_docs += 1
+                        busy += time.perf_counter() - cast(float, tic)
+                        tic = None
+                        yield doc
+                        tic = time.perf_counter()
+                    if not chunk:
+                        return
+        finally:
+            connection.close()
+            if profile is not None:
+                if tic is not None:
+                    busy += time.perf_counter() - tic
+                profile.add(
+                    query,
+                    wall_time=wall_time,
+                    num_bytes=num_bytes,
+                    parse_time=max(busy - wall_time, 0),
+                    num_docs=num_docs,
+                )
+
     def get_solr_fields(self) -> set[str]:
         """Return information about the Solr fields. This is dynamically generated and because of
         dynamicFiled entries in the Schema, this information cannot be inferred from anywhere else.
+
+        The fields are cached, also across processes, until the core is
+        reloaded or its index changes.
         """
+        key = QueryCache.make_key("schema", self.core_url)
+        return set(
+            get_query_cache().cached(key, self._schema_version, self._query_solr_fields)
+        )
+
+    def _query_solr_fields(self) -> list[str]:
         answer = self.get_json("schema")["schema"]["fields"]
-        return set([f["name"] for f in answer if f["type"] != "extra_facet"])
+        return sorted(set([f["name"] for f in answer if f["type"] != "extra_facet"]))
+
+    def _schema_version(self) -> list[Any]:
+        """The schema can change if the core is reloaded or data is ingested."""
+        status = self._cached_status()
+        return [status["index"]["version"], status["startTime"]]
+
+    def _cached_status(self) -> Dict[str, Any]:
+        """Return the status of this core, reused for :data:`STATUS_TTL` seconds.
+
+        Cached query results are validated against the status of the core,
+        reusing it saves a STATUS request for every lookup. Changes made by
+        this process clear the status, changes made by others are seen after
+        :data:`STATUS_TTL` seconds."""
+        with _status_lock:
+            cached = _status_cache.get(self.core_url)
+            core_lock = _status_locks.setdefault(self.core_url, threading.Lock())
+        if cached is not None and time.monotonic() - cached[0] <= STATUS_TTL:
+            return cached[1]
+        # only one request per core, without blocking the lookups of other cores
+        with core_lock:
+            with _status_lock:
+                cached = _status_cache.get(self.core_url)
+                generation = _status_generation
+            if cached is None or time.monotonic() - cached[0] > STATUS_TTL:
+                cached = (time.monotonic(), self.status())
+                with _status_lock:
+                    # a status requested before a change is outdated already
+                    if generation == _status_generation:
+                        _status_cache[self.core_url] = cached
+        return cached[1]
+
+    @staticmethod
+    def _clear_status() -> None:
+        global _status_generation
+        with _status_lock:
+            _status_generation += 1
+            _status_cache.clear()
 
     def create(
         self,
@@ -161,7 +625,7 @@ class SolrCore:
         if data_dir is not None:
             self.data_dir = data_dir
 
-        return self.get_json(
+        answer = self.get_json(
             "admin/cores?action=CREATE&name=%s" % self.core
             + "&instanceDir=%s" % self.instance_dir
             + "&config=%s" % config
@@ -169,30 +633,41 @@ class SolrCore:
             + "&dataDir=%s" % self.data_dir,
             use_core=False,
         )
+        self._clear_status()
+        return answer
 
     def reload(self):
         """Reload the core. Useful after schema changes.
         Be aware that you might need to re-ingest everything if there were changes to the indexing part of the schema.
         """
-        return self.get_json(
+        answer = self.get_json(
             "admin/cores?action=RELOAD&core=" + self.core, use_core=False
         )
+        self._clear_status()
+        return answer
 
     def unload(self):
         """Unload the core."""
-        return self.get_json(
+        # the directories are needed for re-creating the core, which can't be
+        # looked up anymore once the core is gone.
+        _ = self.instance_dir, self.data_dir
+        answer = self.get_json(
             "admin/cores?action=UNLOAD&core=" + self.core, use_core=False
         )
+        self._clear_status()
+        return answer
 
     def swap(self, other_core):
         """Will swap this core with the given one (that means rename their references)
 
         :param other_core: the name of the other core that this will be swapped with.
         """
-        return self.get_json(
+        answer = self.get_json(
             "admin/cores?action=SWAP&core=%s&other=%s" % (self.core, other_core),
             use_core=False,
         )
+        self._clear_status()
+        return answer
 
     def status(self, general=False):
         """Return status information about this core or the whole Solr server.
@@ -208,6 +683,13 @@ class SolrCore:
         else:
             return response["status"][self.core]
 
+    def index_version(self) -> int:
+        """Return the version of the index of this core.
+
+        The version changes with every commit of changes to the index. The
+        version is reused for :data:`STATUS_TTL` seconds."""
+        return self._cached_status()["index"]["version"]
+
     def clone(self, new_instance_dir, data_dir="data", copy_data=False):
         """Copies a core somewhere else.
         :param new_instance_dir: the new location for the clone.
@@ -257,17 +739,155 @@ class SolrCore:
                 continue
             metadata = SolrCore.to_solr_dict(drs_file)
             metadata["timestamp"] = timestamp
-            metadata["time"] = get_solr_time_range(metadata.pop("time", ""))
+            time_range = metadata.pop("time", "")
+            metadata["time"] = get_solr_time_range(time_range)
+            metadata["time_start"], metadata["time_end"] = get_solr_time_bounds(
+                time_range
+            )
             metadata["uri"] = metadata["file"]
             yield drs_file, metadata
 
-    def _del_file_pattern(self, file_pattern: Path, prefix: str = "file") -> None:
-        """Delete all entries of the core."""
+    @staticmethod
+    def _file_pattern_query(file_pattern: Path, prefix: str = "file") -> str:
+        """Get the query selecting all entries of a file pattern."""
         file_pattern = Path(file_pattern).expanduser().absolute()
         # TODO: Better way to determine if we have a regex on board
         if file_pattern.is_dir():
             file_pattern /= "*"
-        self.delete(f"{prefix}:\\{file_pattern}")
+        return f"{prefix}:\\{file_pattern}"
+
+    def _del_file_pattern(
+        self,
+        file_pattern: Path,
+        prefix: str = "file",
+        summary: Optional[FacetSummary] = None,
+    ) -> None:
+        """Delete all entries of the core.
+
+        :param summary: the opened facet summary of the core, see :meth:`_open_summary`.
+        """
+        query = self._file_pattern_query(file_pattern, prefix)
+        if summary is None:
+            self.delete(query)
+        else:
+            self._post_to_summary(
+                dict(delete=dict(query=query)), summary, auto_list=False
+            )
+
+    def _query_facet_counts(self, query: Optional[str] = None) -> Dict[str, List[Any]]:
+        """Count the values of all facets of the entries matching a query."""
+        params: List[Tuple[str, Any]] = [
+            ("q", "*:*"),
+            ("rows", 0),
+            ("facet", "true"),
+            ("facet.limit", -1),
+            ("facet.mincount", 1),
+        ]
+        if query:
+            params.append(("fq", query))
+        params += [
+            ("facet.field", facet)
+            for facet in sorted(self.get_solr_fields() - self.non_facet_fields)
+        ]
+        answer = self.get_json("select?" + urllib.parse.urlencode(params))
+        return answer["facet_counts"]["facet_fields"]
+
+    def _open_summary(
+        self, summary_dir: Optional[Path], file_pattern: Optional[Path] = None
+    ) -> Optional[FacetSummary]:
+        """Open the facet summary of the core before its entries are changed.
+
+        The summary is locked until it is saved, see :meth:`_save_summary`.
+        The counts of the entries of ``file_pattern``, which are about to be
+        deleted, are removed from the summary. A summary that doesn't belong
+        to the current index is rebuilt once the core was changed.
+
+        :param summary_dir: the directory of the summaries, None if the
+         summaries are disabled.
+        :param file_pattern: the entries that are deleted.
+        """
+        if not summary_dir:
+            return None
+        summary = FacetSummary.load(
+            get_summary_path(summary_dir, self.core_url), lock=True
+        )
+        try:
+            # the version must not be older than the changes of other processes
+            if (
+                summary.version is not None
+                and summary.version == self.status()["index"]["version"]
+            ):
+                if file_pattern is not None:
+                    query = self._file_pattern_query(file_pattern)
+                    summary.add_facet_counts(self._query_facet_counts(query), sign=-1)
+                return summary
+        except Exception as error:
+            log.warning("Facet summary of %s is rebuilt: %s", self.core, error)
+        summary.counts, summary.version = {}, None
+        return summary
+
+    def _post_to_summary(
+        self,
+        docs: Any,
+        summary: Optional[FacetSummary],
+        files: Sequence[str] = (),
+        auto_list: bool = True,
+    ) -> None:
+        """Send changes of the core, keeping its facet summary up to date.
+
+        The counts of existing entries of ``files``, which are replaced by
+        the new documents, are removed from the summary. The summary stays
+        valid only as long as the index is changed by this process alone, it
+        is rebuilt once it is saved otherwise.
+
+        :param docs: the documents, or the command, that are sent to solr.
+        :param summary: the opened facet summary of the core.
+        :param files: the unique keys of the documents that are sent.
+        :param auto_list: see :meth:`post`.
+        """
+        if summary is not None and summary.version is not None:
+            try:
+                if summary.version != self.status()["index"]["version"]:
+                    raise ValueError("the core was changed by another process")
+                facets = sorted(self.get_solr_fields() - self.non_facet_fields)
+                for doc in self.get_docs(files, fields=facets):
+                    summary.add(doc, self.non_facet_fields, sign=-1)
+            except Exception as error:
+                log.warning("Facet summary of %s is rebuilt: %s", self.core, error)
+                summary.counts, summary.version = {}, None
+        self.post(docs, auto_list=auto_list)
+        if summary is not None and summary.version is not None:
+            summary.version = self.status()["index"]["version"]
+
+    @classmethod
+    def _add_to_summary(
+        cls, summary: Optional[FacetSummary], metadata: Dict[str, Any]
+    ) -> None:
+        """Count a new entry in a facet summary that is updated incrementally."""
+        if summary is not None and summary.version is not None:
+            summary.add(metadata, cls.non_facet_fields)
+
+    def _save_summary(self, summary: Optional[FacetSummary]) -> None:
+        """Store the facet summary of the changed core and release its lock.
+
+        Summaries that couldn't be updated incrementally are rebuilt from
+        the counts of all entries of the core. A rebuilt summary is only
+        valid if the core didn't change while it was counted."""
+        if summary is None:
+            return
+        try:
+            version = summary.version
+            if version is None:
+                version = self.status()["index"]["version"]
+                summary.counts = {}
+                summary.add_facet_counts(self._query_facet_counts())
+                if version != self.status()["index"]["version"]:
+                    version = None
+            summary.save(version)
+        except Exception as error:
+            log.error("Could not update the facet summary of %s: %s", self.core, error)
+        finally:
+            summary.release()
 
     @staticmethod
     def delete_entries(
@@ -275,6 +895,7 @@ class SolrCore:
         host: Optional[str] = None,
         port: Optional[int] = None,
         prefix: str = "file",
+        summary_dir: Optional[Path] = None,
     ) -> None:
         """Delete all corresponding entries the the solr server.
 
@@ -290,11 +911,22 @@ class SolrCore:
         prefix:
             The prefix representing the data store, currently only posix file
             types are supported (file)
+        summary_dir:
+            Directory of the facet summaries of the cores, see
+            :mod:`evaluation_system.model.solr_summary`. Defaults to the
+            ``solr.summary_dir`` option.
         """
-        core_latest = SolrCore(core="latest", host=host, port=port)
-        core_all_files = SolrCore(core=None, host=host, port=port)
-        core_all_files._del_file_pattern(file_pattern)
-        core_latest._del_file_pattern(file_pattern)
+        summary_dir = summary_dir or config.get(config.SOLR_SUMMARY_DIR, "")
+        core_latest = SolrCore.get_client(core="latest", host=host, port=port)
+        core_all_files = SolrCore.get_client(core=None, host=host, port=port)
+        for core in (core_all_files, core_latest):
+            summary = core._open_summary(summary_dir, Path(file_pattern))
+            try:
+                core._del_file_pattern(file_pattern, summary=summary)
+                core._save_summary(summary)
+            finally:
+                if summary is not None:
+                    summary.release()
 
     @staticmethod
     def load_fs(
@@ -308,6 +940,9 @@ class SolrCore:
         abort_on_errors: bool = False,
         host: Optional[str] = None,
         port: Optional[int] = None,
+        reference_dir: Optional[Path] = None,
+        bbox_workers: Optional[int] = None,
+        summary_dir: Optional[Path] = None,
     ) -> None:
         """Load information of files on posix file system into Solr.
 
@@ -324,7 +959,9 @@ class SolrCore:
         chunk_size:
             Number of entries that will be written to the Solr main core
              (the latest core will be flushed at the same time and is
-             guaranteed to have at most as many as the other.)
+             guaranteed to have at most as many as the other.) Entries are
+             kept in a compact :class:`DocumentBuffer` so memory grows only
+             moderately with the chunk size.
         abort_on_errors:
             If dumping should get aborted as soon as an error is found,
             i.e. a file that can't be ingested. Most of the times there are many
@@ -337,56 +974,175 @@ class SolrCore:
         host:
             The server hostname of the apache solr server.
         port:
-            The host port number the apache solr server is listing to."""
-        core_latest = core_latest or SolrCore(core="latest", host=host, port=port)
-        core_all_files = core_all_files or SolrCore(core=core, host=host, port=port)
-        core_latest._del_file_pattern(input_dir)
-        core_all_files._del_file_pattern(input_dir)
-        chunk, chunk_latest = [], []
-        chunk_count = 0
-        chunk_latest_new: Dict[str, Dict[str, str]] = {}
-        latest_versions: Dict[str, str] = {}
-        for drs_file, metadata in SolrCore._get_metadata_from_path(
-            input_dir, abort_on_errors, suffix, drs_type=drs_type
-        ):
-            chunk.append(metadata)
-            if drs_file.versioned:
-                # TODO: We need a proper data set versioning.
-                version = latest_versions.get(
-                    drs_file.to_dataset(versioned=False), "-1"
-                )
-                idx = drs_file.to_dataset(versioned=False)
-                if (drs_file.version or "0") > version:
-                    # unknown or new version, update
-                    version = drs_file.version or "0"
-                    latest_versions[idx] = version
-                    chunk_latest_new[idx] = metadata
-                if (drs_file.version or "0") >= version:
+            The host port number the apache solr server is listing to.
+        reference_dir:
+            Directory where the virtual references of the ingested datasets
+            are written to, see :mod:`evaluation_system.model.references`.
+            Defaults to the ``solr.reference_dir`` option, no references
+            are written if neither is set.
+        bbox_workers:
+            Number of processes that read the spatial extent (bounding box)
+            of the netCDF files, see :mod:`evaluation_system.model.spatial`.
+            Defaults to the ``solr.bbox_workers`` option, 0 (the default)
+            disables reading the spatial extent. Reading it opens every
+            ingested netCDF file, which makes the ingest a lot slower.
+        summary_dir:
+            Directory of the facet summaries of the cores, which are updated
+            with the counts of the ingested files, see
+            :mod:`evaluation_system.model.solr_summary`. Defaults to the
+            ``solr.summary_dir`` option, no summaries are kept if neither
+            is set."""
+        reference_dir = reference_dir or config.get(config.SOLR_REFERENCE_DIR, "")
+        summary_dir = summary_dir or config.get(config.SOLR_SUMMARY_DIR, "")
+        if bbox_workers is None:
+            bbox_workers = int(config.get(config.SOLR_BBOX_WORKERS, 0) or 0)
+        references: Dict[str, Path] = {}
+        core_latest = core_latest or SolrCore.get_client(
+            core="latest", host=host, port=port
+        )
+        core_all_files = core_all_files or SolrCore.get_client(
+            core=core, host=host, port=port
+        )
+        summary = core_all_files._open_summary(summary_dir, input_dir)
+        summary_latest = core_latest._open_summary(summary_dir, input_dir)
+        try:
+            core_latest._del_file_pattern(input_dir, summary=summary_latest)
+            core_all_files._del_file_pattern(input_dir, summary=summary)
+            chunk, chunk_latest = DocumentBuffer(), DocumentBuffer()
+            files: List[str] = []
+            files_latest: List[str] = []
+            chunk_count = 0
+            chunk_latest_new: Dict[str, Dict[str, str]] = {}
+            latest_versions: Dict[str, str] = {}
+            entries = SolrCore._get_metadata_from_path(
+                input_dir, abort_on_errors, suffix, drs_type=drs_type
+            )
+            if bbox_workers > 0:
+                entries = SolrCore._add_bboxes(entries, bbox_workers)
+            for drs_file, metadata in entries:
+                if (
+                    reference_dir
+                    and Path(metadata["file"]).suffix in REFERENCE_SUFFIXES
+                ):
+                    dataset = metadata[SolrCore.dataset_key]
+                    if dataset not in references:
+                        references[dataset] = get_reference_path(reference_dir, dataset)
+                    metadata["reference"] = str(references[dataset])
+                chunk.append(metadata)
+                files.append(metadata["file"])
+                SolrCore._add_to_summary(summary, metadata)
+                if drs_file.versioned:
+                    # TODO: We need a proper data set versioning.
+                    version = latest_versions.get(
+                        drs_file.to_dataset(versioned=False), "-1"
+                    )
+                    idx = drs_file.to_dataset(versioned=False)
+                    if (drs_file.version or "0") > version:
+                        # unknown or new version, update
+                        version = drs_file.version or "0"
+                        latest_versions[idx] = version
+                        chunk_latest_new[idx] = metadata
+                    if (drs_file.version or "0") >= version:
+                        chunk_latest.append(metadata)
+                        files_latest.append(metadata["file"])
+                        SolrCore._add_to_summary(summary_latest, metadata)
+                else:
+                    # if not version always add to latest
+                    chunk_latest_new[drs_file.to_dataset(versioned=False)] = metadata
                     chunk_latest.append(metadata)
-            else:
-                # if not version always add to latest
-                chunk_latest_new[drs_file.to_dataset(versioned=False)] = metadata
-                chunk_latest.append(metadata)
-            if len(chunk) >= chunk_size:
-                log.info(
-                    "Sending entries %s-%s"
-                    % (
-                        chunk_count * chunk_size,
-                        (chunk_count + 1) * chunk_size,
+                    files_latest.append(metadata["file"])
+                    SolrCore._add_to_summary(summary_latest, metadata)
+                if len(chunk) >= chunk_size:
+                    log.info(
+                        "Sending entries %s-%s"
+                        % (
+                            chunk_count * chunk_size,
+                            (chunk_count + 1) * chunk_size,
+                        )
                     )
-                )
-                core_all_files.post(chunk)
-                chunk = []
-                chunk_count += 1
-                if chunk_latest:
-                    core_latest.post(chunk_latest)
-                    chunk_latest, chunk_latest_new = [], {}
-        # flush
-        if len(chunk) > 0:
-            log.info("Sending last %s entries" % (len(chunk)))
-            core_all_files.post(chunk)
-            if chunk_latest:
-                core_latest.post(chunk_latest)
+                    core_all_files._post_to_summary(chunk, summary, files)
+                    chunk.clear()
+                    files.clear()
+                    chunk_count += 1
+                    if len(chunk_latest):
+                        core_latest._post_to_summary(
+                            chunk_latest, summary_latest, files_latest
+                        )
+                        chunk_latest.clear()
+                        files_latest.clear()
+                        chunk_latest_new = {}
+            # flush
+            if len(chunk) > 0:
+                log.info("Sending last %s entries" % (len(chunk)))
+                core_all_files._post_to_summary(chunk, summary, files)
+                if len(chunk_latest):
+                    core_latest._post_to_summary(
+                        chunk_latest, summary_latest, files_latest
+                    )
+            core_all_files._save_summary(summary)
+            core_latest._save_summary(summary_latest)
+        finally:
+            for opened in (summary, summary_latest):
+                if opened is not None:
+                    opened.release()
+        for dataset, reference in references.items():
+            try:
+                core_all_files._write_reference(dataset, reference)
+            except Exception as error:
+                if abort_on_errors:
+                    raise
+                log.error("Could not write reference of %s: %s", dataset, error)
+
+    @staticmethod
+    def _add_bboxes(
+        entries: Iterator[Tuple[DRSFile, Dict[str, Any]]],
+        num_workers: int,
+        batch_size: int = 1000,
+    ) -> Iterator[Tuple[DRSFile, Dict[str, Any]]]:
+        """Add the bounding boxes of netCDF files to their metadata.
+
+        The files are read in batches, by a pool of ``num_workers`` processes
+        if more than one worker is requested."""
+        executor = ProcessPoolExecutor(num_workers) if num_workers > 1 else None
+        try:
+            while True:
+                batch = list(islice(entries, batch_size))
+                if not batch:
+                    break
+                files = [
+                    metadata["file"]
+                    for (_, metadata) in batch
+                    if Path(metadata["file"]).suffix in BBOX_SUFFIXES
+                ]
+                bboxes = dict(zip(files, read_bboxes(files, executor)))
+                for drs_file, metadata in batch:
+                    bbox = bboxes.get(metadata["file"])
+                    if bbox is not None:
+                        metadata["bbox"] = to_envelope(bbox)
+                    yield drs_file, metadata
+        finally:
+            if executor is not None:
+                executor.shutdown()
+
+    def _write_reference(self, dataset: str, reference: Path) -> None:
+        """Write the reference of all files of a dataset.
+
+        The files are looked up in the core such that the reference also
+        covers the files of the dataset that were ingested earlier."""
+        escaped = dataset.replace("\\", "\\\\").replace('"', '\\"')
+        params = {
+            "q": "*:*",
+            "fq": f'{SolrCore.dataset_key}:"{escaped}"',
+            "fl": "file",
+            "rows": 2**31 - 1,
+        }
+        files = [
+            row[0]
+            for row in self.get_csv("select?" + urllib.parse.urlencode(params))
+            if Path(row[0]).suffix in REFERENCE_SUFFIXES
+        ]
+        if files:
+            write_reference(files, reference)
 
     @staticmethod
     def to_solr_dict(drs_file):
@@ -402,6 +1158,10 @@ class SolrCore:
         else:
             metadata["file_no_version"] = metadata["file"]
         metadata["dataset"] = drs_file.drs_structure
+        metadata[SolrCore.dataset_key] = drs_file.to_dataset(
+            versioned=drs_file.versioned
+        )
+        metadata["dataset_no_version"] = drs_file.to_dataset()
         return metadata
 
 
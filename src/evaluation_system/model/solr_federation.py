@@ -0,0 +1,369 @@
+"""Federated search across the solr servers of several freva instances.
+
+The same query is sent to the solr server of this freva instance and to all
+servers that are listed in the ``solr.federation`` configuration option. The
+servers are queried concurrently, a server that doesn't answer any of the
+requests within the ``solr.federation_timeout`` is skipped such that one slow
+site doesn't block the results of all other sites.
+"""
+from __future__ import annotations
+
+import contextvars
+import heapq
+import sys
+import threading
+import time
+from itertools import chain, islice
+from typing import Any, Callable, Iterator, List, Optional, Tuple, TypeVar
+
+from evaluation_system.misc import config, logger
+from evaluation_system.model.solr import (
+    SearchSummary,
+    SolrFindFiles,
+    SolrResponse,
+    page_facet_counts,
+)
+
+T = TypeVar("T")
+_empty = object()
+
+
+def get_federation_endpoints() -> List[Tuple[str, str]]:
+    """Get the host names and ports of all solr servers of the federation.
+
+    The first endpoint is always the solr server of this freva instance,
+    followed by the servers of the ``solr.federation`` option. Servers are
+    given as comma or white space separated ``host:port`` entries.
+    """
+    endpoints = [(config.get(config.SOLR_HOST), str(config.get(config.SOLR_PORT)))]
+    federation = config.get(config.SOLR_FEDERATION, "") or ""
+    for entry in federation.replace(",", " ").split():
+        host, _, port = entry.partition(":")
+        endpoint = (host, port or "8983")
+        if endpoint not in endpoints:
+            endpoints.append(endpoint)
+    return endpoints
+
+
+class FederatedFindFiles:
+    """Encapsulate access to the solr servers of several freva instances.
+
+    This class offers the same search methods as :class:`SolrFindFiles`, the
+    results of all servers are merged.
+
+    :param core: name of the solr core that will be used.
+    :param endpoints: (host, port) pairs of the solr servers that are queried,
+     the servers of the federation configuration are used by default.
+    :param timeout: the time in seconds to wait for each answer of a server,
+     the ``solr.federation_timeout`` option is used by default.
+    """
+
+    def __init__(
+        self,
+        core: Optional[str] = None,
+        endpoints: Optional[List[Tuple[str, str]]] = None,
+        timeout: Optional[float] = None,
+    ) -> None:
+        self.endpoints = endpoints or get_federation_endpoints()
+        self.timeout = float(
+            timeout or config.get(config.SOLR_FEDERATION_TIMEOUT, 10) or 10
+        )
+        self.searches = [
+            SolrFindFiles(core=core, host=host, port=port, timeout=self.timeout)
+            for (host, port) in self.endpoints
+        ]
+
+    def __str__(self):  # pragma: no cover
+        return "<FederatedFindFiles %s>" % ", ".join(map(str, self.searches))
+
+    def _map(self, func: Callable[[SolrFindFiles], T]) -> List[T]:
+        """Apply a query to all servers concurrently.
+
+        Servers that fail or don't answer within the timeout are skipped with
+        a warning. An error is only raised if none of the servers answered.
+        The requests themselves time out, the queries are run by daemon
+        threads nevertheless, such that a query that keeps a server busy for
+        longer doesn't keep the interpreter from exiting.
+        """
+        outcomes: List[Any] = [_empty] * len(self.searches)
+
+        def _run(num: int, search: SolrFindFiles) -> None:
+            try:
+                outcomes[num] = (True, func(search))
+            except Exception as error:
+                outcomes[num] = (False, error)
+
+        threads = [
+            threading.Thread(
+                target=contextvars.copy_context().run,
+                args=(_run, num, search),
+                daemon=True,
+            )
+            for (num, search) in enumerate(self.searches)
+        ]
+        for thread in threads:
+            thread.start()
+        deadline = time.monotonic() + self.timeout
+        for thread in threads:
+            # don't wait for the slow servers
+            thread.join(max(deadline - time.monotonic(), 0))
+        results, errors = [], []
+        for search, outcome in zip(self.searches, outcomes):
+            if outcome is _empty:
+                errors.append(TimeoutError(f"no answer within {self.timeout} s"))
+                logger.warning(
+                    "Skipping %s: no answer within %s s", search.solr, self.timeout
+                )
+            elif outcome[0]:
+                results.append(outcome[1])
+            else:
+                errors.append(outcome[1])
+                logger.warning("Skipping %s: %s", search.solr, outcome[1])
+        if errors and not results:
+            raise errors[0]
+        return results
+
+    def _retrieve_metadata(self, **search_dict: Any) -> SolrResponse:
+        """Retrieve the total number of results of all servers.
+
+        See :meth:`SolrFindFiles._retrieve_metadata` for the parameters.
+        """
+        responses = self._map(lambda s: s._retrieve_metadata(**search_dict))
+        return SolrResponse(
+            num_objects=sum(r.num_objects for r in responses),
+            start=0,
+            exact=all(r.exact for r in responses),
+            docs=[],
+        )
+
+    def _get_facet_fields(self, facets: Any = None) -> Any:
+        """Get the list of fields that are faceted, all servers share the schema."""
+        return self.searches[0]._get_facet_fields(facets)
+
+    @staticmethod
+    def _merge_facets(results: List[dict[str, list[Any]]]) -> dict[str, list[Any]]:
+        """Merge the facet counts of several servers."""
+        merged: dict[str, dict[Any, int]] = {}
+        for facets in results:
+            for facet, values in facets.items():
+                counts = merged.setdefault(facet, {})
+                for value, count in zip(values[::2], values[1::2]):
+                    counts[value] = counts.get(value, 0) + count
+        out: dict[str, list[Any]] = {}
+        for facet, counts in merged.items():
+            out[facet] = []
+            for value in sorted(counts):
+                out[facet] += [value, counts[value]]
+        return out
+
+    @staticmethod
+    def _page_facets(
+        partial_dict: dict[str, Any]
+    ) -> Callable[[dict[str, list[Any]]], dict[str, list[Any]]]:
+        """Apply the facet limit and offset of a search after merging.
+
+        The servers are asked for the first ``limit + offset`` values, the
+        merged values are then cut to the requested page.
+        """
+        limit = int(partial_dict.pop("facet.limit", -1))
+        offset = int(partial_dict.pop("facet.offset", 0))
+        if limit >= 0:
+            partial_dict["facet.limit"] = limit + offset
+
+        def _cut(facets: dict[str, list[Any]]) -> dict[str, list[Any]]:
+            end = None if limit < 0 else 2 * (offset + limit)
+            return {f: v[2 * offset : end] for (f, v) in facets.items()}
+
+        return _cut
+
+    def _facets(self, **partial_dict: Any) -> dict[str, list[Any]]:
+        """Get the facets of all servers with merged counts.
+
+        See :meth:`SolrFindFiles._facets` for the parameters.
+        """
+        cut = self._page_facets(partial_dict)
+        return cut(self._merge_facets(self._map(lambda s: s._facets(**partial_dict))))
+
+    def _facet_pages(
+        self,
+        facet: str,
+        page_size: int = 1000,
+        offset: int = 0,
+        limit: int = -1,
+        prefix: str = "",
+        sort: str = "index",
+        **partial_dict: Any,
+    ) -> Iterator[list[tuple[str, int]]]:
+        """Iterate page by page over the merged values of a facet.
+
+        The values of all servers have to be merged, they are hence
+        retrieved at once and split into pages afterwards.
+        See :meth:`SolrFindFiles._facet_pages` for the parameters.
+        """
+        values = self._facets(facets=[facet], **partial_dict).get(facet, [])
+        return page_facet_counts(
+            values,
+            page_size=page_size,
+            offset=offset,
+            limit=limit,
+            prefix=prefix,
+            sort=sort,
+        )
+
+    def _suggest(self, limit: int = 5, **partial_dict: Any) -> dict[str, list[str]]:
+        """Suggest known values of all servers for the unknown facet values.
+
+        See :meth:`SolrFindFiles._suggest` for the parameters.
+        """
+        merged: dict[str, list[str]] = {}
+        for suggestions in self._map(lambda s: s._suggest(limit, **partial_dict)):
+            for facet, values in suggestions.items():
+                merged.setdefault(facet, [])
+                merged[facet] += [v for v in values if v not in merged[facet]]
+        return {f: v[:limit] for (f, v) in merged.items()}
+
+    def _summary(
+        self, uniq_key: str = "file", rows: int = 10, **partial_dict: Any
+    ) -> SearchSummary:
+        """Get the summaries of all servers and merge them.
+
+        See :meth:`SolrFindFiles._summary` for the parameters.
+        """
+        cut = self._page_facets(partial_dict)
+        summaries = self._map(
+            lambda s: s._summary(uniq_key=uniq_key, rows=rows, **partial_dict)
+        )
+        return SearchSummary(
+            num_objects=sum(s.num_objects for s in summaries),
+            facets=cut(self._merge_facets([s.facets for s in summaries])),
+            docs=sorted(chain(*(s.docs for s in summaries)), reverse=True)[:rows],
+        )
+
+    def _datasets(
+        self, limit: int = -1, offset: int = 0, **partial_dict: Any
+    ) -> List[dict[str, Any]]:
+        """Aggregate the results of all servers per dataset.
+
+        See :meth:`SolrFindFiles._datasets` for the parameters.
+        """
+        merged: dict[str, dict[str, Any]] = {}
+        for datasets in self._map(lambda s: s._datasets(**partial_dict)):
+            for entry in datasets:
+                if entry["dataset"] not in merged:
+                    # don't modify the cached results of the servers
+                    merged[entry["dataset"]] = dict(entry)
+                    continue
+                dataset = merged[entry["dataset"]]
+                dataset["num_files"] += entry["num_files"]
+                starts = [d for d in (dataset["time_start"], entry["time_start"]) if d]
+                ends = [d for d in (dataset["time_end"], entry["time_end"]) if d]
+                dataset["time_start"] = min(starts, default=None)
+                dataset["time_end"] = max(ends, default=None)
+                dataset["versions"] = sorted(
+                    set(dataset["versions"]) | set(entry["versions"])
+                )
+        results = [merged[d] for d in sorted(merged)][offset:]
+        return results if limit < 0 else results[:limit]
+
+    def _time_range(self, **partial_dict: Any) -> Tuple[Optional[str], Optional[str]]:
+        """Get the earliest start and the latest end of the results of all servers.
+
+        See :meth:`SolrFindFiles._time_range` for the parameters.
+        """
+        ranges = self._map(lambda s: s._time_range(**partial_dict))
+        starts = [start for (start, _) in ranges if start]
+        ends = [end for (_, end) in ranges if end]
+        return min(starts, default=None), max(ends, default=None)
+
+    def _time_coverage(
+        self, buckets: List[Tuple[str, str]], gap: str, **partial_dict: Any
+    ) -> List[int]:
+        """Sum up the results of all servers that cover periods of time.
+
+        See :meth:`SolrFindFiles._time_coverage` for the parameters.
+        """
+        counts = [0 for _ in buckets]
+        for server_counts in self._map(
+            lambda s: s._time_coverage(buckets, gap, **partial_dict)
+        ):
+            counts = [c + n for (c, n) in zip(counts, server_counts)]
+        return counts
+
+    @staticmethod
+    def _peek(
+        search: SolrFindFiles, results: Iterator[T]
+    ) -> Tuple[SolrFindFiles, Any, Iterator[T]]:
+        """Wait for the first entry of a search on one of the servers."""
+        return search, next(results, _empty), results
+
+    @staticmethod
+    def _skip_failing(search: SolrFindFiles, results: Iterator[T]) -> Iterator[T]:
+        """Stop the results of a server that fails while they are consumed."""
+        try:
+            yield from results
+        except Exception as error:
+            logger.warning(
+                "Skipping the remaining results of %s: %s", search.solr, error
+            )
+
+    def _iter_endpoints(
+        self, get_results: Callable[[SolrFindFiles], Iterator[T]]
+    ) -> List[Iterator[T]]:
+        """Start a search on all servers and wait for their first results.
+
+        The remaining results are retrieved while they are consumed, each
+        request is subject to the timeout. A server that times out or fails
+        in the middle of a search is skipped, its results are incomplete.
+        """
+        results = []
+        for search, first, rest in self._map(
+            lambda s: self._peek(s, iter(get_results(s)))
+        ):
+            if first is not _empty:
+                results.append(self._skip_failing(search, chain([first], rest)))
+        return results
+
+    def _search(
+        self,
+        uniq_key: str = "file",
+        rows: Optional[int] = None,
+        fields: Optional[list[str]] = None,
+        **partial_dict: Any,
+    ) -> Iterator[Any]:
+        """Search on all servers and merge the results.
+
+        Every request to the servers is subject to the timeout. With the default (sorted) order the results of all servers are merged
+        by ``uniq_key``, otherwise the results of the servers follow each other.
+
+        See :meth:`SolrFindFiles._search` for the parameters.
+        """
+        results = self._iter_endpoints(
+            lambda s: s._search(
+                uniq_key=uniq_key, rows=rows, fields=fields, **partial_dict
+            )
+        )
+        order = partial_dict.get("order", "sorted")
+        if partial_dict.get("sort") or order != "sorted":
+            merged: Iterator[Any] = chain(*results)
+        elif fields is None:
+            merged = heapq.merge(*results, reverse=True)
+        else:
+            merged = heapq.merge(*results, key=lambda d: d[uniq_key], reverse=True)
+        yield from islice(merged, rows)
+
+    def _get_pages(
+        self, rows: Optional[int] = None, **partial_dict: Any
+    ) -> Iterator[list[Any]]:
+        """Get the pages of a search on all servers, one server after another.
+
+        See :meth:`SolrFindFiles._get_pages` for the parameters.
+        """
+        pages = self._iter_endpoints(
+            lambda s: iter(s._get_pages(rows=rows, **partial_dict))
+        )
+        results_to_visit = rows or sys.maxsize
+        for page in chain(*pages):
+            yield page[:results_to_visit]
+            results_to_visit -= len(page)
+            if results_to_visit <= 0:
+                break
@@ -0,0 +1,579 @@
+"""Offline snapshot of the databrowser in Parquet files.
+
+Compute nodes that can't reach the solr server, or large batch jobs that
+would otherwise all query solr at once, can search a snapshot of the
+databrowser instead. :func:`export_snapshot` exports the ``latest`` and
+``files`` cores into one directory per core, partitioned by the project of
+the documents. :class:`ParquetFindFiles` answers searches from such a
+snapshot with the search semantics of solr: values are matched case
+insensitive, the ``*`` and ``?`` wildcards are supported and time ranges are
+selected with the same ``flexible``, ``strict`` and ``file`` methods. The
+search facets are applied while the snapshot is read, only the partitions
+and row groups that can match a search are loaded.
+
+The backend of the databrowser is chosen with the ``solr.backend`` option,
+the location of the snapshot is set with the ``solr.parquet_dir`` option.
+Reading and writing Parquet files requires the ``pyarrow`` package.
+"""
+from __future__ import annotations
+
+import bisect
+import json
+import os
+import shutil
+import sys
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+
+import pandas as pd
+
+from evaluation_system.misc import config, logger, utils
+from evaluation_system.misc.utils import TrigramIndex
+from evaluation_system.model import spatial
+from evaluation_system.model.solr import (
+    SearchSummary,
+    SolrFindFiles,
+    SolrResponse,
+    page_facet_counts,
+)
+from evaluation_system.model.solr_core import SolrCore
+from evaluation_system.model.solr_suggest import get_facet_index, suggest_values
+
+SNAPSHOT_INFO = "_snapshot.json"
+"""Name of the file holding the information on the snapshot of a core."""
+PARTITION_KEY = "project"
+"""The facet by which the documents of a snapshot are partitioned."""
+
+
+def _first_value(value: Any) -> Optional[str]:
+    """Get the first entry of a multi valued solr field as string."""
+    if isinstance(value, list):
+        value = value[0] if value else None
+    return None if value is None else str(value)
+
+
+def _get_time_bounds(time_range: Optional[str]) -> Tuple[str, str]:
+    """Get the complete start and end timestamps of a stored time range."""
+    return utils.get_solr_time_bounds((time_range or "").strip("[]"), sep=" TO ")
+
+
+def _get_schema(columns: List[str]) -> Any:
+    """Get the schema of a snapshot, all values are stored as strings."""
+    import pyarrow as pa
+
+    return pa.schema([(column, pa.string()) for column in columns])
+
+
+def _get_partitioning(keys: List[str]) -> Any:
+    """Get the hive style partitioning of a snapshot by the given facets."""
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    if not keys:
+        return None
+    return ds.partitioning(pa.schema([(k, pa.string()) for k in keys]), flavor="hive")
+
+
+def _like_pattern(value: str) -> str:
+    """Translate a solr wildcard pattern to the pattern of a SQL like."""
+    pattern = ""
+    for char in value:
+        if char in "%_\\":
+            pattern += "\\" + char
+        else:
+            pattern += {"*": "%", "?": "_"}.get(char, char)
+    return pattern
+
+
+def _page_to_frame(page: List[Dict[str, Any]], columns: List[str]) -> pd.DataFrame:
+    """Convert a page of solr documents to a data frame."""
+    frame = pd.DataFrame(
+        {col: [_first_value(doc.get(col)) for doc in page] for col in columns},
+        columns=columns,
+        dtype=object,
+    )
+    bounds = [_get_time_bounds(time_range) for time_range in frame["time"]]
+    frame["time_start"] = [start for (start, _) in bounds]
+    frame["time_end"] = [end for (_, end) in bounds]
+    return frame
+
+
+def export_snapshot(
+    path: Union[str, os.PathLike],
+    cores: Tuple[str, ...] = ("latest", "files"),
+    host: Optional[str] = None,
+    port: Optional[int] = None,
+    batch_size: int = 100000,
+) -> Path:
+    """Export the databrowser cores to a Parquet snapshot.
+
+    The snapshot of each core is written to a temporary directory first and
+    replaces the previous snapshot only once it is complete, searches
+    running on the previous snapshot hence aren't disturbed.
+
+    :param path: the directory of the snapshot.
+    :param cores: the names of the cores that are exported.
+    :param host: the host name of the solr server.
+    :param port: the port of the solr server.
+    :param batch_size: the number of documents that are retrieved at once.
+    :returns: the directory of the snapshot.
+    """
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    target = Path(path).expanduser().absolute()
+    for core in cores:
+        search = SolrFindFiles(core=core, host=host, port=port)
+        facets = sorted(search._get_facet_fields())
+        fields = facets + ["uri", "time", SolrCore.dataset_key, "reference", "bbox"]
+        columns = [SolrCore.unique_key] + fields
+        schema = _get_schema(list(_page_to_frame([], columns).columns))
+        partitioning = [PARTITION_KEY] if PARTITION_KEY in facets else []
+        index_version = search.solr.index_version()
+        tmp_dir = target / f".{core}.{os.getpid()}.tmp"
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        tmp_dir.mkdir(parents=True)
+        num_docs = 0
+
+        def _get_batches() -> Iterator[Any]:
+            nonlocal num_docs
+            for page in search._iter_pages(batch_size=batch_size, fields=fields):
+                num_docs += len(page)
+                yield pa.RecordBatch.from_pandas(
+                    _page_to_frame(page, columns), schema=schema, preserve_index=False
+                )
+
+        # the writer keeps one file per partition open while the pages arrive
+        ds.write_dataset(
+            _get_batches(),
+            tmp_dir,
+            schema=schema,
+            format="parquet",
+            partitioning=_get_partitioning(partitioning),
+            basename_template="part-{i}.parquet",
+            existing_data_behavior="overwrite_or_ignore",
+        )
+        with (tmp_dir / SNAPSHOT_INFO).open("w") as stream:
+            json.dump(
+                {
+                    "core": core,
+                    "index_version": index_version,
+                    "created": datetime.now().isoformat(),
+                    "num_docs": num_docs,
+                    "facets": facets,
+                    "columns": schema.names,
+                    "partitioning": partitioning,
+                },
+                stream,
+                indent=3,
+            )
+        old_dir = target / f".{core}.{os.getpid()}.old"
+        if (target / core).exists():
+            (target / core).rename(old_dir)
+        tmp_dir.rename(target / core)
+        shutil.rmtree(old_dir, ignore_errors=True)
+        logger.info("Exported %i documents of core %s to %s", num_docs, core, target)
+    return target
+
+
+class ParquetFindFiles:
+    """Search the Parquet snapshot of a databrowser core.
+
+    This class offers the same search methods as :class:`SolrFindFiles`.
+    The files of the snapshot are discovered once per process and again if
+    the snapshot is replaced by a newer snapshot. Each search reads only the
+    documents that match its search facets.
+
+    :param core: name of the core that is searched.
+    :param path: the directory of the snapshot, the ``solr.parquet_dir``
+     option is used by default.
+    """
+
+    _snapshots: Dict[str, Tuple[int, Dict[str, Any], Any]] = {}
+    _lock = threading.Lock()
+
+    def __init__(
+        self,
+        core: Optional[str] = None,
+        path: Optional[Union[str, os.PathLike]] = None,
+    ) -> None:
+        self.core = core or config.get(config.SOLR_CORE)
+        path = path or config.get(config.SOLR_PARQUET_DIR, "")
+        if not path:
+            raise ValueError("No snapshot of the databrowser (solr.parquet_dir)")
+        self.path = Path(path).expanduser().absolute() / self.core
+
+    def __str__(self):  # pragma: no cover
+        return "<ParquetFindFiles %s>" % self.path
+
+    def _load(self) -> Tuple[Dict[str, Any], Any]:
+        """Open the snapshot as ``pyarrow`` dataset, if it isn't already open."""
+        import pyarrow.dataset as ds
+
+        info_file = self.path / SNAPSHOT_INFO
+        try:
+            mtime = info_file.stat().st_mtime_ns
+        except FileNotFoundError as error:
+            raise ValueError(
+                f"No snapshot of core {self.core} in {self.path}"
+            ) from error
+        with self._lock:
+            cached = self._snapshots.get(str(self.path))
+            if cached is not None and cached[0] == mtime:
+                return cached[1], cached[2]
+            with info_file.open() as stream:
+                info = json.load(stream)
+            dataset = ds.dataset(
+                self.path,
+                # snapshots of older versions don't know their columns
+                schema=_get_schema(info["columns"]) if "columns" in info else None,
+                format="parquet",
+                partitioning=_get_partitioning(info.get("partitioning") or []),
+            )
+            self._snapshots[str(self.path)] = (mtime, info, dataset)
+        return info, dataset
+
+    def _read(
+        self, filter: Any = None, columns: Optional[List[str]] = None
+    ) -> pd.DataFrame:
+        """Read the documents of the snapshot that match a filter expression."""
+        table = self._load()[1].to_table(filter=filter, columns=columns)
+        return table.to_pandas()
+
+    @property
+    def frame(self) -> pd.DataFrame:
+        """The documents of the snapshot."""
+        return self._read()
+
+    def _get_facet_fields(
+        self, facets: Optional[Union[str, List[str]]] = None
+    ) -> List[str]:
+        """Get the list of fields that are faceted."""
+        if facets and not isinstance(facets, list):
+            facets = [f.strip() for f in facets.split(",")]
+        if facets is None:
+            facets = list(self._load()[0]["facets"])
+        return facets
+
+    @staticmethod
+    def _match(field: str, values: List[str]) -> Any:
+        """Match the values of a field like solr does, with wildcards."""
+        import pyarrow.compute as pc
+        import pyarrow.dataset as ds
+
+        matches = ds.scalar(False)
+        for value in values:
+            pattern = _like_pattern(str(value).strip('"'))
+            matches |= pc.match_like(ds.field(field), pattern, ignore_case=True)
+        # documents without the field never match
+        return pc.coalesce(matches, False)
+
+    @staticmethod
+    def _time_filter(time_subset: str, operator: str) -> Any:
+        """Select the documents of a time range, see SolrFindFiles._add_time_query."""
+        import pyarrow.dataset as ds
+
+        start, _, end = time_subset.lower().partition("to")
+        start = utils.convert_str_to_timestamp(start.strip() or "0", "")
+        end = utils.convert_str_to_timestamp(end.strip() or start, "")
+        if not start or not end:
+            raise ValueError("Invalid time string")
+        t_start, t_end = utils.get_solr_time_bounds(f"{start} TO {end}", sep=" TO ")
+        # timestamps are complete iso strings, they can be compared as strings
+        operator = (operator or "intersects").lower()
+        time_start, time_end = ds.field("time_start"), ds.field("time_end")
+        if operator == "within":
+            return (time_start >= t_start) & (time_end <= t_end)
+        if operator == "contains":
+            return (time_start <= t_start) & (time_end >= t_end)
+        return (time_start <= t_end) & (time_end >= t_start)
+
+    @staticmethod
+    def _bbox_mask(frame: pd.DataFrame, bbox: Union[str, List[str]]) -> pd.Series:
+        """Select the documents intersecting a bounding box, see spatial.intersects."""
+        box = spatial.parse_bbox(bbox)
+        if "bbox" not in frame.columns:
+            return pd.Series(False, index=frame.index)
+        envelopes = frame["bbox"].dropna().unique()
+        matches = [
+            e for e in envelopes if spatial.intersects(spatial.from_envelope(e), box)
+        ]
+        return frame["bbox"].isin(matches)
+
+    def _select(self, **partial_dict: Any) -> pd.DataFrame:
+        """Get the documents that match a search query."""
+        import pyarrow.dataset as ds
+
+        for key in ("facet.limit", "facet.offset", "start", "rows", "sort", "fl"):
+            partial_dict.pop(key, None)
+        names = self._load()[1].schema.names
+        selection = ds.scalar(True)
+        time_subset = partial_dict.pop("time", "")
+        operator = partial_dict.pop("time_select", "")
+        if time_subset:
+            selection &= self._time_filter(time_subset, operator)
+        bbox = partial_dict.pop("bbox", "")
+        query = partial_dict.pop("text", partial_dict.pop("q", "*:*"))
+        if query != "*:*" or "fq" in partial_dict:
+            raise ValueError("Solr queries aren't supported by the parquet backend")
+        for key, value in partial_dict.items():
+            negate = key.endswith("_not_")
+            if negate:
+                key = key[:-5]
+            values = value if isinstance(value, list) else [value]
+            if key in names:
+                matches = self._match(key, values)
+            else:
+                # like solr, values of unknown fields never match
+                matches = ds.scalar(False)
+            selection &= ~matches if negate else matches
+        frame = self._read(filter=selection)
+        if bbox:
+            frame = frame[self._bbox_mask(frame, bbox)]
+        return frame
+
+    def _retrieve_metadata(
+        self, uniq_key: str = "file", **search_dict: Any
+    ) -> SolrResponse:
+        """Retrieve the number of results of a search query."""
+        return SolrResponse(
+            num_objects=len(self._select(**search_dict)),
+            start=0,
+            exact=True,
+            docs=[],
+        )
+
+    @staticmethod
+    def _count(
+        frame: pd.DataFrame, facets: List[str], limit: int, offset: int = 0
+    ) -> Dict[str, List]:
+        """Count the facet values of the selected documents like solr does."""
+        out: Dict[str, List[Any]] = {}
+        for facet in facets:
+            if facet not in frame.columns:
+                out[facet] = []
+                continue
+            # the indexed values are lower case
+            counts = (
+                frame[facet]
+                .dropna()
+                .astype(str)
+                .str.lower()
+                .value_counts()
+                .sort_index()
+            )
+            counts = counts[offset:]
+            if limit > 0:
+                counts = counts[:limit]
+            out[facet] = []
+            for value, count in counts.items():
+                out[facet] += [value, int(count)]
+        return out
+
+    def _facets(
+        self,
+        latest_version: bool = False,
+        facets: Optional[Union[str, List[str]]] = None,
+        **partial_dict: Any,
+    ) -> Dict[str, List[Any]]:
+        """Get the facet counts of a search query."""
+        limit = int(partial_dict.pop("facet.limit", -1))
+        offset = int(partial_dict.pop("facet.offset", 0))
+        return self._count(
+            self._select(**partial_dict), self._get_facet_fields(facets), limit, offset
+        )
+
+    def _facet_pages(
+        self,
+        facet: str,
+        page_size: int = 1000,
+        offset: int = 0,
+        limit: int = -1,
+        prefix: str = "",
+        sort: str = "index",
+        **partial_dict: Any,
+    ) -> Iterator[List[Tuple[str, int]]]:
+        """Iterate page by page over the values of a facet and their counts."""
+        values = self._count(self._select(**partial_dict), [facet], -1)[facet]
+        return page_facet_counts(
+            values,
+            page_size=page_size,
+            offset=offset,
+            limit=limit,
+            prefix=prefix,
+            sort=sort,
+        )
+
+    def _suggest(self, limit: int = 5, **partial_dict: Any) -> Dict[str, List[str]]:
+        """Suggest known values for the unknown facet values of a search."""
+        info = self._load()[0]
+
+        def _get_index(facet: str) -> TrigramIndex:
+            return get_facet_index(
+                str(self.path),
+                facet,
+                (info["index_version"], info["created"]),
+                lambda: self._read(columns=[facet])[facet]
+                .dropna()
+                .astype(str)
+                .unique(),
+            )
+
+        return suggest_values(
+            self._get_facet_fields(), _get_index, limit=limit, **partial_dict
+        )
+
+    def _summary(
+        self,
+        uniq_key: str = "file",
+        facets: Optional[Union[str, List[str]]] = None,
+        rows: int = 10,
+        **partial_dict: Any,
+    ) -> SearchSummary:
+        """Get the number of results, facet counts and the first results."""
+        limit = int(partial_dict.pop("facet.limit", -1))
+        offset = int(partial_dict.pop("facet.offset", 0))
+        partial_dict.pop("start", None)
+        selection = self._select(**partial_dict)
+        return SearchSummary(
+            num_objects=len(selection),
+            facets=self._count(
+                selection, self._get_facet_fields(facets), limit, offset
+            ),
+            docs=list(selection[uniq_key].sort_values(ascending=False)[:rows]),
+        )
+
+    def _get_doc(
+        self, row: Dict[str, Any], uniq_key: str, fields: Optional[List[str]]
+    ) -> Any:
+        """Get the unique key of a document, or all requested fields.
+
+        Like in solr, the values of the fields are lists."""
+        if fields is None:
+            return row[uniq_key]
+        out = {uniq_key: row[uniq_key]}
+        for field in fields:
+            value = row.get(field)
+            if field != SolrCore.unique_key and value is not None:
+                value = [value]
+            out[field] = value
+        return out
+
+    def _iter_pages(
+        self,
+        batch_size: int = 10000,
+        uniq_key: str = "file",
+        rows: Optional[int] = None,
+        fields: Optional[List[str]] = None,
+        order: str = "sorted",
+        **partial_dict: Any,
+    ) -> Iterator[List[Any]]:
+        """Iterate page by page over the results of a search query.
+
+        See :meth:`SolrFindFiles._iter_pages` for the parameters.
+        """
+        offset = int(partial_dict.pop("start", "0"))
+        partial_dict.pop("sort", None)
+        selection = self._select(**partial_dict)
+        if order == "grouped":
+            datasets = selection[SolrCore.dataset_key].dropna().astype(str)
+            counts = datasets.value_counts().sort_index(ascending=False)
+            results: List[Any] = [(d, int(n)) for (d, n) in counts.items()]
+            results = results[offset : offset + (rows or sys.maxsize)]
+        elif order in ("sorted", "unsorted"):
+            if order == "sorted":
+                selection = selection.sort_values(uniq_key, ascending=False)
+            selection = selection[offset : offset + (rows or sys.maxsize)]
+            columns = [uniq_key] + [f for f in fields or [] if f in selection.columns]
+            results = [
+                self._get_doc(row, uniq_key, fields)
+                for row in selection[columns]
+                .astype(object)
+                .where(selection[columns].notna(), None)
+                .to_dict("records")
+            ]
+        else:
+            raise ValueError(f"Unknown order of results: {order}")
+        for start in range(0, len(results), batch_size):
+            yield results[start : start + batch_size]
+
+    def _get_pages(self, prefetch: int = 0, **partial_dict: Any) -> Iterator[List[Any]]:
+        """Get the pages of a search query, the snapshot is local anyway."""
+        return self._iter_pages(**partial_dict)
+
+    def _search(
+        self,
+        batch_size: int = 10000,
+        uniq_key: str = "file",
+        rows: Optional[int] = None,
+        prefetch: int = 0,
+        stream: bool = False,
+        **partial_dict: Any,
+    ) -> Iterator[Any]:
+        """Search the snapshot, see :meth:`SolrFindFiles._search`."""
+        for page in self._iter_pages(
+            batch_size=batch_size, uniq_key=uniq_key, rows=rows, **partial_dict
+        ):
+            yield from page
+
+    def _file_metadata(
+        self,
+        files: List[str],
+        batch_size: int = 500,
+        fields: Optional[List[str]] = None,
+    ) -> Iterator[Dict[str, Any]]:
+        """Get the stored metadata of many files."""
+        import pyarrow.dataset as ds
+
+        selection = self._read(filter=ds.field(SolrCore.unique_key).isin(files))
+        columns = [SolrCore.unique_key] + [
+            f for f in fields or selection.columns if f != SolrCore.unique_key
+        ]
+        columns = [c for c in columns if c in selection.columns]
+        selection = selection.set_index(SolrCore.unique_key, drop=False)
+        for file in files:
+            if file in selection.index:
+                row = selection.loc[file, columns]
+                if isinstance(row, pd.DataFrame):
+                    row = row.iloc[0]
+                yield self._get_doc(
+                    row.where(row.notna(), None).to_dict(),
+                    SolrCore.unique_key,
+                    columns[1:],
+                )
+
+    def _datasets(self, **partial_dict: Any) -> List[Dict[str, Any]]:
+        """Dataset searches need the versions, which aren't in the snapshot."""
+        raise ValueError("Dataset searches aren't supported by the parquet backend")
+
+    def _select_time_dependent(self, **partial_dict: Any) -> pd.DataFrame:
+        """Get the documents of a search without time invariant files."""
+        frame = self._select(**partial_dict)
+        start, end = utils.get_solr_time_bounds("")
+        return frame[(frame["time_start"] != start) | (frame["time_end"] != end)]
+
+    def _time_range(self, **partial_dict: Any) -> Tuple[Optional[str], Optional[str]]:
+        """Get the start of the earliest and the end of the latest result."""
+        frame = self._select_time_dependent(**partial_dict)
+        if not len(frame):
+            return None, None
+        return frame["time_start"].min(), frame["time_end"].max()
+
+    def _time_coverage(
+        self, buckets: List[Tuple[str, str]], gap: str, **partial_dict: Any
+    ) -> List[int]:
+        """Count the results that cover periods of time.
+
+        See :meth:`SolrFindFiles._time_coverage` for the parameters.
+        """
+        frame = self._select_time_dependent(**partial_dict)
+        starts = sorted(frame["time_start"])
+        ends = sorted(frame["time_end"])
+        # results that start before the end of a period, minus those that
+        # end before its start
+        return [
+            bisect.bisect_right(starts, last) - bisect.bisect_left(ends, first)
+            for (first, last) in buckets
+        ]
@@ -0,0 +1,129 @@
+"""Profiling of the requests that are sent to solr.
+
+While a :class:`QueryProfile` is active, every request that is sent to solr
+records how long solr took to process the query (``QTime``), how long it took
+until the response was received, how many bytes were received and how long
+parsing the response took. The active profile is kept in a context variable,
+concurrent searches in other threads or tasks are hence not mixed up.
+"""
+from __future__ import annotations
+
+import contextvars
+import threading
+import time
+import urllib.parse
+from typing import Any, List, NamedTuple, Optional
+
+RequestProfile = NamedTuple(
+    "RequestProfile",
+    [
+        ("query", str),
+        ("qtime", Optional[int]),
+        ("wall_time", float),
+        ("num_bytes", int),
+        ("parse_time", float),
+        ("num_docs", Optional[int]),
+    ],
+)
+
+_current_profile: contextvars.ContextVar[
+    Optional[QueryProfile]
+] = contextvars.ContextVar("solr_query_profile", default=None)
+
+
+class QueryProfile:
+    """Collect the profiles of all solr requests of a search.
+
+    Requests are only recorded in contexts where the profile has been
+    activated, see :meth:`activate`.
+    """
+
+    def __init__(self) -> None:
+        self.requests: List[RequestProfile] = []
+        self.start = time.perf_counter()
+        self.end: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def activate(self) -> contextvars.Token:
+        """Record all solr requests of the current context in this profile."""
+        return _current_profile.set(self)
+
+    def add(
+        self,
+        query: str,
+        wall_time: float,
+        num_bytes: int,
+        parse_time: float,
+        response: Optional[dict[str, Any]] = None,
+        num_docs: Optional[int] = None,
+    ) -> None:
+        """Add the profile of a request.
+
+        :param query: the url of the request.
+        :param wall_time: the time in seconds until the response was received.
+        :param num_bytes: the number of bytes that were received.
+        :param parse_time: the time in seconds it took to parse the response.
+        :param response: the parsed response, used to get solr's QTime and the number of documents.
+        :param num_docs: the number of received documents, if the response isn't available.
+        """
+        response = response or {}
+        qtime = response.get("responseHeader", {}).get("QTime")
+        if "docs" in response.get("response", {}):
+            num_docs = len(response["response"]["docs"])
+        with self._lock:
+            self.requests.append(
+                RequestProfile(
+                    query=urllib.parse.unquote_plus(query),
+                    qtime=qtime,
+                    wall_time=wall_time,
+                    num_bytes=num_bytes,
+                    parse_time=parse_time,
+                    num_docs=num_docs,
+                )
+            )
+
+    def stop(self) -> None:
+        """Stop the clock of the profile."""
+        if self.end is None:
+            self.end = time.perf_counter()
+
+    @property
+    def elapsed(self) -> float:
+        """The time in seconds since the profile was started."""
+        return (self.end or time.perf_counter()) - self.start
+
+    @property
+    def num_pages(self) -> int:
+        """The number of requests that returned documents."""
+        return len([r for r in self.requests if r.num_docs is not None])
+
+    def report(self) -> str:
+        """Create a human readable report of the profile."""
+        lines = ["Solr query profile:"]
+        for num, req in enumerate(self.requests, 1):
+            qtime = "-" if req.qtime is None else req.qtime
+            docs = "-" if req.num_docs is None else req.num_docs
+            lines.append(
+                f"  [{num}] QTime: {qtime} ms, wall: {req.wall_time * 1000:.1f} ms, "
+                f"received: {req.num_bytes} B, parse: {req.parse_time * 1000:.1f} ms, "
+                f"docs: {docs}"
+            )
+            lines.append(f"      {req.query}")
+        qtime = sum(r.qtime or 0 for r in self.requests)
+        wall_time = sum(r.wall_time for r in self.requests)
+        parse_time = sum(r.parse_time for r in self.requests)
+        num_bytes = sum(r.num_bytes for r in self.requests)
+        other = max(self.elapsed - wall_time - parse_time, 0)
+        lines += [
+            f"  round trips: {len(self.requests)}, pages: {self.num_pages}",
+            f"  total QTime: {qtime} ms, wall: {wall_time * 1000:.1f} ms, "
+            f"received: {num_bytes} B, parse: {parse_time * 1000:.1f} ms",
+            f"  elapsed: {self.elapsed * 1000:.1f} ms "
+            f"(of which {other * 1000:.1f} ms outside of solr requests)",
+        ]
+        return "\n".join(lines)
+
+
+def get_profile() -> Optional[QueryProfile]:
+    """Get the profile that is active in the current context, if any."""
+    return _current_profile.get()
@@ -0,0 +1,77 @@
+"""Suggestions of facet values for searches without results.
+
+A mistyped facet value doesn't match any document of the databrowser. The
+values of such facets are looked up in a :class:`TrigramIndex` of all
+values of the facet, which yields ranked suggestions of known values. The
+indexes are built from the facet vocabularies once and kept for as long as
+the index of the core doesn't change.
+"""
+from __future__ import annotations
+
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Tuple
+
+from evaluation_system.misc.utils import TrigramIndex
+
+_indexes: Dict[Tuple[str, str], Tuple[Any, TrigramIndex]] = {}
+_lock = threading.Lock()
+
+
+def get_facet_index(
+    location: str,
+    facet: str,
+    version: Any,
+    get_values: Callable[[], Iterable[str]],
+) -> TrigramIndex:
+    """Get the suggestion index of a facet.
+
+    :param location: the location of the core, e.g. its url.
+    :param facet: the name of the facet.
+    :param version: the version of the index of the core, the suggestion
+     index is rebuilt if the version changes.
+    :param get_values: function retrieving all values of the facet.
+    """
+    key = (location, facet)
+    with _lock:
+        cached = _indexes.get(key)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+    index = TrigramIndex(get_values())
+    with _lock:
+        _indexes[key] = (version, index)
+    return index
+
+
+def suggest_values(
+    facets: Iterable[str],
+    get_index: Callable[[str], TrigramIndex],
+    limit: int = 5,
+    **partial_dict: Any,
+) -> Dict[str, List[str]]:
+    """Suggest known values for the unknown facet values of a search.
+
+    Values with wildcards and negated facets are skipped.
+
+    :param facets: the facets of the core.
+    :param get_index: function getting the suggestion index of a facet.
+    :param limit: the maximum number of suggestions per facet.
+    :param partial_dict: the search.
+    :returns: the ranked suggestions of the facets with unknown values.
+    """
+    facets = set(facets)
+    out: Dict[str, List[str]] = {}
+    for facet, values in partial_dict.items():
+        if facet not in facets:
+            continue
+        for value in values if isinstance(values, list) else [values]:
+            value = str(value).strip('"').lower()
+            if not value or "*" in value or "?" in value:
+                continue
+            index = get_index(facet)
+            if value in index:
+                continue
+            suggestions = out.setdefault(facet, [])
+            for suggestion in index.suggest(value, limit=limit):
+                if suggestion not in suggestions and len(suggestions) < limit:
+                    suggestions.append(suggestion)
+    return {f: s for (f, s) in out.items() if s}
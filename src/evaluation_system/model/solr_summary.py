@@ -0,0 +1,148 @@
+"""Materialised facet summaries of the databrowser cores.
+
+Listing the facets of the whole databrowser, e.g. with
+:py:meth:`freva.facet_search` without any search facets or by the shell
+completion, makes solr count the values of all facets of all documents. The
+value counts of all facets of a core are hence kept in a small json file
+that is updated incrementally whenever data is ingested or deleted. The
+summary is tagged with the version of the index it describes and is only
+used as long as the core reports the very same version, searches fall back
+to querying solr otherwise. Processes changing a core lock its summary, such
+that concurrent ingests don't overwrite each other's counts.
+"""
+from __future__ import annotations
+
+import fcntl
+import json
+import os
+from pathlib import Path
+from typing import IO, Any, Dict, Iterable, List, Optional, Union
+
+from evaluation_system.misc import logger
+
+
+def get_summary_path(summary_dir: Union[str, os.PathLike], core_url: str) -> Path:
+    """Get the path of the facet summary of a core.
+
+    :param summary_dir: the directory holding the summaries.
+    :param core_url: the url of the core.
+    """
+    name = core_url.partition("://")[-1].strip("/")
+    for char in ("/", ":"):
+        name = name.replace(char, "_")
+    return Path(summary_dir).expanduser().absolute() / f"{name}.json"
+
+
+class FacetSummary:
+    """Value counts of all facets of a core.
+
+    :param path: the path of the json file of the summary.
+    :param counts: the number of documents of each value of each facet.
+    :param version: the version of the index the counts belong to, None if
+     the counts aren't complete.
+    """
+
+    def __init__(
+        self,
+        path: Union[str, os.PathLike],
+        counts: Optional[Dict[str, Dict[str, int]]] = None,
+        version: Any = None,
+    ) -> None:
+        self.path = Path(path)
+        self.counts: Dict[str, Dict[str, int]] = counts or {}
+        self.version = version
+        self._lock_file: Optional[IO[str]] = None
+
+    @classmethod
+    def load(cls, path: Union[str, os.PathLike], lock: bool = False) -> "FacetSummary":
+        """Load a summary, an empty summary without version if there is none.
+
+        :param path: the path of the json file of the summary.
+        :param lock: lock the summary against changes of other processes
+         until it is released, see :meth:`release`.
+        """
+        lock_file: Optional[IO[str]] = None
+        if lock:
+            path = Path(path)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            lock_file = path.with_name(f".{path.name}.lock").open("a")
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            with Path(path).open("r") as stream:
+                entry = json.load(stream)
+            summary = cls(path, entry["counts"], entry["version"])
+        except (OSError, ValueError, KeyError, TypeError):
+            summary = cls(path)
+        summary._lock_file = lock_file
+        return summary
+
+    def release(self) -> None:
+        """Release the lock of the summary, if it is locked."""
+        if self._lock_file is not None:
+            fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+            self._lock_file.close()
+            self._lock_file = None
+
+    def _add(self, facet: str, value: str, count: int) -> None:
+        counts = self.counts.setdefault(facet, {})
+        counts[value] = counts.get(value, 0) + count
+        if counts[value] <= 0:
+            del counts[value]
+
+    def add(
+        self, metadata: Dict[str, Any], exclude: Iterable[str] = (), sign: int = 1
+    ) -> None:
+        """Count the facet values of a document.
+
+        :param metadata: the metadata of the document.
+        :param exclude: the fields of the document that aren't facets.
+        :param sign: -1 to remove a document from the counts.
+        """
+        exclude = set(exclude)
+        for facet, values in metadata.items():
+            if facet in exclude:
+                continue
+            for value in values if isinstance(values, list) else [values]:
+                if value is not None and value != "":
+                    # the indexed values are lower case
+                    self._add(facet, str(value).lower(), sign)
+
+    def add_facet_counts(self, facets: Dict[str, List[Any]], sign: int = 1) -> None:
+        """Add the facet counts of a solr facet query.
+
+        :param facets: the values and their counts, alternating, of each facet.
+        :param sign: -1 to remove the counts.
+        """
+        for facet, values in facets.items():
+            for value, count in zip(values[::2], values[1::2]):
+                self._add(facet, str(value), sign * int(count))
+
+    def get_facets(
+        self, facets: Iterable[str], limit: int = -1, offset: int = 0
+    ) -> Dict[str, List[Any]]:
+        """Get the counts of facets like a solr facet query.
+
+        :param facets: the names of the facets.
+        :param limit: the maximum number of values per facet, -1 for all.
+        :param offset: the number of values per facet that are skipped.
+        :returns: the values, sorted by index, and their counts, alternating.
+        """
+        out: Dict[str, List[Any]] = {}
+        for facet in facets:
+            values = sorted(self.counts.get(facet, {}).items())[offset:]
+            if limit >= 0:
+                values = values[:limit]
+            out[facet] = [v for value_count in values for v in value_count]
+        return out
+
+    def save(self, version: Any) -> None:
+        """Store the summary as the summary of a version of the index."""
+        self.version = version
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_name(f".{self.path.name}.{os.getpid()}")
+            with tmp_path.open("w") as stream:
+                json.dump({"version": version, "counts": self.counts}, stream)
+            tmp_path.replace(self.path)
+        except (OSError, TypeError) as error:
+            logger.error("Could not write facet summary %s: %s", self.path, error)
@@ -0,0 +1,169 @@
+"""Spatial extent of data files.
+
+At ingest the latitude and longitude coordinates of netCDF files are read
+to get the bounding box of the data. Bounding boxes are stored in the
+``bbox`` field of the databrowser as ``ENVELOPE(west, east, north, south)``,
+longitudes range from -180 to 180. Boxes that cross the date line have a
+western bound that is larger than their eastern bound.
+"""
+from __future__ import annotations
+
+import math
+import re
+from concurrent.futures import Executor
+from pathlib import Path
+from typing import Any, Iterable, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+BBox = Tuple[float, float, float, float]
+"""A bounding box: west, south, east and north."""
+
+BBOX_SUFFIXES = (".nc", ".nc4")
+"""The suffixes of the files whose spatial extent is read at ingest."""
+
+_LAT_UNITS = ("degrees_north", "degree_north", "degree_n", "degrees_n")
+_LON_UNITS = ("degrees_east", "degree_east", "degree_e", "degrees_e")
+
+
+def _wrap(lon: float, east: bool = False) -> float:
+    """Wrap a longitude into -180 to 180, eastern bounds keep 180."""
+    if east:
+        return -_wrap(-lon)
+    return (lon + 180) % 360 - 180
+
+
+def normalize_bbox(west: float, south: float, east: float, north: float) -> BBox:
+    """Normalise a bounding box to longitudes from -180 to 180.
+
+    :raises ValueError: if the latitudes are invalid.
+    """
+    if not -90 <= south <= north <= 90:
+        raise ValueError("Latitudes of bounding boxes range from -90 to 90")
+    if east - west >= 360:
+        return (-180.0, south, 180.0, north)
+    return (_wrap(west), south, _wrap(east, east=True), north)
+
+
+def parse_bbox(bbox: Union[str, Sequence[Any]]) -> BBox:
+    """Parse a bounding box given as ``west,south,east,north``.
+
+    :param bbox: the comma separated bounds, or the bounds themselves.
+    :raises ValueError: if the bounding box is invalid.
+    """
+    if not isinstance(bbox, str):
+        bbox = ",".join(map(str, bbox))
+    try:
+        west, south, east, north = (float(v) for v in bbox.split(","))
+    except ValueError as error:
+        raise ValueError(
+            "Bounding boxes have to be given as west,south,east,north"
+        ) from error
+    return normalize_bbox(west, south, east, north)
+
+
+def to_envelope(bbox: BBox) -> str:
+    """Convert a bounding box to solr's ``ENVELOPE`` syntax."""
+    west, south, east, north = (round(v, 6) for v in bbox)
+    return f"ENVELOPE({west}, {east}, {north}, {south})"
+
+
+def from_envelope(envelope: str) -> BBox:
+    """Get the bounding box of solr's ``ENVELOPE`` syntax."""
+    match = re.fullmatch(r"\s*ENVELOPE\(([^)]*)\)\s*", envelope, re.IGNORECASE)
+    if match is None:
+        raise ValueError(f"Invalid envelope: {envelope}")
+    west, east, north, south = (float(v) for v in match.group(1).split(","))
+    return (west, south, east, north)
+
+
+def _lon_ranges(bbox: BBox) -> List[Tuple[float, float]]:
+    west, _, east, _ = bbox
+    if west <= east:
+        return [(west, east)]
+    return [(west, 180.0), (-180.0, east)]
+
+
+def intersects(bbox: BBox, other: BBox) -> bool:
+    """Check if two bounding boxes intersect."""
+    if bbox[1] > other[3] or other[1] > bbox[3]:
+        return False
+    return any(
+        w1 <= e2 and w2 <= e1
+        for (w1, e1) in _lon_ranges(bbox)
+        for (w2, e2) in _lon_ranges(other)
+    )
+
+
+def _find_coord(dataset: Any, standard_name: str, units: Tuple[str, ...]) -> Any:
+    """Find the latitude or longitude variable of a netCDF dataset."""
+    by_name = None
+    for name, var in dataset.variables.items():
+        if getattr(var, "standard_name", "") == standard_name:
+            return var
+        if str(getattr(var, "units", "")).lower() in units:
+            return var
+        if name.lower() in (standard_name, standard_name[:3]):
+            by_name = var
+    return by_name
+
+
+def _get_extent(dataset: Any, var: Any) -> Optional[Tuple[float, float]]:
+    """Get the extent of a coordinate including the cells at its edges."""
+    bounds = getattr(var, "bounds", "")
+    half_cell = 0.0
+    if bounds in dataset.variables:
+        values = np.ma.masked_invalid(dataset.variables[bounds][:])
+    else:
+        values = np.ma.masked_invalid(var[:])
+        if values.ndim == 1 and values.count() > 1:
+            half_cell = float(np.abs(np.ma.diff(values)).max()) / 2
+    if not values.count():
+        return None
+    return float(values.min()) - half_cell, float(values.max()) + half_cell
+
+
+def read_bbox(file: Union[str, Path]) -> Optional[BBox]:
+    """Read the bounding box of a netCDF file.
+
+    The extent is derived from the latitude and longitude coordinates, or
+    their cell bounds. Files without such coordinates, or files that can't
+    be read, have no bounding box.
+
+    :param file: the path of the netCDF file.
+    """
+    import netCDF4
+
+    try:
+        with netCDF4.Dataset(file) as dataset:
+            dataset.set_auto_mask(True)
+            lat = _find_coord(dataset, "latitude", _LAT_UNITS)
+            lon = _find_coord(dataset, "longitude", _LON_UNITS)
+            if lat is None or lon is None:
+                return None
+            lats, lons = _get_extent(dataset, lat), _get_extent(dataset, lon)
+    except (OSError, RuntimeError, ValueError, KeyError):
+        return None
+    if lats is None or lons is None:
+        return None
+    if not all(map(math.isfinite, lats + lons)):
+        return None
+    south, north = max(lats[0], -90.0), min(lats[1], 90.0)
+    try:
+        return normalize_bbox(lons[0], south, lons[1], north)
+    except ValueError:
+        return None
+
+
+def read_bboxes(
+    files: Iterable[Union[str, Path]], executor: Optional[Executor] = None
+) -> List[Optional[BBox]]:
+    """Read the bounding boxes of many netCDF files.
+
+    :param files: the paths of the netCDF files.
+    :param executor: the pool of workers that read the files in parallel,
+     the files are read one after another by default.
+    """
+    if executor is None:
+        return [read_bbox(file) for file in files]
+    return list(executor.map(read_bbox, files, chunksize=16))
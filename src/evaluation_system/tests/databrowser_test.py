@@ -1,4 +1,6 @@
 import shlex
+import shutil
+from pathlib import Path
 
 import pytest
 
@@ -207,3 +209,504 @@ fs_type: posix
     )
     assert target["time_frequency"] == res["time_frequency"]
     assert target["ensemble"] == res["ensemble"]
+
+
+def test_async_databrowser(dummy_solr):
+    import asyncio
+
+    from freva import (
+        async_count_values,
+        async_databrowser,
+        async_facet_search,
+        count_values,
+        databrowser,
+        facet_search,
+    )
+
+    async def search():
+        files = [f async for f in async_databrowser(batch_size=1, prefetch=2)]
+        num_files, facets = await asyncio.gather(
+            async_count_values(), async_facet_search(facet="variable")
+        )
+        return files, num_files, facets
+
+    files, num_files, facets = asyncio.run(search())
+    assert files == list(databrowser(batch_size=1))
+    assert files == list(databrowser(batch_size=1, prefetch=1))
+    assert num_files == count_values() == len(files)
+    assert facets == facet_search(facet="variable")
+
+    async def collect(**kwargs):
+        return [f async for f in async_databrowser(batch_size=1, **kwargs)]
+
+    for kwargs in ({"order": "grouped"}, {"fields": ["variable"]}):
+        assert asyncio.run(collect(**kwargs)) == list(databrowser(**kwargs))
+
+    async def first():
+        async for f in async_databrowser(batch_size=1):
+            return f
+
+    # leaving the search early must not block the event loop from closing
+    assert asyncio.run(first()) == files[0]
+
+
+def test_stream_databrowser(dummy_solr):
+    from freva import databrowser
+
+    files = list(databrowser(multiversion=True))
+    assert list(databrowser(multiversion=True, stream=True)) == files
+    assert list(databrowser(multiversion=True, stream=True, rows=2)) == files[:2]
+    assert list(databrowser(variable="whoop", stream=True)) == []
+
+
+def test_search_summary(dummy_solr, capsys):
+    from freva import count_values, databrowser, search_summary
+    from freva.cli.databrowser import main as run
+
+    summary = search_summary(facet="variable", max_results=2)
+    assert summary["count"] == count_values()
+    assert summary["facets"] == count_values(facet="variable", multiversion=False)
+    assert summary["files"] == list(databrowser())[:2]
+    assert search_summary(variable="whhoop")["files"] == []
+    _ = capsys.readouterr()
+    run(["--summary", "--summary-rows", "1", "--facet", "variable"])
+    lines = capsys.readouterr().out.strip().split("\n")
+    assert lines[0] == str(summary["count"])
+    assert lines[1].startswith("variable: ")
+    assert lines[2:] == summary["files"][:1]
+    run(["--summary", "variable=whhoop", "--export", "csv"])
+    assert capsys.readouterr().out.strip().split("\n")[0] == "0"
+
+
+def test_databrowser_fields(dummy_solr):
+    from freva import databrowser
+
+    files = list(databrowser())
+    docs = list(databrowser(fields=["variable", "time"]))
+    assert [d["file"] for d in docs] == files
+    assert all(set(d) == {"file", "variable", "time"} for d in docs)
+    frame = databrowser(as_frame=True, fields=["variable", "time"], batch_size=1)
+    assert list(frame["file"]) == files
+    assert list(frame.columns) == ["file", "variable", "time_start", "time_end"]
+    assert frame["variable"].dtype == "category"
+    assert str(frame["time_start"].dtype).startswith("datetime64")
+    assert (frame["time_start"] <= frame["time_end"]).all()
+    frame = databrowser(as_frame=True, multiversion=True)
+    assert len(frame) == 5
+    assert {"variable", "project", "time_start"} <= set(frame.columns)
+    assert databrowser(as_frame=True, variable="whhoop").empty
+
+
+def test_frame_time_range():
+    import pandas as pd
+
+    from freva._databrowser import _to_frame
+
+    # paleo and scenario time ranges outside of nanosecond time stamps
+    page = [
+        {"file": "a", "time": "[0850-01-01T00:00:00Z TO 2300-12-31T23:59:59Z]"},
+        {"file": "b", "time": "[0000-01-01T00:00:00Z TO 9999-12-31T23:59:59Z]"},
+        {"file": "c"},
+    ]
+    frame = _to_frame([page], "file", ["time"])
+    assert list(frame["time_start"][:2].dt.year) == [850, 0]
+    assert list(frame["time_end"][:2].dt.year) == [2300, 9999]
+    assert frame["time_end"][0] == pd.Timestamp("2300-12-31T23:59:59")
+    assert frame["time_start"].isna().tolist() == [False, False, True]
+
+
+def test_batch_databrowser(dummy_solr):
+    from freva import batch_databrowser, databrowser
+
+    searches = {var: {"variable": var} for var in ("ua", "tauu", "whhoop")}
+    results = batch_databrowser(searches, max_workers=2, multiversion=True)
+    assert list(results) == list(searches)
+    for var, files in results.items():
+        assert files == list(databrowser(variable=var, multiversion=True))
+    assert results["whhoop"] == []
+    results = batch_databrowser(list(searches.values()))
+    assert results == [list(databrowser(**s)) for s in searches.values()]
+
+
+def test_profile_databrowser(dummy_solr, capsys):
+    from freva import count_values, databrowser, facet_search
+    from freva.cli.databrowser import main as run
+
+    _ = capsys.readouterr()
+    assert count_values(profile=True) == count_values()
+    err = capsys.readouterr().err
+    assert "QTime" in err and "round trips" in err
+    files = databrowser(batch_size=1, profile=True, prefetch=1)
+    assert "round trips" not in capsys.readouterr().err
+    assert list(files) == list(databrowser())
+    err = capsys.readouterr().err
+    assert "wt=csv" in err and "round trips: 4" in err
+    assert facet_search(facet="variable", profile=True)
+    assert "Solr query profile" in capsys.readouterr().err
+    run(["--profile", "--count"])
+    captured = capsys.readouterr()
+    assert captured.out.strip() == str(count_values())
+    assert "round trips" in captured.err
+
+
+def test_result_order(dummy_solr, capsys):
+    import contextvars
+
+    from evaluation_system.model.solr import SolrFindFiles
+    from evaluation_system.model.solr_profile import QueryProfile
+    from freva import count_values, databrowser
+    from freva.cli.databrowser import main as run
+
+    files = list(databrowser(multiversion=True))
+    unsorted = list(databrowser(multiversion=True, order="unsorted", batch_size=2))
+    assert sorted(unsorted) == sorted(files)
+    assert len(list(databrowser(order="unsorted", rows=2))) == 2
+    assert len(list(databrowser(order="unsorted", rows=2, batch_size=1))) == 2
+    # all results after the first page are retrieved by one request
+    profile = QueryProfile()
+
+    def unsorted_pages():
+        profile.activate()
+        search = SolrFindFiles(core="files")
+        return list(search._iter_pages(batch_size=2, order="unsorted"))
+
+    pages = contextvars.copy_context().run(unsorted_pages)
+    assert [len(p) for p in pages] == [2, 2, 1]
+    assert sorted(f for p in pages for f in p) == sorted(files)
+    assert len(profile.requests) == 2
+    datasets = list(databrowser(multiversion=True, order="grouped"))
+    assert len(datasets) == len({d for d, _ in datasets})
+    assert sum(n for _, n in datasets) == count_values(multiversion=True)
+    assert (
+        list(databrowser(order="grouped", batch_size=1, rows=1))
+        == list(databrowser(order="grouped"))[:1]
+    )
+    assert list(databrowser(order="grouped", variable="whhoop")) == []
+    with pytest.raises(ValueError):
+        databrowser(order="grouped", fields=["variable"])
+    with pytest.raises(ValueError):
+        databrowser(order="unsorted", stream=True)
+    _ = capsys.readouterr()
+    run(["--order", "grouped", "--multiversion"])
+    lines = capsys.readouterr().out.strip().split("\n")
+    assert lines == [f"{d} ({n})" for d, n in datasets]
+
+
+def test_dataset_search(dummy_solr):
+    from freva import count_values, databrowser, dataset_search
+
+    datasets = dataset_search(multiversion=True)
+    assert [d["dataset"] for d in datasets] == sorted(d["dataset"] for d in datasets)
+    assert sum(d["num_files"] for d in datasets) == count_values(multiversion=True)
+    assert all(d["time_start"] <= d["time_end"] for d in datasets)
+    assert sum(len(d["versions"]) for d in datasets) >= len(dataset_search())
+    assert dataset_search(multiversion=True, max_results=1) == datasets[:1]
+    assert dataset_search(variable="whhoop") == []
+    ua = dataset_search(variable="ua", multiversion=True)
+    assert sum(d["num_files"] for d in ua) == len(
+        list(databrowser(variable="ua", multiversion=True))
+    )
+
+
+def test_file_metadata(dummy_solr):
+    import mock
+
+    from evaluation_system.model.solr_core import SolrCore
+    from freva import databrowser, facet_search, file_metadata
+
+    files = list(databrowser(multiversion=True))
+    with mock.patch.object(
+        SolrCore, "get_docs", autospec=True, side_effect=SolrCore.get_docs
+    ) as get_docs:
+        metadata = file_metadata(files + ["/tmp/whhoop.nc"], batch_size=2)
+        assert get_docs.call_count == 3
+    assert list(metadata) == files
+    for file in files:
+        facets = facet_search(file=file, multiversion=True)
+        assert metadata[file]["variable"] == facets["variable"][0]
+        assert metadata[file]["time"]
+    assert file_metadata(files[0]) == {files[0]: metadata[files[0]]}
+    assert file_metadata([]) == {}
+
+
+def test_export_catalog(dummy_solr, tmp_path, capsys):
+    import json
+
+    import pandas as pd
+
+    from freva import databrowser, export_catalog
+    from freva.cli.databrowser import main as run
+
+    files = list(databrowser(multiversion=True))
+    catalog = export_catalog(tmp_path / "cat.csv", multiversion=True, batch_size=2)
+    frame = pd.read_csv(catalog)
+    assert list(frame["file"]) == files
+    assert {"variable", "project", "time_start", "time_end"} <= set(frame.columns)
+    catalog = export_catalog(tmp_path / "cat.ndjson", format="ndjson", batch_size=2)
+    rows = [json.loads(line) for line in catalog.read_text().splitlines()]
+    assert [r["file"] for r in rows] == list(databrowser())
+    catalog = export_catalog(tmp_path / "esm", format="intake-esm", variable="ua")
+    description = json.loads(catalog.read_text())
+    assert catalog.with_suffix(".csv").name == description["catalog_file"]
+    assert len(pd.read_csv(catalog.with_suffix(".csv"))) == len(
+        list(databrowser(variable="ua"))
+    )
+    catalog = export_catalog(tmp_path / "empty.csv", variable="whhoop")
+    assert "time_start" in pd.read_csv(catalog).columns
+    with pytest.raises(ValueError):
+        export_catalog(tmp_path / "cat.xls", format="xls")
+    _ = capsys.readouterr()
+    output = tmp_path / "cli.csv"
+    run(["--export", "csv", "--output", str(output), "--multiversion"])
+    assert capsys.readouterr().out.strip() == str(output)
+    assert list(pd.read_csv(output)["file"]) == files
+    pytest.importorskip("pyarrow")
+    catalog = export_catalog(tmp_path / "cat.parquet", format="parquet", batch_size=2)
+    assert list(pd.read_parquet(catalog)["file"]) == list(databrowser())
+
+
+def test_open_dataset(dummy_solr, tmp_path):
+    pytest.importorskip("kerchunk")
+    pytest.importorskip("zarr")
+    import numpy as np
+    import pandas as pd
+    import xarray as xr
+
+    from evaluation_system.model.solr_core import SolrCore
+    from freva import open_dataset
+
+    data_dir = (
+        Path(dummy_solr.tmpdir)
+        / "cmip5/output1/MPI-M/MPI-ESM-LR/amip/mon/atmos/Amon/r1i1p1/v20230101/tas"
+    )
+    data_dir.mkdir(parents=True)
+    for year in (2000, 2001):
+        time = pd.date_range(f"{year}-01-01", periods=12, freq="MS")
+        dset = xr.Dataset(
+            {"tas": (("time", "lat"), np.full((12, 2), float(year)))},
+            coords={"time": time, "lat": [0.0, 1.0]},
+        )
+        dset.to_netcdf(
+            data_dir / f"tas_Amon_MPI-ESM-LR_amip_r1i1p1_{year}01-{year}12.nc"
+        )
+    try:
+        SolrCore.load_fs(
+            data_dir,
+            abort_on_errors=True,
+            core_all_files=dummy_solr.all_files,
+            core_latest=dummy_solr.latest,
+            reference_dir=tmp_path,
+        )
+        references = list(tmp_path.glob("*.json"))
+        assert len(references) == 1
+        dset = open_dataset(experiment="amip", variable="tas")
+        assert dset.sizes["time"] == 24
+        assert dset["tas"].isel(time=-1).values.tolist() == [2001.0, 2001.0]
+        dset = open_dataset(experiment="amip", time="2001-06 to 2001-08")
+        assert dset.sizes["time"] == 3
+        references[0].unlink()
+        # files without reference are opened directly
+        assert open_dataset(experiment="amip").sizes["time"] == 24
+        with pytest.raises(ValueError):
+            open_dataset(experiment="whhoop")
+    finally:
+        dummy_solr.all_files._del_file_pattern(data_dir)
+        dummy_solr.latest._del_file_pattern(data_dir)
+        shutil.rmtree(data_dir.parents[7])
+
+
+def test_bbox_search(dummy_solr):
+    import numpy as np
+    import xarray as xr
+
+    from evaluation_system.model.solr_core import SolrCore
+    from evaluation_system.model.spatial import intersects, parse_bbox
+    from freva import databrowser, facet_search
+
+    assert parse_bbox("170,-5,190,5") == (170.0, -5.0, -170.0, 5.0)
+    assert parse_bbox([0, -90, 360, 90]) == (-180.0, -90.0, 180.0, 90.0)
+    assert intersects(parse_bbox("170,-5,190,5"), parse_bbox("-175,0,-172,1"))
+    with pytest.raises(ValueError):
+        parse_bbox("0,80,10,100")
+    data_dir = (
+        Path(dummy_solr.tmpdir)
+        / "cmip5/output1/MPI-M/MPI-ESM-LR/amip/mon/atmos/Amon/r1i1p1/v20230101"
+    )
+    regions = {
+        "tas": ([40.0, 50.0, 60.0], [-10.0, 0.0, 10.0]),
+        "pr": ([-5, 5], [170, 190]),
+    }
+    for variable, (lats, lons) in regions.items():
+        (data_dir / variable).mkdir(parents=True)
+        dset = xr.Dataset(
+            {variable: (("lat", "lon"), np.zeros((len(lats), len(lons))))},
+            coords={
+                "lat": ("lat", lats, {"units": "degrees_north"}),
+                "lon": ("lon", lons, {"units": "degrees_east"}),
+            },
+        )
+        dset.to_netcdf(
+            data_dir
+            / variable
+            / f"{variable}_Amon_MPI-ESM-LR_amip_r1i1p1_200001-200012.nc"
+        )
+    try:
+        SolrCore.load_fs(
+            data_dir,
+            abort_on_errors=True,
+            core_all_files=dummy_solr.all_files,
+            core_latest=dummy_solr.latest,
+            bbox_workers=2,
+        )
+        europe = list(databrowser(experiment="amip", bbox="-20,30,20,70"))
+        assert len(europe) == 1 and "tas_Amon" in europe[0]
+        pacific = list(databrowser(experiment="amip", bbox=(175, 0, 185, 3)))
+        assert len(pacific) == 1 and "pr_Amon" in pacific[0]
+        assert facet_search(bbox="-180,-1,-175,1", facet="variable") == {
+            "variable": ["pr"]
+        }
+        assert not list(databrowser(bbox="100,-80,120,-70"))
+        with pytest.raises(ValueError):
+            list(databrowser(bbox="0,10"))
+    finally:
+        dummy_solr.all_files._del_file_pattern(data_dir)
+        dummy_solr.latest._del_file_pattern(data_dir)
+        shutil.rmtree(data_dir.parents[6])
+
+
+def test_suggestions(dummy_solr, caplog):
+    from evaluation_system.model import solr_suggest
+    from freva import count_values, databrowser, search_summary
+
+    assert count_values(model="hadcm") == 0
+    assert "model=hadcm3" in caplog.text
+    summary = search_summary(model="hadcm", variable="ua")
+    assert summary["count"] == 0
+    assert summary["suggestions"] == {"model": ["hadcm3"]}
+    assert search_summary(model="hadcm3")["suggestions"] == {}
+    caplog.clear()
+    assert list(databrowser(project="cmip*", variable="uaa")) == []
+    assert "variable=ua" in caplog.text
+    # the suggestion index is only built once per version of the index
+    key = [k for k in solr_suggest._indexes if k[1] == "model"][0]
+    index = solr_suggest._indexes[key][1]
+    search_summary(model="hadcm")
+    assert solr_suggest._indexes[key][1] is index
+
+
+def test_facet_pagination(dummy_solr, capsys):
+    from freva import count_values, facet_search, facet_values
+    from freva.cli.databrowser import main as run
+
+    counts = count_values(facet="variable", multiversion=True)["variable"]
+    values = list(facet_values("variable", page_size=1, multiversion=True))
+    assert values == sorted(counts.items())
+    assert list(facet_values("variable", offset=1, limit=1, multiversion=True)) == [
+        values[1]
+    ]
+    by_count = list(facet_values("variable", sort="count", multiversion=True))
+    assert [c for _, c in by_count] == sorted(counts.values(), reverse=True)
+    assert list(facet_values("variable", prefix="U", multiversion=True)) == [
+        v for v in values if v[0].startswith("u")
+    ]
+    # invalid arguments are reported when calling, not when iterating
+    with pytest.raises(ValueError):
+        facet_values("variable", sort="foo")
+    with pytest.raises(ValueError):
+        facet_values("variable", time="2000", time_select="foo")
+    page = facet_search(facet="variable", facet_limit=1, facet_offset=1)
+    assert page["variable"] == facet_search(facet="variable")["variable"][1:2]
+    _ = capsys.readouterr()
+    run(["--facet", "variable", "--facet-limit", "1"])
+    out = capsys.readouterr().out
+    assert out.strip().endswith(",...") and out.count(",") == 1
+
+
+def test_facet_summary(dummy_solr, tmp_path):
+    from evaluation_system.misc import config
+    from evaluation_system.model.solr_core import SolrCore
+    from evaluation_system.model.solr_summary import FacetSummary, get_summary_path
+    from freva import count_values, facet_search
+
+    facets = facet_search()
+    counts = count_values(facet="variable", multiversion=True)
+    data_dir = Path(dummy_solr.tmpdir) / "cmip5/output1/MOHC/HadCM3/historical"
+    config._config[config.SOLR_SUMMARY_DIR] = str(tmp_path)
+    try:
+        # the summaries are built by the first ingest and updated afterwards
+        for _ in range(2):
+            SolrCore.load_fs(
+                data_dir,
+                abort_on_errors=True,
+                core_all_files=dummy_solr.all_files,
+                core_latest=dummy_solr.latest,
+            )
+            assert facet_search() == facets
+            assert count_values(facet="variable", multiversion=True) == counts
+        path = get_summary_path(tmp_path, dummy_solr.latest.core_url)
+        summary = FacetSummary.load(path)
+        assert summary.version == dummy_solr.latest.index_version()
+        summary.counts["variable"] = {"foo": 1}
+        summary.save(summary.version)
+        assert facet_search(facet="variable") == {"variable": ["foo"]}
+        assert facet_search(project="cmip5") == facets
+        summary.save(-1)
+        assert facet_search() == facets
+        # entries that are replaced and changes of others aren't counted twice
+        core = dummy_solr.all_files
+        file = next(data_dir.rglob("*.nc"))
+        ((_, metadata),) = SolrCore._get_metadata_from_path(file, True, (".nc",))
+        for change_by_others in (False, True):
+            summary = core._open_summary(tmp_path)
+            SolrCore._add_to_summary(summary, metadata)
+            if change_by_others:
+                core.post([metadata])
+            core._post_to_summary([metadata], summary, [metadata["file"]])
+            assert (summary.version is None) == change_by_others
+            core._save_summary(summary)
+            assert count_values(facet="variable", multiversion=True) == counts
+            path = get_summary_path(tmp_path, core.core_url)
+            assert FacetSummary.load(path).version == core.status()["index"]["version"]
+    finally:
+        config._config.pop(config.SOLR_SUMMARY_DIR, None)
+
+
+def test_facet_summary_lock(tmp_path):
+    import multiprocessing
+    from queue import Empty
+
+    from evaluation_system.model.solr_summary import FacetSummary
+
+    def _lock(path, queue):
+        summary = FacetSummary.load(path, lock=True)
+        queue.put("locked")
+        summary.release()
+
+    path = tmp_path / "summary.json"
+    summary = FacetSummary.load(path, lock=True)
+    queue = multiprocessing.get_context("fork").Queue()
+    proc = multiprocessing.get_context("fork").Process(target=_lock, args=(path, queue))
+    proc.start()
+    # the other process waits for the lock
+    with pytest.raises(Empty):
+        queue.get(timeout=0.5)
+    summary.release()
+    assert queue.get(timeout=5) == "locked"
+    proc.join()
+
+
+def test_time_coverage(dummy_solr):
+    from freva import time_coverage
+
+    periods = time_coverage(time="2008 to 2012", multiversion=True)
+    assert [p["count"] for p in periods] == [1, 4, 4, 4, 4]
+    assert periods[0]["time_start"] == "2008-01-01T00:00:00Z"
+    assert periods[0]["time_end"] == "2008-12-31T23:59:59Z"
+    periods = time_coverage(gap="10Y")
+    assert periods[0]["time_start"] == "1909-01-01T00:00:00Z"
+    assert [p["count"] for p in periods] == [1, 1, 1, 0, 0, 0, 0, 0, 0, 1, 2, 1]
+    periods = time_coverage(count="datasets", time="2009 to 2010", multiversion=True)
+    assert [p["count"] for p in periods] == [2, 2]
+    assert time_coverage(variable="whhoop") == []
+    with pytest.raises(ValueError):
+        time_coverage(gap="1x")
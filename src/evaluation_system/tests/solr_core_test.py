@@ -85,3 +85,62 @@ def test_unload_and_create(dummy_solr):
     #    dummy_solr.all_files.create()
     dummy_solr.all_files.create(check_if_exist=False)
     assert len(dummy_solr.all_files.status()) >= 8
+
+
+def test_document_buffer():
+    import json
+
+    from evaluation_system.model.solr_core import DocumentBuffer
+
+    docs = [
+        {"file": f"/data/tas_{n}.nc", "project": "cmip5", "timestamp": 1.0 * n}
+        for n in range(3)
+    ]
+    docs.append({"file": "/data/pr.nc", "project": "cmip5", "realm": ["atmos"]})
+    buffer = DocumentBuffer()
+    for doc in docs:
+        buffer.append(doc)
+    assert len(buffer) == 4
+    assert json.loads(buffer.to_json()) == docs
+    assert len(buffer._encoded_values) < sum(len(d) for d in docs)
+    buffer.clear()
+    assert len(buffer) == 0
+    assert json.loads(buffer.to_json()) == []
+
+
+def test_cached_solr_fields(dummy_solr):
+    import mock
+
+    from evaluation_system.model.solr_core import SolrCore
+
+    core = SolrCore(core="files", host=dummy_solr.solr_host, port=dummy_solr.solr_port)
+    fields = core.get_solr_fields()
+    with mock.patch.object(core, "get_json", wraps=core.get_json) as get_json:
+        assert core.get_solr_fields() == fields
+        core.index_version()
+        get_json.assert_not_called()
+    core.reload()
+    with mock.patch.object(core, "get_json", wraps=core.get_json) as get_json:
+        assert core.get_solr_fields() == fields
+        assert "schema" in [c.args[0] for c in get_json.call_args_list]
+
+
+def test_client_registry(dummy_solr):
+    import mock
+
+    from evaluation_system.model.solr import SolrFindFiles
+    from evaluation_system.model.solr_core import SolrCore
+
+    kwargs = dict(host=dummy_solr.solr_host, port=dummy_solr.solr_port)
+    core = SolrCore.get_client(core="files", **kwargs)
+    assert core is SolrCore.get_client(core="files", **kwargs)
+    assert core is SolrFindFiles(core="files", **kwargs).solr
+    assert core is not SolrCore.get_client(core="latest", **kwargs)
+    with mock.patch.object(SolrCore, "get_json") as get_json:
+        new_core = SolrCore(core="files", **kwargs)
+        get_json.assert_not_called()
+    assert new_core.instance_dir == dummy_solr.all_files.status()["instanceDir"]
+    assert new_core.data_dir == dummy_solr.all_files.status()["dataDir"]
+    offline = SolrCore(core="files", get_status=False, **kwargs)
+    assert offline.instance_dir is None
+    assert offline.data_dir == "data"
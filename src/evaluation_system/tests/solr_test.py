@@ -5,6 +5,8 @@ Created on 24.05.2016
 """
 import os
 
+import pytest
+
 
 def test_solr_search(dummy_solr):
     # search some files
@@ -59,3 +61,224 @@ def test_facet_search(dummy_solr):
         "variable": ["tauu", 1, "ua", 3, "wetso2", 1],
         "project": ["cmip5", 5],
     }
+
+
+def test_cursor_pagination(dummy_solr):
+    from evaluation_system.model.solr import SolrFindFiles
+
+    solr_search = SolrFindFiles(core="files")
+    all_files = list(solr_search._search())
+    assert len(all_files) == 5
+    assert list(solr_search._search(batch_size=2)) == all_files
+    assert list(solr_search._search(batch_size=2, rows=3)) == all_files[:3]
+    assert list(solr_search._search(batch_size=2, start=2)) == all_files[2:]
+    assert solr_search._get_cursor_sort("uri desc") == "uri desc,file desc"
+    assert solr_search._get_cursor_sort("file asc") == "file asc"
+
+
+def test_single_round_trip(dummy_solr):
+    import mock
+
+    from evaluation_system.model.solr import SolrFindFiles
+
+    solr_search = SolrFindFiles(core="files")
+    with mock.patch.object(
+        solr_search.solr, "get_json", wraps=solr_search.solr.get_json
+    ) as get_json, mock.patch.object(
+        solr_search.solr, "get_csv", wraps=solr_search.solr.get_csv
+    ) as get_csv:
+        assert len(list(solr_search._search())) == 5
+        assert len(list(solr_search._search(uniq_key="uri"))) == 5
+        assert get_json.call_count == 1
+        assert get_csv.call_count == 1
+    assert solr_search._retrieve_metadata().num_objects == 5
+
+
+def test_csv_listing(dummy_solr):
+    import urllib.parse
+
+    import mock
+
+    from evaluation_system.model.solr import SolrFindFiles
+
+    solr_search = SolrFindFiles(core="files")
+    special_file = '/tmp/foo, "bar".nc'
+    dummy_solr.all_files.post([{"file": special_file, "project": "cmip5"}])
+    try:
+        # an explicit sort order is retrieved as json
+        files = list(solr_search._search(sort="file desc"))
+        assert special_file in files
+        assert list(solr_search._search()) == files
+        with mock.patch.object(
+            solr_search.solr, "get_csv", wraps=solr_search.solr.get_csv
+        ) as get_csv:
+            assert list(solr_search._search(batch_size=1)) == files
+        # the per page keyset filters must not fill solr's filterCache
+        filters = [
+            urllib.parse.parse_qs(c.args[0].partition("?")[-1]).get("fq", [])
+            for c in get_csv.call_args_list
+        ]
+        assert len(filters) == len(files) + 1
+        assert filters[0] == []
+        for fq in filters[1:]:
+            assert len(fq) == 1 and fq[0].startswith("{!cache=false}file:[* TO ")
+        assert list(solr_search._search(batch_size=2, rows=3)) == files[:3]
+        assert list(solr_search._search(project="whhoop")) == []
+    finally:
+        dummy_solr.all_files.delete('file:"/tmp/foo, \\"bar\\".nc"')
+    assert len(list(solr_search._search())) == 5
+
+
+def test_query_cache(tmp_path):
+    from evaluation_system.model.solr_cache import QueryCache, _missing
+
+    key = QueryCache.make_key("facets", variable=["ua", "tas"], project="cmip5")
+    assert key == QueryCache.make_key("facets", project="cmip5", variable=["tas", "ua"])
+    cache = QueryCache(maxsize=2, cache_dir=tmp_path)
+    cache.set(key, 1, {"variable": ["tas", 1, "ua", 2]})
+    assert cache.get(key, 1) == {"variable": ["tas", 1, "ua", 2]}
+    assert cache.get(key, 2) is _missing
+    for n in range(3):
+        cache.set(str(n), 1, n)
+    assert key not in cache._entries
+    # the disk tier is shared between instances
+    assert QueryCache(cache_dir=tmp_path).get(key, 1) == {
+        "variable": ["tas", 1, "ua", 2]
+    }
+    assert QueryCache(maxsize=1).get(key, 1) is _missing
+    calls = []
+    assert cache.cached("new", lambda: 3, lambda: calls.append(1) or 10) == 10
+    assert cache.cached("new", lambda: 3, lambda: calls.append(1) or 20) == 10
+    assert len(calls) == 1
+    cache.clear()
+    assert cache.get("new", 3) is _missing
+
+
+def test_query_cache_config(tmp_path):
+    import mock
+
+    from evaluation_system.misc import config
+    from evaluation_system.model.solr_cache import get_query_cache
+
+    with mock.patch.dict(config._config, {config.SOLR_CACHE_DIR: ""}):
+        assert get_query_cache().cache_dir is None
+    with mock.patch.dict(config._config, {config.SOLR_CACHE_DIR: str(tmp_path)}):
+        assert get_query_cache().cache_dir == tmp_path
+
+
+def test_cached_facets(dummy_solr):
+    from evaluation_system.model.solr import SolrFindFiles
+
+    solr_search = SolrFindFiles(core="files")
+    facets = solr_search._facets(facets=["variable"])
+    assert solr_search._facets(facets=["variable"]) == facets
+    dummy_solr.all_files.post(
+        [{"file": "/tmp/foo.nc", "variable": "foo", "project": "cmip5"}]
+    )
+    try:
+        assert "foo" in solr_search._facets(facets=["variable"])["variable"]
+        assert solr_search._retrieve_metadata().num_objects == 6
+    finally:
+        dummy_solr.all_files.delete("file:\\/tmp\\/foo.nc")
+    assert solr_search._facets(facets=["variable"]) == facets
+
+
+def test_federated_search(dummy_solr):
+    import http.server
+    import threading
+    import time
+
+    from evaluation_system.model.solr import SolrFindFiles
+    from evaluation_system.model.solr_federation import FederatedFindFiles
+
+    class SlowHandler(http.server.BaseHTTPRequestHandler):
+        def do_GET(self):
+            time.sleep(2)
+            self.send_response(500)
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    slow_server = http.server.ThreadingHTTPServer(("localhost", 0), SlowHandler)
+    threading.Thread(target=slow_server.serve_forever, daemon=True).start()
+    host, port = dummy_solr.solr_host, str(dummy_solr.solr_port)
+    solr_search = SolrFindFiles(core="files", host=host, port=port)
+    federated = FederatedFindFiles(
+        core="files",
+        endpoints=[(host, port), (host, port), ("localhost", slow_server.server_port)],
+        timeout=1,
+    )
+    try:
+        files = list(solr_search._search())
+        target = sorted(files * 2, reverse=True)
+        assert list(federated._search()) == target
+        assert list(federated._search(rows=3)) == target[:3]
+        assert federated._retrieve_metadata().num_objects == len(target)
+        facets = solr_search._facets(facets="variable")["variable"]
+        merged = federated._facets(facets="variable")["variable"]
+        assert merged[::2] == facets[::2]
+        assert merged[1::2] == [2 * c for c in facets[1::2]]
+        assert all(s.solr.timeout == 1 for s in federated.searches)
+
+        def stalled():
+            yield files[0]
+            raise TimeoutError("stalled")
+
+        assert list(federated._skip_failing(solr_search, stalled())) == files[:1]
+        with pytest.raises(TimeoutError):
+            FederatedFindFiles(
+                core="files",
+                endpoints=[("localhost", slow_server.server_port)],
+                timeout=0.5,
+            )._retrieve_metadata()
+    finally:
+        slow_server.shutdown()
+
+
+def test_parquet_snapshot(dummy_solr, tmp_path):
+    pytest.importorskip("pyarrow")
+    import mock
+
+    from evaluation_system.misc import config
+    from evaluation_system.model.solr import SolrFindFiles
+    from evaluation_system.model.solr_parquet import (
+        SNAPSHOT_INFO,
+        ParquetFindFiles,
+        export_snapshot,
+    )
+    from freva import count_values, databrowser, facet_search
+    from freva.cli.databrowser import main as run
+
+    export_snapshot(tmp_path, batch_size=2)
+    for core in ("latest", "files"):
+        solr_search = SolrFindFiles(core=core)
+        snapshot = ParquetFindFiles(core=core, path=tmp_path)
+        for query in (
+            {},
+            {"variable": "u*"},
+            {"variable": ["tauu", "wetso2"]},
+            {"experiment_not_": "historical"},
+            {"project": "whhoop"},
+            {"time": "2000-12 to 2012-12", "time_select": "Intersects"},
+            {"time": "2000-12 to 2012-12", "time_select": "Within"},
+            {"time": "2000-12 to 2012-12", "time_select": "Contains"},
+        ):
+            assert list(snapshot._search(**query)) == list(solr_search._search(**query))
+            assert snapshot._facets(**query) == solr_search._facets(**query)
+        # searches only read the partitions of the matching projects
+        dataset = snapshot._load()[1]
+        assert list(dataset.get_fragments(snapshot._match("project", ["whhoop"]))) == []
+    run(["--snapshot", str(tmp_path / "cli")])
+    assert (tmp_path / "cli" / "files" / SNAPSHOT_INFO).exists()
+    files = list(databrowser(multiversion=True))
+    solr_facets = facet_search(facet="variable")
+    with mock.patch.dict(
+        config._config,
+        {config.SOLR_BACKEND: "parquet", config.SOLR_PARQUET_DIR: str(tmp_path)},
+    ):
+        assert list(databrowser(multiversion=True)) == files
+        assert count_values(multiversion=True) == len(files)
+        assert facet_search(facet="variable") == solr_facets
+        with pytest.raises(ValueError):
+            count_values(federated=True)
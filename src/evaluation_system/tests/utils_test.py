@@ -13,10 +13,23 @@ import pytest
 def test_time_ranges():
     from evaluation_system.misc.utils import (
         convert_str_to_timestamp,
+        get_solr_time_bounds,
         get_solr_time_range,
     )
 
     assert get_solr_time_range("fx") == "[0 TO 9999]"
+    assert get_solr_time_bounds("fx") == (
+        "0000-01-01T00:00:00Z",
+        "9999-12-31T23:59:59Z",
+    )
+    assert get_solr_time_bounds("200001-200002") == (
+        "2000-01-01T00:00:00Z",
+        "2000-02-29T23:59:59Z",
+    )
+    assert get_solr_time_bounds("199901311200-1999013118") == (
+        "1999-01-31T12:00:00Z",
+        "1999-01-31T18:59:59Z",
+    )
     times = datetime(1999, 1, 31, 12, 55, 12, 20)
     for num, s in enumerate(["%Y", "%Y%m", "%Y%m%d"]):
         time_repr = convert_str_to_timestamp(times.strftime(s))
@@ -174,3 +187,40 @@ def test_mp_wrap_fn():
 
     res = mp_wrap_fn([test_f, 3, 2])
     assert res == 6
+
+
+def test_trigram_index():
+    from evaluation_system.misc.utils import TrigramIndex
+
+    index = TrigramIndex(["MPI-ESM1-2-LR", "mpi-esm1-2-hr", "hadcm3", "cmorph"])
+    assert len(index) == 4
+    assert "mpi-esm1-2-lr" in index
+    assert "mpi-esm-lr" not in index
+    suggestions = index.suggest("mpi-esm-lr")
+    assert suggestions[0] == "mpi-esm1-2-lr"
+    assert "hadcm3" not in suggestions
+    assert index.suggest("mpi-esm-lr", limit=1) == ["mpi-esm1-2-lr"]
+    assert index.suggest("hadcm") == ["hadcm3"]
+    assert index.suggest("zzz") == []
+
+
+def test_time_buckets():
+    from evaluation_system.misc.utils import get_time_buckets, parse_time_gap
+
+    assert parse_time_gap("10Y") == (10, "Y")
+    assert parse_time_gap("6h") == (6, "H")
+    for gap in ("0Y", "1m", "foo"):
+        with pytest.raises(ValueError):
+            parse_time_gap(gap)
+    buckets = get_time_buckets("2008-11-15", "2010-02", gap="1Y")
+    assert buckets == [
+        ("2008-01-01T00:00:00Z", "2008-12-31T23:59:59Z"),
+        ("2009-01-01T00:00:00Z", "2009-12-31T23:59:59Z"),
+        ("2010-01-01T00:00:00Z", "2010-12-31T23:59:59Z"),
+    ]
+    buckets = get_time_buckets("2008-12", "2009-02", gap="2M")
+    assert buckets[-1] == ("2009-02-01T00:00:00Z", "2009-03-31T23:59:59Z")
+    assert len(get_time_buckets("2000-01-01T06:00", "2000-01-01T17", "6h")) == 2
+    assert get_time_buckets("9999", "9999")[-1][1] == "9999-12-31T23:59:59Z"
+    with pytest.raises(ValueError):
+        get_time_buckets("0", "9999", gap="1D")
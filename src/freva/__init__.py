@@ -5,7 +5,22 @@ import warnings
 from evaluation_system import __version__
 from evaluation_system.misc import logger
 
-from ._databrowser import count_values, databrowser, facet_search
+from ._databrowser import (
+    async_count_values,
+    async_databrowser,
+    async_facet_search,
+    count_values,
+    databrowser,
+    facet_search,
+    facet_values,
+    search_summary,
+    dataset_search,
+    file_metadata,
+    batch_databrowser,
+)
+from ._catalog import export_catalog
+from ._coverage import time_coverage
+from ._dataset import open_dataset
 from ._esgf import esgf_browser, esgf_facets, esgf_datasets, esgf_download, esgf_query
 from ._history import history
 from ._plugin import (
@@ -32,6 +47,17 @@ __all__ = [
     "databrowser",
     "count_values",
     "facet_search",
+    "facet_values",
+    "search_summary",
+    "dataset_search",
+    "file_metadata",
+    "batch_databrowser",
+    "export_catalog",
+    "open_dataset",
+    "time_coverage",
+    "async_databrowser",
+    "async_count_values",
+    "async_facet_search",
     "run_plugin",
     "list_plugins",
     "plugin_info",
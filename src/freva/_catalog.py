@@ -0,0 +1,244 @@
+"""Export databrowser searches to catalog files."""
+from __future__ import annotations
+
+import json
+import os
+import warnings
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Iterable, Iterator, Union
+
+from typing_extensions import Literal
+
+from evaluation_system.misc import logger
+
+from ._databrowser import (
+    _get_core,
+    _get_search,
+    _proc_search_facets,
+    _run_profiled,
+    _to_frame,
+)
+from .utils import handled_exception
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+__all__ = ["export_catalog"]
+
+CATALOG_FORMATS = ("csv", "parquet", "ndjson", "intake-esm")
+"""The formats of the catalogs."""
+
+
+def _iter_frames(
+    pages: Iterable[list[dict[str, Any]]], uniq_key: str, fields: list[str]
+) -> Iterator[pd.DataFrame]:
+    """Convert the pages of a search to data frames, one by one.
+
+    An empty data frame is created for searches without results, such that
+    the columns of the catalog are always written.
+    """
+    empty = True
+    for page in pages:
+        empty = False
+        yield _to_frame([page], uniq_key, fields)
+    if empty:
+        yield _to_frame([], uniq_key, fields)
+
+
+def _write_csv(frames: Iterator[pd.DataFrame], path: Path) -> int:
+    num_rows = 0
+    with path.open("w", newline="") as stream:
+        for frame in frames:
+            frame.to_csv(stream, header=num_rows == 0, index=False)
+            num_rows += len(frame)
+    return num_rows
+
+
+def _write_ndjson(frames: Iterator[pd.DataFrame], path: Path) -> int:
+    num_rows = 0
+    with path.open("w") as stream:
+        for frame in frames:
+            if len(frame):
+                lines = frame.to_json(orient="records", lines=True, date_format="iso")
+                stream.write(lines.rstrip("\n") + "\n")
+            num_rows += len(frame)
+    return num_rows
+
+
+def _write_parquet(frames: Iterator[pd.DataFrame], path: Path) -> int:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    num_rows = 0
+    writer = None
+    try:
+        for frame in frames:
+            if writer is None:
+                # the schema is fixed, facets of the first page might be empty
+                schema = pa.schema(
+                    [
+                        (
+                            column,
+                            pa.timestamp("us")
+                            if column in ("time_start", "time_end")
+                            else pa.string(),
+                        )
+                        for column in frame.columns
+                    ]
+                )
+                writer = pq.ParquetWriter(path, schema)
+            for column in frame.columns:
+                if column not in ("time_start", "time_end"):
+                    values = frame[column].astype(object)
+                    frame[column] = values.where(values.notna(), None)
+            # every page is written as one row group
+            writer.write_table(
+                pa.Table.from_pandas(frame, schema=schema, preserve_index=False)
+            )
+            num_rows += len(frame)
+    finally:
+        if writer is not None:
+            writer.close()
+    return num_rows
+
+
+def _write_intake_esm(
+    frames: Iterator[pd.DataFrame], path: Path, uniq_key: str, facets: list[str]
+) -> int:
+    """Write an intake-esm catalog: a csv file and the collection description."""
+    catalog_file = path.with_suffix(".csv")
+    num_rows = _write_csv(frames, catalog_file)
+    groupby_attrs = [f for f in facets if f != "variable"]
+    description = {
+        "esmcat_version": "0.1.0",
+        "id": path.stem,
+        "description": "Catalog of a freva databrowser search",
+        "catalog_file": catalog_file.name,
+        "attributes": [
+            {"column_name": column, "vocabulary": ""}
+            for column in facets + ["time_start", "time_end"]
+        ],
+        "assets": {"column_name": uniq_key, "format": "netcdf"},
+        "aggregation_control": {
+            "variable_column_name": "variable",
+            "groupby_attrs": groupby_attrs,
+            "aggregations": [
+                {"type": "union", "attribute_name": "variable"},
+                {
+                    "type": "join_existing",
+                    "attribute_name": "time_start",
+                    "options": {"dim": "time"},
+                },
+            ],
+        },
+    }
+    with path.open("w") as stream:
+        json.dump(description, stream, indent=3)
+    return num_rows
+
+
+@handled_exception
+def export_catalog(
+    path: Union[str, os.PathLike],
+    *,
+    format: Literal["csv", "parquet", "ndjson", "intake-esm"] = "csv",
+    multiversion: bool = False,
+    time: str = "",
+    time_select: Literal["strict", "flexible", "file"] = "flexible",
+    uniq_key: Literal["file", "uri"] = "file",
+    batch_size: int = 5000,
+    profile: bool = False,
+    federated: bool = False,
+    **search_facets: Union[str, list[str], int],
+) -> Path:
+    """Export the results of a search to a catalog file.
+
+    The catalog holds one row per search result with all facets and the
+    start and end of the time range of each result. Results are written page
+    by page while they are retrieved, catalogs of searches with millions of
+    results are hence created in constant memory.
+
+    Parameters
+    ----------
+    path: str, os.PathLike
+        The path of the catalog file. For ``intake-esm`` catalogs this is the
+        path of the json collection description, the csv catalog is written
+        next to it with a ``.csv`` suffix.
+    format: str, default: csv
+        The format of the catalog: ``csv``, ``parquet`` (requires pyarrow),
+        ``ndjson`` (one json object per line) or ``intake-esm``.
+    multiversion: bool, default: False
+        Select all versions and not just the latest version (default).
+    time: str, default: ""
+        Special search facet to refine/subset search results by time.
+        See :py:meth:`freva.databrowser` for details.
+    time_select: str, default: flexible
+        Operator that specifies how the time period is selected.
+        See :py:meth:`freva.databrowser` for details.
+    uniq_key: str, default: file
+        Chose if the catalog should hold the paths of the files or uris.
+    batch_size: int, default: 5000
+        The number of results that are retrieved and written at once.
+    profile: bool, default: False
+        Print a profile of the solr requests to stderr,
+        see :py:meth:`freva.databrowser`.
+    federated: bool, default: False
+        Search the databrowsers of all configured freva instances,
+        see :py:meth:`freva.databrowser`.
+    **search_facets: str
+        The facets to be applied in the data search. If not given
+        the whole dataset will be queried.
+
+    Returns
+    -------
+    pathlib.Path:
+        The path of the catalog file.
+
+    Example
+    -------
+
+    .. execute_code::
+
+        import freva, pandas
+        catalog = freva.export_catalog("/tmp/obs.csv", project="obs*")
+        print(pandas.read_csv(catalog))
+
+    """
+    if format not in CATALOG_FORMATS:
+        raise ValueError(
+            f"Catalog format has to be one of {', '.join(CATALOG_FORMATS)}"
+        )
+    path = Path(path).expanduser()
+    if format == "intake-esm":
+        path = path.with_suffix(".json")
+    search_facets = _proc_search_facets(
+        time_select=time_select, time=time, **search_facets
+    )
+    core = _get_core(multiversion, search_facets)
+    logger.debug("Searching dictionary: %s\n", search_facets)
+    with warnings.catch_warnings():
+        warnings.filterwarnings(action="ignore", category=PendingDeprecationWarning)
+        solr_search = _get_search(core, federated)
+        facets = sorted(solr_search._get_facet_fields())
+        fields = facets + ["time"]
+
+        def _export() -> int:
+            pages = solr_search._get_pages(
+                batch_size=batch_size,
+                uniq_key=uniq_key,
+                prefetch=1,
+                fields=fields,
+                **search_facets,
+            )
+            frames = _iter_frames(pages, uniq_key, fields)
+            if format == "csv":
+                return _write_csv(frames, path)
+            if format == "ndjson":
+                return _write_ndjson(frames, path)
+            if format == "parquet":
+                return _write_parquet(frames, path)
+            return _write_intake_esm(frames, path, uniq_key, facets)
+
+        num_rows = _run_profiled(profile, _export)
+    logger.info("Exported %i search results to %s", num_rows, path)
+    return path
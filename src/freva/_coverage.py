@@ -0,0 +1,145 @@
+"""Histograms of the time periods covered by databrowser searches."""
+from __future__ import annotations
+
+import bisect
+import warnings
+from typing import Any, Union
+
+from typing_extensions import Literal
+
+from evaluation_system.misc import logger
+from evaluation_system.misc.utils import get_solr_time_bounds, get_time_buckets
+
+from ._databrowser import (
+    _get_core,
+    _get_search,
+    _get_time_bounds,
+    _proc_search_facets,
+    _run_profiled,
+)
+from .utils import handled_exception
+
+__all__ = ["time_coverage"]
+
+
+def _count_datasets(
+    datasets: list[dict[str, Any]], buckets: list[tuple[str, str]]
+) -> list[int]:
+    """Count the datasets whose time range overlaps with each period."""
+    invariant = list(get_solr_time_bounds(""))
+    ranges = [
+        (d["time_start"], d["time_end"])
+        for d in datasets
+        if d["time_start"]
+        and d["time_end"]
+        and [d["time_start"], d["time_end"]] != invariant
+    ]
+    starts = sorted(start for (start, _) in ranges)
+    ends = sorted(end for (_, end) in ranges)
+    return [
+        bisect.bisect_right(starts, last) - bisect.bisect_left(ends, first)
+        for (first, last) in buckets
+    ]
+
+
+@handled_exception
+def time_coverage(
+    *,
+    gap: str = "1Y",
+    count: Literal["files", "datasets"] = "files",
+    time: str = "",
+    time_select: Literal["strict", "flexible", "file"] = "flexible",
+    multiversion: bool = False,
+    profile: bool = False,
+    federated: bool = False,
+    **search_facets: Union[str, list[str], int],
+) -> list[dict[str, Any]]:
+    """Count the files or datasets of a search that cover periods of time.
+
+    The time range of the search is split into periods of the length
+    ``gap``, for each period the number of files (or datasets) with data
+    within that period is counted. Gaps in the data and the periods that are
+    covered by many simulations can hence be spotted without retrieving the
+    files of a search. Time invariant files, like fx files, are ignored.
+
+    Parameters
+    ----------
+    gap: str, default: 1Y
+        The length of the periods: a number followed by the unit, ``Y`` for
+        years, ``M`` for months, ``D`` for days or ``h`` for hours.
+    count: str, default: files
+        Count the ``files`` or the ``datasets`` that cover the periods. A
+        dataset covers the periods from the start of its earliest to the end
+        of its latest file.
+    time: str, default: ""
+        Special search facet to refine/subset search results by time, this
+        also sets the time range of the periods. By default the periods span
+        from the start of the earliest to the end of the latest result.
+        See :py:meth:`freva.databrowser` for details.
+    time_select: str, default: flexible
+        Operator that specifies how the time period is selected.
+        See :py:meth:`freva.databrowser` for details.
+    multiversion: bool, default: False
+        Select all versions and not just the latest version (default).
+    profile: bool, default: False
+        Print a profile of the solr requests to stderr,
+        see :py:meth:`freva.databrowser`.
+    federated: bool, default: False
+        Search the databrowsers of all configured freva instances,
+        see :py:meth:`freva.databrowser`.
+    **search_facets: str
+        The facets to be applied in the data search. If not given
+        the whole dataset will be queried.
+
+    Returns
+    -------
+    list[dict[str, Any]]:
+        One dictionary per period holding the first (``time_start``) and
+        the last second (``time_end``) of the period and the number of files
+        or datasets (``count``) covering the period.
+
+    Raises
+    ------
+    ValueError:
+        If the gap is invalid or the time range has too many periods.
+
+    Example
+    -------
+
+    .. execute_code::
+
+        import freva
+        for period in freva.time_coverage(project="obs*", gap="1D"):
+            print(period["time_start"], period["count"])
+
+    """
+    if count not in ("files", "datasets"):
+        raise ValueError("Either files or datasets can be counted")
+    search_facets = _proc_search_facets(
+        time_select=time_select, time=time, **search_facets
+    )
+    core = _get_core(multiversion, search_facets)
+    logger.debug("Searching dictionary: %s\n", search_facets)
+    with warnings.catch_warnings():
+        warnings.filterwarnings(action="ignore", category=PendingDeprecationWarning)
+        solr_search = _get_search(core, federated)
+
+        def _coverage() -> list[dict[str, Any]]:
+            if time:
+                start, end = _get_time_bounds(time)
+            else:
+                start, end = solr_search._time_range(**search_facets)
+            if not start or not end:
+                return []
+            buckets = get_time_buckets(start, end, gap=gap)
+            if count == "datasets":
+                datasets = solr_search._datasets(**search_facets)
+                counts = _count_datasets(datasets, buckets)
+            else:
+                counts = solr_search._time_coverage(buckets, gap, **search_facets)
+            return [
+                {"time_start": first, "time_end": last, "count": num}
+                for ((first, last), num) in zip(buckets, counts)
+            ]
+
+        return _run_profiled(profile, _coverage)
@@ -1,22 +1,69 @@
 """A Python module to access the apache solr databrowser."""
 from __future__ import annotations
 
+import asyncio
+import contextvars
 import json
+import os
+import sys
 import warnings
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from itertools import chain
 from pathlib import Path
-from typing import Any, Iterator, Optional, Union, overload
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    AsyncIterator,
+    Callable,
+    Hashable,
+    Iterable,
+    Iterator,
+    Mapping,
+    Optional,
+    Sequence,
+    Union,
+    cast,
+    overload,
+)
 
 import lazy_import
 from typing_extensions import Literal
 
-from evaluation_system.misc import logger
+from evaluation_system.misc import config, logger
+from evaluation_system.misc.utils import get_solr_time_bounds
 
 from .utils import handled_exception
 
+if TYPE_CHECKING:
+    import pandas as pd
+
 SolrFindFiles = lazy_import.lazy_class("evaluation_system.model.solr.SolrFindFiles")
+PagePrefetcher = lazy_import.lazy_class("evaluation_system.model.solr.PagePrefetcher")
+ParquetFindFiles = lazy_import.lazy_class(
+    "evaluation_system.model.solr_parquet.ParquetFindFiles"
+)
+FederatedFindFiles = lazy_import.lazy_class(
+    "evaluation_system.model.solr_federation.FederatedFindFiles"
+)
+QueryProfile = lazy_import.lazy_class(
+    "evaluation_system.model.solr_profile.QueryProfile"
+)
 
 
-__all__ = ["databrowser", "search_facets", "count_values"]
+__all__ = [
+    "databrowser",
+    "facet_search",
+    "facet_values",
+    "count_values",
+    "search_summary",
+    "dataset_search",
+    "file_metadata",
+    "batch_databrowser",
+    "async_databrowser",
+    "async_facet_search",
+    "async_count_values",
+]
 
 
 def _proc_search_facets(
@@ -43,6 +90,171 @@ def _proc_search_facets(
     return search_facets
 
 
+def _get_time_bounds(time: str) -> tuple[str, str]:
+    """Get the solr timestamps of the start and end of the time search facet."""
+    start, _, end = time.lower().partition("to")
+    start, end = start.strip(), end.strip() or start.strip()
+    return get_solr_time_bounds(f"{start}/{end}", sep="/")
+
+
+def _first_value(value: Any) -> Any:
+    """Get the first entry of a multi valued solr field."""
+    if isinstance(value, list):
+        return value[0] if value else None
+    return value
+
+
+def _to_frame(
+    pages: Iterable[list[dict[str, Any]]], uniq_key: str, fields: list[str]
+) -> pd.DataFrame:
+    """Create a data frame from the pages of a search query.
+
+    Multi valued fields are reduced to their first entry, facets are stored
+    as categories and the time range is split into start and end columns.
+    """
+    import numpy as np
+    import pandas as pd
+
+    def _to_datetime(values: pd.Series) -> pd.Series:
+        # the time stamps span the years 0 to 9999, nanosecond time stamps
+        # (the only resolution of pandas < 2) only the years 1677 to 2262
+        stamps = np.array(
+            [v.rstrip("Z") if isinstance(v, str) else "NaT" for v in values],
+            dtype="datetime64[s]",
+        )
+        if int(pd.__version__.partition(".")[0]) >= 2:
+            return pd.Series(stamps, index=values.index)
+        try:
+            return pd.to_datetime(values, utc=True).dt.tz_convert(None)
+        except pd.errors.OutOfBoundsDatetime:
+            # keep the iso formatted time stamps rather than losing them
+            return values
+
+    columns = [uniq_key] + [f for f in fields if f != uniq_key]
+    frames = []
+    for page in pages:
+        frame = pd.DataFrame.from_records(page, columns=columns)
+        for column in columns:
+            frame[column] = frame[column].map(_first_value)
+        frames.append(frame)
+    out = pd.concat(
+        frames or [pd.DataFrame(columns=columns)], ignore_index=True
+    ).infer_objects()
+    if "time" in out.columns:
+        # solr time ranges are of the form [start TO end], the end is
+        # completed to the last second of the time range
+        time = out.pop("time").astype("string").str.strip("[] ")
+        bounds = {
+            t: get_solr_time_bounds(t, sep=" TO ") for t in time.dropna().unique()
+        }
+        out["time_start"] = _to_datetime(time.map({t: b[0] for t, b in bounds.items()}))
+        out["time_end"] = _to_datetime(time.map({t: b[1] for t, b in bounds.items()}))
+    for column in out.columns:
+        is_str = pd.api.types.is_string_dtype(out[column])
+        if column != uniq_key and (is_str or out[column].dtype == object):
+            out[column] = out[column].astype("category")
+    return out
+
+
+def _print_profile(query_profile: Any) -> None:
+    query_profile.stop()
+    print(query_profile.report(), file=sys.stderr, flush=True)
+
+
+def _iter_profiled(
+    context: contextvars.Context, results: Iterator[Any], query_profile: Any
+) -> Iterator[Any]:
+    """Iterate over search results, while profiling the solr requests."""
+    try:
+        while True:
+            try:
+                yield context.run(next, results)
+            except StopIteration:
+                return
+    finally:
+        _print_profile(query_profile)
+
+
+def _run_profiled(profile: bool, func: Callable[..., Any], **kwargs: Any) -> Any:
+    """Run a search and print a profile of its solr requests if requested.
+
+    Search results that are iterators are profiled until they are exhausted.
+    """
+    if not profile:
+        return func(**kwargs)
+    query_profile = QueryProfile()
+    context = contextvars.copy_context()
+    context.run(query_profile.activate)
+    result = context.run(func, **kwargs)
+    if isinstance(result, Iterator):
+        return _iter_profiled(context, result, query_profile)
+    _print_profile(query_profile)
+    return result
+
+
+def _warn_no_results(
+    solr_search: Any, search_facets: dict[str, Any]
+) -> dict[str, list[str]]:
+    """Suggest known values for the facets of a search without results."""
+    try:
+        suggestions = solr_search._suggest(**search_facets)
+    except Exception as error:
+        logger.debug("Could not get suggestions: %s", error)
+        return {}
+    if suggestions:
+        hints = "; ".join(f"{f}={', '.join(v)}" for (f, v) in suggestions.items())
+        logger.warning("The search has no results, did you mean: %s", hints)
+    return suggestions
+
+
+def _iter_suggested(
+    results: Iterator[Any], solr_search: Any, search_facets: dict[str, Any]
+) -> Iterator[Any]:
+    """Iterate over search results, with suggestions if there are none."""
+    empty = True
+    for result in results:
+        empty = False
+        yield result
+    if empty:
+        _warn_no_results(solr_search, search_facets)
+
+
+def _get_search(core: str, federated: bool = False) -> Any:
+    """Get the search object for the local or all federated databrowsers.
+
+    The local databrowser is searched on the solr server, or on its Parquet
+    snapshot if the ``solr.backend`` option is set to ``parquet``.
+    """
+    backend = (config.get(config.SOLR_BACKEND, "solr") or "solr").lower()
+    if backend not in ("solr", "parquet"):
+        raise ValueError(f"Unknown databrowser backend: {backend}")
+    if federated:
+        if backend == "parquet":
+            raise ValueError("Federated searches need the solr backend")
+        return FederatedFindFiles(core=core)
+    if backend == "parquet":
+        return ParquetFindFiles(core=core)
+    return SolrFindFiles(core=core)
+
+
+def _get_core(
+    multiversion: bool, search_facets: dict[str, str | list[str] | int]
+) -> str:
+    """Get the name of the core that should be queried."""
+    latest = not multiversion
+    if "version" in search_facets and latest:
+        # it makes no sense to look for a specific version just among the latest
+        # the speedup is marginal and it might not be what the user expects
+        logger.warning("Turning latest off when searching for a specific version.")
+        latest = False
+    return {True: "latest", False: "files"}[latest]
+
+
+def _facet_counts(values: list[Any]) -> dict[str, int]:
+    """Convert a flat solr facet list to a value: count dictionary."""
+    return {str(v): int(c) for v, c in zip(*[iter(values)] * 2)}
+
+
 @overload
 def count_values(
     *,
@@ -50,6 +262,8 @@ def count_values(
     time: str = "",
     time_select: Literal["strict", "flexible", "file"] = "flexible",
     multiversion: bool = False,
+    profile: bool = False,
+    federated: bool = False,
     **search_facets: str | list[str] | int,
 ) -> dict[str, dict[str, int]]:
     ...
@@ -62,6 +276,8 @@ def count_values(
     time: str = "",
     time_select: Literal["strict", "flexible", "file"] = "flexible",
     multiversion: bool = False,
+    profile: bool = False,
+    federated: bool = False,
     **search_facets: str | list[str] | int,
 ) -> int:
     ...
@@ -73,6 +289,8 @@ def count_values(
     time: str = "",
     time_select: Literal["strict", "flexible", "file"] = "flexible",
     multiversion: bool = False,
+    profile: bool = False,
+    federated: bool = False,
     facet: str | list[str] | None = None,
     **search_facets: str | list[str] | int,
 ) -> int | dict[str, dict[str, int]]:
@@ -98,13 +316,22 @@ def count_values(
         period is contained within *one single* file.
     multiversion: bool, default: False
         Select all versions and not just the latest version (default).
+    profile: bool, default: False
+        Print a profile of the solr requests of the query to stderr: the
+        query strings, solr's processing time (QTime), the wall time,
+        received bytes, parse time and the number of round trips.
+    federated: bool, default: False
+        Search the databrowsers of all freva instances that are configured
+        in the ``solr.federation`` option in addition to this instance.
     facet: Union[str, list[str]], default: None
         Count these these facets (attributes & values) instead of the number
         of total files. If None (default), the number of total files will
         be returned.
     **search_facets: str
         The facets to be applied in the data search. If not given
-        the whole dataset will be queried.
+        the whole dataset will be queried. Use ``facet_limit`` and
+        ``facet_offset`` to only count a page of the values of each facet,
+        see also :py:meth:`freva.facet_values`.
 
     Returns
     -------
@@ -136,28 +363,31 @@ def count_values(
     if facet in (["*"], ["all"]):
         facet = []
     facet = facet or []
-    latest = not multiversion
-    if "version" in search_facets and latest:
-        # it makes no sense to look for a specific version just among the latest
-        # the speedup is marginal and it might not be what the user expects
-        logger.warning("Turning latest off when searching for a specific version.")
-        latest = False
-    core = {True: "latest", False: "files"}[latest]
+    core = _get_core(multiversion, search_facets)
     logger.debug("Searching dictionary: %s\n", search_facets)
     search_facets["facet.limit"] = search_facets.pop("facet_limit", -1)
+    search_facets["facet.offset"] = search_facets.pop("facet_offset", 0)
     if count_all:
         with warnings.catch_warnings():
             warnings.filterwarnings(action="ignore", category=PendingDeprecationWarning)
-            return (
-                SolrFindFiles(core=core)._retrieve_metadata(**search_facets).num_objects
-            )
+            solr_search = _get_search(core, federated)
+            num_objects = _run_profiled(
+                profile, solr_search._retrieve_metadata, **search_facets
+            ).num_objects
+            if num_objects == 0:
+                _warn_no_results(solr_search, search_facets)
+            return num_objects
     with warnings.catch_warnings():
         warnings.filterwarnings(action="ignore", category=PendingDeprecationWarning)
-        results = SolrFindFiles(core=core)._facets(facet or None, **search_facets)
+        results = _run_profiled(
+            profile,
+            _get_search(core, federated)._facets,
+            facets=facet or None,
+            **search_facets,
+        )
     out: dict[str, dict[str, int]] = {}
     for att in facet or results.keys():
-        values = results[att]
-        out[att] = {str(v): int(c) for v, c in zip(*[iter(values)] * 2)}
+        out[att] = _facet_counts(results[att])
     return out
 
 
@@ -167,6 +397,8 @@ def facet_search(
     time: str = "",
     time_select: Literal["strict", "flexible", "file"] = "flexible",
     multiversion: bool = False,
+    profile: bool = False,
+    federated: bool = False,
     facet: str | list[str] | None = None,
     **search_facets: str | list[str] | int,
 ) -> dict[str, list[str]]:
@@ -199,9 +431,20 @@ def facet_search(
         returned.
     multiversion: bool, default: False
         Select all versions and not just the latest version (default).
+    profile: bool, default: False
+        Print a profile of the solr requests of the query to stderr: the
+        query strings, solr's processing time (QTime), the wall time,
+        received bytes, parse time and the number of round trips.
+    federated: bool, default: False
+        Search the databrowsers of all freva instances that are configured
+        in the ``solr.federation`` option in addition to this instance.
     **search_facets: str
         The facets to be applied in the data search. If not given
-        the whole dataset will be queried.
+        the whole dataset will be queried. Use the ``bbox`` facet
+        (``west,south,east,north``) to select files by their spatial extent,
+        see :py:meth:`freva.databrowser`. Use ``facet_limit`` and
+        ``facet_offset`` to only get a page of the values of each facet,
+        see also :py:meth:`freva.facet_values`.
 
     Returns
     -------
@@ -238,6 +481,9 @@ def facet_search(
         res = freva.facet_search(file=str(os.path.abspath(file)))
         print(res)
 
+    Use :py:meth:`freva.file_metadata` to retrieve the meta data of many
+    files at once.
+
     """
     search_facets = _proc_search_facets(
         time_select=time_select, time=time, **search_facets
@@ -247,33 +493,374 @@ def facet_search(
     if facet in (["*"], ["all"]):
         facet = []
     facet = facet or []
-    latest = not multiversion
-    if "version" in search_facets and latest:
-        # it makes no sense to look for a specific version just among the latest
-        # the speedup is marginal and it might not be what the user expects
-        logger.warning("Turning latest off when searching for a specific version.")
-        latest = False
-    core = {True: "latest", False: "files"}[latest]
+    core = _get_core(multiversion, search_facets)
     logger.debug("Searching dictionary: %s\n", search_facets)
     search_facets["facet.limit"] = search_facets.pop("facet_limit", -1)
+    search_facets["facet.offset"] = search_facets.pop("facet_offset", 0)
     with warnings.catch_warnings():
         warnings.filterwarnings(action="ignore", category=PendingDeprecationWarning)
-        results = SolrFindFiles(core=core)._facets(
-            facets=facet or None, latest_version=False, **search_facets
+        results = _run_profiled(
+            profile,
+            _get_search(core, federated)._facets,
+            facets=facet or None,
+            latest_version=False,
+            **search_facets,
         )
     return {f: v[::2] for f, v in results.items()}
 
 
+@handled_exception
+def facet_values(
+    facet: str,
+    *,
+    page_size: int = 1000,
+    offset: int = 0,
+    limit: int = -1,
+    prefix: str = "",
+    sort: Literal["index", "count"] = "index",
+    time: str = "",
+    time_select: Literal["strict", "flexible", "file"] = "flexible",
+    multiversion: bool = False,
+    profile: bool = False,
+    federated: bool = False,
+    **search_facets: str | list[str] | int,
+) -> Iterator[tuple[str, int]]:
+    """Iterate over the values of one facet and their counts.
+
+    Unlike :py:meth:`freva.facet_search`, which retrieves all values of the
+    facets at once, the values are retrieved page by page while iterating.
+    Facets with huge vocabularies, like the ``dataset`` or ``ensemble``
+    facets, can hence be browsed without transferring all values at once.
+
+    Parameters
+    ----------
+    facet: str
+        The name of the facet.
+    page_size: int, default: 1000
+        The number of values that are retrieved at once.
+    offset: int, default: 0
+        Skip the first values of the facet.
+    limit: int, default: -1
+        The maximum number of values, -1 (default) for all values.
+    prefix: str, default: ""
+        Only get values that start with this prefix.
+    sort: str, default: index
+        Sort the values alphabetically (``index``) or by their ``count``,
+        the most frequent value first.
+    time: str, default: ""
+        Special search facet to refine/subset search results by time.
+        See :py:meth:`freva.databrowser` for details.
+    time_select: str, default: flexible
+        Operator that specifies how the time period is selected.
+        See :py:meth:`freva.databrowser` for details.
+    multiversion: bool, default: False
+        Select all versions and not just the latest version (default).
+    profile: bool, default: False
+        Print a profile of the solr requests to stderr,
+        see :py:meth:`freva.databrowser`.
+    federated: bool, default: False
+        Search the databrowsers of all configured freva instances,
+        see :py:meth:`freva.databrowser`.
+    **search_facets: str
+        The facets to be applied in the data search. If not given
+        the whole dataset will be queried.
+
+    Returns
+    -------
+    Iterator[tuple[str, int]]:
+        The values of the facet and the number of objects of each value.
+
+    Example
+    -------
+
+    .. execute_code::
+
+        import freva
+        for value, count in freva.facet_values("variable", limit=3,
+                                               sort="count"):
+            print(value, count)
+
+    """
+    if sort not in ("index", "count"):
+        raise ValueError("Facets can only be sorted by index or count")
+    search_facets = _proc_search_facets(
+        time_select=time_select, time=time, **search_facets
+    )
+    core = _get_core(multiversion, search_facets)
+    logger.debug("Searching dictionary: %s\n", search_facets)
+    with warnings.catch_warnings():
+        warnings.filterwarnings(action="ignore", category=PendingDeprecationWarning)
+        pages = _run_profiled(
+            profile,
+            _get_search(core, federated)._facet_pages,
+            facet=facet,
+            page_size=page_size,
+            offset=offset,
+            limit=limit,
+            prefix=prefix,
+            sort=sort,
+            **search_facets,
+        )
+    return chain.from_iterable(pages)
+
+
+@handled_exception
+def search_summary(
+    *,
+    time: str = "",
+    time_select: Literal["strict", "flexible", "file"] = "flexible",
+    multiversion: bool = False,
+    uniq_key: Literal["file", "uri"] = "file",
+    facet: str | list[str] | None = None,
+    max_results: int = 10,
+    profile: bool = False,
+    federated: bool = False,
+    **search_facets: str | list[str] | int,
+) -> dict[str, Any]:
+    """Summarise a search: count results and facets and get the first results.
+
+    The information that would otherwise be retrieved by calling
+    :py:meth:`freva.count_values`, :py:meth:`freva.facet_search` and
+    :py:meth:`freva.databrowser` one after another is retrieved by one single
+    query to the databrowser.
+
+    Parameters
+    ----------
+    time: str, default: ""
+        Special search facet to refine/subset search results by time.
+        See :py:meth:`freva.databrowser` for details.
+    time_select: str, default: flexible
+        Operator that specifies how the time period is selected.
+        See :py:meth:`freva.databrowser` for details.
+    multiversion: bool, default: False
+        Select all versions and not just the latest version (default).
+    uniq_key: str, default: file
+        Chose if the first results should be paths to files or uris.
+    facet: Union[str, list[str]], default: None
+        Count these facets (attributes & values). If None given (default),
+        all available facets are counted.
+    max_results: int, default: 10
+        The number of results that are returned.
+    profile: bool, default: False
+        Print a profile of the solr request to stderr,
+        see :py:meth:`freva.databrowser`.
+    federated: bool, default: False
+        Search the databrowsers of all configured freva instances,
+        see :py:meth:`freva.databrowser`.
+    **search_facets: str
+        The facets to be applied in the data search. If not given
+        the whole dataset will be queried.
+
+    Returns
+    -------
+    dict[str, Any]:
+        Dictionary with the number of found objects (``count``), the
+        number of objects for each search facet (``facets``) and the first
+        ``max_results`` search results (``files``). For searches without
+        results ``suggestions`` holds known values of the facets whose
+        values are unknown, e.g. because of a typo.
+
+    Example
+    -------
+
+    .. execute_code::
+
+        import freva
+        summary = freva.search_summary(project="obs*", facet="variable",
+                                       max_results=2)
+        print(summary["count"], summary["facets"])
+        print(summary["files"])
+
+    """
+    search_facets = _proc_search_facets(
+        time_select=time_select, time=time, **search_facets
+    )
+    if isinstance(facet, str):
+        facet = [facet]
+    if facet in (["*"], ["all"]):
+        facet = []
+    core = _get_core(multiversion, search_facets)
+    logger.debug("Searching dictionary: %s\n", search_facets)
+    search_facets["facet.limit"] = search_facets.pop("facet_limit", -1)
+    search_facets["facet.offset"] = search_facets.pop("facet_offset", 0)
+    with warnings.catch_warnings():
+        warnings.filterwarnings(action="ignore", category=PendingDeprecationWarning)
+        solr_search = _get_search(core, federated)
+        result = _run_profiled(
+            profile,
+            solr_search._summary,
+            uniq_key=uniq_key,
+            facets=facet or None,
+            rows=max_results,
+            **search_facets,
+        )
+        suggestions = {}
+        if result.num_objects == 0:
+            suggestions = _warn_no_results(solr_search, search_facets)
+    return {
+        "count": result.num_objects,
+        "facets": {f: _facet_counts(v) for (f, v) in result.facets.items()},
+        "files": result.docs,
+        "suggestions": suggestions,
+    }
+
+
+@handled_exception
+def dataset_search(
+    *,
+    time: str = "",
+    time_select: Literal["strict", "flexible", "file"] = "flexible",
+    multiversion: bool = False,
+    max_results: int = -1,
+    profile: bool = False,
+    federated: bool = False,
+    **search_facets: str | list[str] | int,
+) -> list[dict[str, Any]]:
+    """Search for datasets and the time period they cover.
+
+    Instead of the files, one entry per dataset is returned. The aggregation
+    is done by the databrowser, hence only the dataset entries are
+    transferred, no matter how many files the datasets have.
+
+    Parameters
+    ----------
+    time: str, default: ""
+        Special search facet to refine/subset search results by time.
+        See :py:meth:`freva.databrowser` for details.
+    time_select: str, default: flexible
+        Operator that specifies how the time period is selected.
+        See :py:meth:`freva.databrowser` for details.
+    multiversion: bool, default: False
+        Select all versions and not just the latest version (default).
+        Set this to True to get all versions of the datasets.
+    max_results: int, default: -1
+        The maximum number of datasets that are returned, -1 for all.
+    profile: bool, default: False
+        Print a profile of the solr request to stderr,
+        see :py:meth:`freva.databrowser`.
+    federated: bool, default: False
+        Search the databrowsers of all configured freva instances,
+        see :py:meth:`freva.databrowser`.
+    **search_facets: str
+        The facets to be applied in the data search. If not given
+        the whole dataset will be queried.
+
+    Returns
+    -------
+    list[dict[str, Any]]:
+        One dictionary per dataset with the dataset identifier (``dataset``),
+        the number of files (``num_files``), the start of the earliest file
+        (``time_start``), the end of the latest file (``time_end``) and the
+        versions of the dataset (``versions``).
+
+    Example
+    -------
+
+    .. execute_code::
+
+        import freva
+        for dataset in freva.dataset_search(project="obs*"):
+            print(dataset["dataset"], dataset["time_start"], dataset["time_end"])
+
+    """
+    search_facets = _proc_search_facets(
+        time_select=time_select, time=time, **search_facets
+    )
+    core = _get_core(multiversion, search_facets)
+    logger.debug("Searching dictionary: %s\n", search_facets)
+    with warnings.catch_warnings():
+        warnings.filterwarnings(action="ignore", category=PendingDeprecationWarning)
+        return _run_profiled(
+            profile,
+            _get_search(core, federated)._datasets,
+            limit=max_results,
+            **search_facets,
+        )
+
+
+@handled_exception
+def file_metadata(
+    files: Union[str, os.PathLike, Iterable[Union[str, os.PathLike]]],
+    *,
+    batch_size: int = 500,
+    profile: bool = False,
+) -> dict[str, dict[str, Any]]:
+    """Get the search facets of many files at once.
+
+    This is the batched counterpart of a reverse search with
+    :py:meth:`freva.facet_search` using the ``file`` facet. Instead of one
+    search per file the metadata of the files is looked up directly, in
+    batches of ``batch_size`` files.
+
+    Parameters
+    ----------
+    files: str, os.PathLike, Iterable
+        The path(s) of the files.
+    batch_size: int, default: 500
+        The number of files that are looked up with one request.
+    profile: bool, default: False
+        Print a profile of the solr requests to stderr,
+        see :py:meth:`freva.databrowser`.
+
+    Returns
+    -------
+    dict[str, dict[str, Any]]:
+        The search facets and the time range of each file, by the given
+        path. Files that are unknown to the databrowser are left out.
+
+    Example
+    -------
+
+    .. execute_code::
+
+        import freva
+        files = list(freva.databrowser(project="obs*"))[:3]
+        for file, facets in freva.file_metadata(files).items():
+            print(file, facets["variable"], facets["time"])
+
+    """
+    if isinstance(files, (str, os.PathLike)):
+        files = [files]
+    paths = {str(Path(f).expanduser().absolute()): str(f) for f in files}
+    with warnings.catch_warnings():
+        warnings.filterwarnings(action="ignore", category=PendingDeprecationWarning)
+        # every file version is in the files core, the latest core is a subset
+        solr_search = _get_search("files")
+        fields = sorted(solr_search._get_facet_fields()) + ["time"]
+        docs = _run_profiled(
+            profile,
+            lambda: list(
+                solr_search._file_metadata(
+                    list(paths), batch_size=batch_size, fields=fields
+                )
+            ),
+        )
+    metadata = {}
+    for doc in docs:
+        path = paths[doc.pop("file")]
+        metadata[path] = {k: _first_value(v) for (k, v) in sorted(doc.items())}
+    return metadata
+
+
 @handled_exception
 def databrowser(
     *,
     multiversion: bool = False,
+    profile: bool = False,
+    federated: bool = False,
     batch_size: int = 5000,
     uniq_key: Literal["file", "uri"] = "file",
     time: str = "",
     time_select: Literal["flexible", "strict", "file"] = "flexible",
+    prefetch: int = 0,
+    stream: bool = False,
+    fields: Optional[list[str]] = None,
+    as_frame: bool = False,
+    order: Literal["sorted", "unsorted", "grouped"] = "sorted",
     **search_facets: Union[str, list[str], int],
-) -> Union[dict[str, dict[str, int]], dict[str, list[str]], Iterator[str], int]:
+) -> Union[
+    Iterator[str], Iterator[dict[str, Any]], Iterator[tuple[str, int]], pd.DataFrame
+]:
     """Find data in the system.
 
     You can either search for files or data facets (variable, model, ...)
@@ -284,7 +871,9 @@ def databrowser(
     ----------
     **search_facets: Union[str, Path, in, list[str]]
         The facets to be applied in the data search. If not given
-        the whole dataset will be queried.
+        the whole dataset will be queried. The special ``bbox`` facet selects
+        files by their spatial extent: files whose bounding box intersects
+        the box ``west,south,east,north`` (in degrees) are selected.
     time: str
         Special search facet to refine/subset search results by time.
         This can be a string representation of a time range or a single
@@ -308,14 +897,51 @@ def databrowser(
         used libraries like fsspec.
     multiversion: bool, default: False
         Select all versions and not just the latest version (default).
+    profile: bool, default: False
+        Print a profile of the solr requests of the query to stderr: the
+        query strings, solr's processing time (QTime), the wall time,
+        received bytes, parse time and the number of round trips.
+    federated: bool, default: False
+        Search the databrowsers of all freva instances that are configured
+        in the ``solr.federation`` option in addition to this instance.
     batch_size: int, default: 5000
         Size of the search query.
+    prefetch: int, default: 0
+        Number of result pages (of size ``batch_size``) that are retrieved in
+        the background while the current page is being processed. By default
+        no pages are fetched in advance.
+    stream: bool, default: False
+        Stream all search results in one response instead of retrieving them
+        page by page. This keeps the memory usage constant and is the fastest
+        option for very large searches. ``batch_size`` and ``prefetch`` have
+        no effect when streaming.
+    fields: list[str], default: None
+        Metadata fields (model, variable, time, ...) that are retrieved along
+        with ``uniq_key``. If given, each result is a dictionary holding the
+        values of the requested fields instead of a plain string.
+    as_frame: bool, default: False
+        Collect the search results, including the metadata ``fields``, in a
+        :py:class:`pandas.DataFrame`. All facets are retrieved if no
+        ``fields`` are given. Facets are stored as categories, the time range
+        is split into ``time_start`` and ``time_end`` datetime columns.
+    order: str, default: sorted
+        The order of the search results. ``sorted`` (default) sorts the
+        results by ``uniq_key``. ``unsorted`` returns the results in the order
+        they are stored in the databrowser, all but the first ``batch_size``
+        results are retrieved with a single request. This is the fastest
+        option for listing all results if their order doesn't matter, but
+        not for retrieving only the first few pages. ``grouped`` returns one
+        ``(dataset, number of files)`` pair per dataset instead of the files.
 
     Returns
     -------
     Iterator :
         If ``all_facets`` is False and ``facet`` is None an
         iterator with results.
+    Iterator[tuple[str, int]] :
+        Datasets and their number of files if ``order`` is ``grouped``.
+    pandas.DataFrame :
+        A data frame with one row per result if ``as_frame`` is True.
 
 
     Example
@@ -357,17 +983,252 @@ def databrowser(
         file_range = freva.databrowser(project="obs*", time="2016-09-02T22:15 to 2016-10", time_select="strict")
         for file in file_range:
             print(file)
+
+    Retrieve the metadata of the files as a data frame:
+
+    .. execute_code::
+
+        import freva
+        frame = freva.databrowser(project="obs*", as_frame=True,
+                                  fields=["variable", "time_frequency", "time"])
+        print(frame.dtypes)
+        print(frame)
+
+    List the datasets and their number of files instead of the files:
+
+    .. execute_code::
+
+        import freva
+        for dataset, num_files in freva.databrowser(project="obs*", order="grouped"):
+            print(dataset, num_files)
     """
     core = {True: "latest", False: "files"}[not multiversion]
     search_facets = _proc_search_facets(
         time_select=time_select, time=time, **search_facets
     )
+    if order not in ("sorted", "unsorted", "grouped"):
+        raise ValueError("Order has to be one of sorted, unsorted, grouped")
+    if order != "sorted" and stream:
+        raise ValueError("Streamed results are always sorted")
+    if order == "grouped" and (fields or as_frame):
+        raise ValueError("Grouped results don't have fields")
     with warnings.catch_warnings():
         warnings.filterwarnings(action="ignore", category=PendingDeprecationWarning)
-        search_results = SolrFindFiles(core=core)._search(
+        solr_search = _get_search(core, federated)
+        if as_frame:
+            if fields is None:
+                fields = sorted(solr_search._get_facet_fields()) + ["time"]
+            frame = _run_profiled(
+                profile,
+                _to_frame,
+                pages=solr_search._get_pages(
+                    batch_size=batch_size,
+                    uniq_key=uniq_key,
+                    prefetch=prefetch,
+                    fields=fields,
+                    order=order,
+                    **search_facets,
+                ),
+                uniq_key=uniq_key,
+                fields=fields,
+            )
+            if frame.empty:
+                _warn_no_results(solr_search, search_facets)
+            return frame
+        search_results = _run_profiled(
+            profile,
+            solr_search._search,
             batch_size=batch_size,
             latest_version=not multiversion,
             uniq_key=uniq_key,
+            prefetch=prefetch,
+            stream=stream,
+            fields=fields,
+            order=order,
             **search_facets,
         )
-    return search_results
+    return _iter_suggested(search_results, solr_search, search_facets)
+
+
+@overload
+def batch_databrowser(
+    searches: Mapping[Hashable, dict[str, Any]],
+    *,
+    max_workers: int = 8,
+    **common_facets: Any,
+) -> dict[Hashable, list[str]]:
+    ...
+
+
+@overload
+def batch_databrowser(
+    searches: Sequence[dict[str, Any]],
+    *,
+    max_workers: int = 8,
+    **common_facets: Any,
+) -> list[list[str]]:
+    ...
+
+
+@handled_exception
+def batch_databrowser(
+    searches: Mapping[Hashable, dict[str, Any]] | Sequence[dict[str, Any]],
+    *,
+    max_workers: int = 8,
+    **common_facets: Any,
+) -> dict[Hashable, list[str]] | list[list[str]]:
+    """Run many data searches concurrently.
+
+    Instead of calling :py:meth:`freva.databrowser` for one facet
+    combination after another, all searches are sent to the databrowser
+    at the same time, sharing a pool of connections. The results of all
+    searches are hence available after the slowest search has finished.
+
+    Parameters
+    ----------
+    searches: Union[dict[Hashable, dict], list[dict]]
+        The search facets of each search. Either a list of search facets or
+        a dictionary mapping an arbitrary key to the search facets.
+    max_workers: int, default: 8
+        The maximum number of searches that run at the same time.
+    **common_facets: str
+        Search facets and keyword arguments of :py:meth:`freva.databrowser`
+        that are applied to all searches.
+
+    Returns
+    -------
+    Union[dict[Hashable, list[str]], list[list[str]]]:
+        The search results of each search, in the order of the given list of
+        searches or keyed like the given dictionary of searches.
+
+    Example
+    -------
+
+    .. execute_code::
+
+        import freva
+        results = freva.batch_databrowser(
+            {var: {"variable": var} for var in ("pr", "tas", "ua")},
+            project="obs*",
+        )
+        for var, files in results.items():
+            print(var, len(files))
+
+    """
+    # errors should be handled once for the whole batch, not per search
+    search = cast(Callable[..., Iterator[str]], getattr(databrowser, "__wrapped__"))
+
+    def _search(search_facets: dict[str, Any]) -> list[str]:
+        return list(search(**{**common_facets, **search_facets}))
+
+    if isinstance(searches, Mapping):
+        facets = list(searches.values())
+    else:
+        facets = list(searches)
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+        results = list(pool.map(_search, facets))
+    if isinstance(searches, Mapping):
+        return dict(zip(searches.keys(), results))
+    return results
+
+
+async def async_databrowser(
+    *,
+    multiversion: bool = False,
+    profile: bool = False,
+    federated: bool = False,
+    batch_size: int = 5000,
+    uniq_key: Literal["file", "uri"] = "file",
+    time: str = "",
+    time_select: Literal["flexible", "strict", "file"] = "flexible",
+    prefetch: int = 1,
+    fields: Optional[list[str]] = None,
+    order: Literal["sorted", "unsorted", "grouped"] = "sorted",
+    **search_facets: Union[str, list[str], int],
+) -> AsyncIterator[Any]:
+    """Find data in the system without blocking the event loop.
+
+    This is the asynchronous counterpart of :py:meth:`freva.databrowser`.
+    While the current page of results is consumed the next ``prefetch``
+    pages are already retrieved in the background. Many searches can hence
+    run concurrently within one event loop.
+
+    Parameters
+    ----------
+    prefetch: int, default: 1
+        Number of result pages (of size ``batch_size``) that are retrieved
+        in advance.
+    **kwargs:
+        See :py:meth:`freva.databrowser` for all other parameters, except
+        for ``stream`` and ``as_frame``.
+
+    Returns
+    -------
+    AsyncIterator :
+        An asynchronous iterator with the search results, like the results of
+        :py:meth:`freva.databrowser`.
+
+    Example
+    -------
+
+    .. execute_code::
+
+        import asyncio
+        import freva
+
+        async def main():
+            return [f async for f in freva.async_databrowser(project="obs*")]
+
+        print(asyncio.run(main()))
+    """
+    core = {True: "latest", False: "files"}[not multiversion]
+    search_facets = _proc_search_facets(
+        time_select=time_select, time=time, **search_facets
+    )
+    if order not in ("sorted", "unsorted", "grouped"):
+        raise ValueError("Order has to be one of sorted, unsorted, grouped")
+    if order == "grouped" and fields:
+        raise ValueError("Grouped results don't have fields")
+    with warnings.catch_warnings():
+        warnings.filterwarnings(action="ignore", category=PendingDeprecationWarning)
+        pages = _get_search(core, federated)._get_pages(
+            batch_size=batch_size,
+            uniq_key=uniq_key,
+            fields=fields,
+            order=order,
+            **search_facets,
+        )
+    prefetcher = PagePrefetcher(pages, depth=prefetch)
+    query_profile = QueryProfile() if profile else None
+    if query_profile is not None:
+        # the pages are fetched by the worker, which inherits the profile
+        context = contextvars.copy_context()
+        context.run(query_profile.activate)
+        context.run(prefetcher._start)
+    try:
+        async for page in prefetcher:
+            for result in page:
+                yield result
+    finally:
+        if query_profile is not None:
+            _print_profile(query_profile)
+
+
+async def async_facet_search(**kwargs: Any) -> dict[str, list[str]]:
+    """Search for data attributes (facets) without blocking the event loop.
+
+    This is the asynchronous counterpart of :py:meth:`freva.facet_search`,
+    which takes the same parameters.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, partial(facet_search, **kwargs))
+
+
+async def async_count_values(**kwargs: Any) -> int | dict[str, dict[str, int]]:
+    """Count the number of found objects without blocking the event loop.
+
+    This is the asynchronous counterpart of :py:meth:`freva.count_values`,
+    which takes the same parameters.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, partial(count_values, **kwargs))
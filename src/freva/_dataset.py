@@ -0,0 +1,142 @@
+"""Open the results of a databrowser search as one xarray dataset."""
+from __future__ import annotations
+
+import os
+import warnings
+from typing import TYPE_CHECKING, Optional, Union
+
+from typing_extensions import Literal
+
+from evaluation_system.misc import logger
+
+from ._databrowser import (
+    _first_value,
+    _get_core,
+    _get_search,
+    _get_time_bounds,
+    _proc_search_facets,
+    _run_profiled,
+)
+from .utils import handled_exception
+
+if TYPE_CHECKING:
+    import xarray as xr
+
+__all__ = ["open_dataset"]
+
+
+def _time_slice(time: str) -> slice:
+    """Convert the time search facet to a slice of timestamps."""
+    start = time.lower().partition("to")[0].strip()
+    t_start, t_end = _get_time_bounds(time)
+    return slice(t_start.rstrip("Z") if start else None, t_end.rstrip("Z"))
+
+
+@handled_exception
+def open_dataset(
+    *,
+    multiversion: bool = False,
+    time: str = "",
+    time_select: Literal["strict", "flexible", "file"] = "flexible",
+    chunks: Optional[dict[str, int]] = None,
+    profile: bool = False,
+    **search_facets: Union[str, list[str], int],
+) -> xr.Dataset:
+    """Open the files of a search as one lazily loaded xarray dataset.
+
+    Datasets that have a virtual reference, which is written at ingest if
+    the ``solr.reference_dir`` option is set, are opened from the reference
+    without reading the headers of their files. All other files are opened
+    with :py:func:`xarray.open_mfdataset`. Opening references requires the
+    ``fsspec`` and ``zarr`` packages.
+
+    A reference always covers all files of a dataset, the opened dataset is
+    hence subset to the ``time`` and ``variable`` of the search.
+
+    Parameters
+    ----------
+    multiversion: bool, default: False
+        Select all versions and not just the latest version (default).
+    time: str, default: ""
+        Special search facet to refine/subset search results by time.
+        See :py:meth:`freva.databrowser` for details.
+    time_select: str, default: flexible
+        Operator that specifies how the time period is selected.
+        See :py:meth:`freva.databrowser` for details.
+    chunks: dict, default: None
+        The dask chunks of the dataset. By default the data of references is
+        loaded lazily without dask, files without reference are opened with
+        one dask chunk per file.
+    profile: bool, default: False
+        Print a profile of the solr requests to stderr,
+        see :py:meth:`freva.databrowser`.
+    **search_facets: str
+        The facets to be applied in the data search.
+
+    Returns
+    -------
+    xarray.Dataset:
+        The lazily loaded dataset of all search results.
+
+    Raises
+    ------
+    ValueError:
+        If the search has no results.
+
+    Example
+    -------
+
+    .. execute_code::
+
+        import freva
+        dset = freva.open_dataset(project="obs*", variable="pr")
+        print(dset)
+
+    """
+    import xarray as xr
+
+    from evaluation_system.model.references import open_reference
+
+    search = _proc_search_facets(time_select=time_select, time=time, **search_facets)
+    core = _get_core(multiversion, search)
+    logger.debug("Searching dictionary: %s\n", search)
+    with warnings.catch_warnings():
+        warnings.filterwarnings(action="ignore", category=PendingDeprecationWarning)
+        solr_search = _get_search(core)
+        docs = _run_profiled(
+            profile, lambda: list(solr_search._search(fields=["reference"], **search))
+        )
+    if not docs:
+        raise ValueError("The search has no results")
+    references: dict[str, None] = {}
+    files = []
+    for doc in docs:
+        reference = _first_value(doc.get("reference"))
+        if reference and os.path.isfile(reference):
+            references[reference] = None
+        else:
+            files.append(doc["file"])
+    logger.debug(
+        "Opening %i references and %i files without reference",
+        len(references),
+        len(files),
+    )
+    dsets = [open_reference(reference, chunks=chunks) for reference in references]
+    if files:
+        dsets.append(
+            xr.open_mfdataset(sorted(files), combine="by_coords", chunks=chunks)
+        )
+    if len(dsets) == 1:
+        dset = dsets[0]
+    else:
+        dset = xr.merge(dsets, combine_attrs="drop_conflicts")
+    variables = search_facets.get("variable")
+    if isinstance(variables, str):
+        variables = [variables]
+    if variables and not any("*" in v or "?" in v for v in map(str, variables)):
+        data_vars = [v for v in map(str, variables) if v in dset.data_vars]
+        if data_vars:
+            dset = dset[data_vars]
+    if time and "time" in dset.dims:
+        dset = dset.sel(time=_time_slice(time))
+    return dset
@@ -237,7 +237,7 @@ class UserData:
             user_data.delete(user_data.user_dir)
 
         """
-        solr_core = SolrCore(core="files")
+        solr_core = SolrCore.get_client(core="files")
         for path in paths:
             for file in DataReader(Path(path).expanduser().absolute()):
                 self._validate_user_dirs(file)
@@ -290,7 +290,7 @@ class UserData:
         try:
             logger.setLevel(logging.ERROR)
             print("Status: crawling ...", end="", flush=True)
-            solr_core = SolrCore(core="latest")
+            solr_core = SolrCore.get_client(core="latest")
             for crawl_dir in self._validate_user_dirs(*crawl_dirs, **kwargs):
                 data_reader = DataReader(crawl_dir)
                 solr_core.load_fs(
@@ -2,6 +2,7 @@ from __future__ import annotations
 
 import argparse
 import sys
+from pathlib import Path
 from typing import Any, Optional
 
 import lazy_import
@@ -13,6 +14,9 @@ from evaluation_system.misc import logger
 from .utils import BaseCompleter, BaseParser
 
 freva = lazy_import.lazy_module("freva")
+export_snapshot = lazy_import.lazy_function(
+    "evaluation_system.model.solr_parquet.export_snapshot"
+)
 
 
 class Cli(BaseParser):
@@ -55,7 +59,64 @@ class Cli(BaseParser):
             "--facet-limit",
             type=int,
             help="Limit the number of output facets.",
-            default=sys.maxsize,
+            default=None,
+        )
+        self.parser.add_argument(
+            "--facet-offset",
+            type=int,
+            help="Skip the first N values of each output facet.",
+            metavar="N",
+            default=0,
+        )
+        self.parser.add_argument(
+            "--summary",
+            action="store_true",
+            default=False,
+            help=(
+                "Show the number of files, the facet counts and the first "
+                "files of the search at once."
+            ),
+        )
+        self.parser.add_argument(
+            "--summary-rows",
+            type=int,
+            default=10,
+            metavar="N",
+            help="Number of files shown by --summary.",
+        )
+        self.parser.add_argument(
+            "--order",
+            type=str,
+            help=(
+                "Order of the files: sorted, unsorted (fastest) or grouped "
+                "by dataset, showing the number of files per dataset."
+            ),
+            choices=["sorted", "unsorted", "grouped"],
+            default="sorted",
+        )
+        self.parser.add_argument(
+            "--export",
+            type=str,
+            help="Write the search results with all facets to a catalog file.",
+            choices=["csv", "parquet", "ndjson", "intake-esm"],
+            default=None,
+        )
+        self.parser.add_argument(
+            "--output",
+            "-o",
+            type=Path,
+            help="Path of the catalog file of --export (default: freva-catalog.*).",
+            default=None,
+        )
+        self.parser.add_argument(
+            "--snapshot",
+            type=Path,
+            metavar="DIR",
+            help=(
+                "Export the whole databrowser to a Parquet snapshot in DIR, "
+                "which can be searched with the solr.backend = parquet option."
+            ),
+            default=None,
         )
         self.parser.add_argument(
             "--time-select",
@@ -64,6 +125,21 @@ class Cli(BaseParser):
             choices=["flexible", "strict", "file"],
             default="flexible",
         )
+        self.parser.add_argument(
+            "--federated",
+            default=False,
+            action="store_true",
+            help="Search the databrowsers of all configured freva instances.",
+        )
+        self.parser.add_argument(
+            "--profile",
+            default=False,
+            action="store_true",
+            help=(
+                "Print the solr queries and their timings, received bytes "
+                "and number of round trips to stderr."
+            ),
+        )
         self.parser.add_argument(
             "--debug",
             "-v",
@@ -88,55 +164,93 @@ class Cli(BaseParser):
         **kwargs: Optional[Any],
     ) -> None:
         """Call the databrowser command and print the results."""
+        if args.snapshot is not None:
+            print(str(export_snapshot(args.snapshot)), flush=True)
+            return
         facets: dict[str, Any] = BaseCompleter.arg_to_dict(args.facets, append=True)
         facet_limit = kwargs.pop("facet_limit")
+        facet_page: dict[str, int] = {"facet_offset": kwargs.pop("facet_offset", 0)}
+        if facet_limit is not None:
+            # one more value is retrieved to know if the values are cut
+            facet_page["facet_limit"] = facet_limit + 1
         for key in (
             "facets",
             "facet",
             "count",
             "relevant_only",
             "batch_size",
+            "snapshot",
         ):
             _ = kwargs.pop(key, "")
         for key, values in facets.items():
             if len(values) == 1:
                 facets[key] = values[0]
         merged_args: dict[str, Any] = {**kwargs, **facets}
+        # options that aren't search facets
+        summary = merged_args.pop("summary", False)
+        summary_rows = merged_args.pop("summary_rows", 10)
+        order = merged_args.pop("order", "sorted")
+        export = merged_args.pop("export", None)
+        output = merged_args.pop("output", None)
+        if summary:
+            result = freva.search_summary(
+                facet=args.facet, max_results=summary_rows, **facet_page, **merged_args
+            )
+            sys.stderr.flush()
+            print(result["count"], flush=True)
+            _print_facets(result["facets"], facet_limit)
+            for key in result["files"]:
+                print(str(key), flush=True)
+            return
+        if export is not None:
+            suffix = {"intake-esm": "json"}.get(export, export)
+            path = freva.export_catalog(
+                output or f"freva-catalog.{suffix}",
+                format=export,
+                batch_size=args.batch_size,
+                **merged_args,
+            )
+            print(str(path), flush=True)
+            return
         if args.count:
-            out = freva.count_values(facet=args.facet, **merged_args)
+            out = freva.count_values(facet=args.facet, **facet_page, **merged_args)
         elif args.facet:
-            out = freva.facet_search(facet=args.facet, **merged_args)
+            out = freva.facet_search(facet=args.facet, **facet_page, **merged_args)
         else:
-            out = freva.databrowser(batch_size=args.batch_size, **merged_args)
+            out = freva.databrowser(
+                batch_size=args.batch_size, order=order, **merged_args
+            )
         # flush stderr in case we have something pending
         sys.stderr.flush()
         if isinstance(out, dict):
             # We have facet values as return values
-            for att, values in out.items():
-                facet_limit = facet_limit or len(values) + 1
-                try:
-                    keys = ",".join(
-                        [
-                            f"{k} ({c})"
-                            for n, (k, c) in enumerate(values.items())
-                            if n < facet_limit
-                        ]
-                    )
-                except AttributeError:
-                    keys = ",".join(
-                        [v for n, v in enumerate(values) if n < facet_limit]
-                    )
-                if facet_limit < len(values):
-                    keys += ",..."
-                print(f"{att}: {keys}", flush=True)
+            _print_facets(out, facet_limit)
             return
         if args.count:
             print(out, flush=True)
+        elif order == "grouped":
+            for dataset, num_files in out:
+                print(f"{dataset} ({num_files})", flush=True)
         else:
             for key in out:
                 print(str(key), flush=True)
 
 
+def _print_facets(out: dict[str, Any], facet_limit: Optional[int]) -> None:
+    """Print facet values, or facet counts, line by line."""
+    for att, values in out.items():
+        limit = len(values) + 1 if facet_limit is None else facet_limit
+        try:
+            keys = ",".join(
+                [f"{k} ({c})" for n, (k, c) in enumerate(values.items()) if n < limit]
+            )
+        except AttributeError:
+            keys = ",".join([v for n, v in enumerate(values) if n < limit])
+        if limit < len(values):
+            keys += ",..."
+        print(f"{att}: {keys}", flush=True)
+
+
 def main(argv: Optional[list[str]] = None) -> None:
     """Wrapper for entry point script."""
     cli = Cli()